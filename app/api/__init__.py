@@ -1,6 +1,6 @@
 """
 API package initialization
 """
-from app.api import auth, datasets, query, users, plfs
+from app.api import auth, datasets, query, aggregate, users, plfs
 
-__all__ = ["auth", "datasets", "query", "users", "plfs"]
+__all__ = ["auth", "datasets", "query", "aggregate", "users", "plfs"]
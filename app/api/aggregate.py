@@ -0,0 +1,284 @@
+"""
+Aggregation API endpoints
+"""
+from fastapi import APIRouter, Depends, Query as QueryParam, HTTPException, Request
+from sqlalchemy.orm import Session
+from typing import Optional
+from app.database import get_db
+from app.models.user import User
+from app.auth import get_current_user
+from app.services.aggregation import AggregationService
+from app.services.access_control import AccessControlService
+from app.services.cost_estimator import QueryCostEstimator
+from app.services.payment import PaymentService
+from app.services.query_guard import QueryGuard, QueryTimeoutError, QueryCancelledError, watch_disconnect
+from app.services.schema_registry import schema_registry
+from app.services.dataset_version import dataset_versions
+from app.services.result_cache import result_cache
+from app.services.query_builder import normalize_filters
+from app.services.serialization import dumps, EncodedJSONResponse
+import json
+import threading
+
+router = APIRouter(prefix="/aggregate", tags=["Aggregation"])
+
+
+@router.get("/{table_name}")
+def aggregate_table(
+    table_name: str,
+    request: Request,
+    filters: Optional[str] = QueryParam(None, description="JSON filters, same DSL as /query/{table_name}"),
+    group_by: Optional[str] = QueryParam(None, description="Comma-separated columns to group by"),
+    measures: str = QueryParam("count", description="Comma-separated measures: count, sum:<col>, mean:<col>"),
+    weight: Optional[str] = QueryParam(None, description="Weight column, e.g. Subsample_Multiplier"),
+    limit: int = QueryParam(10000, ge=1, le=100000, description="Maximum cells to return"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Aggregate a survey table in the database and return only the cells
+    
+    Compiles to a single `GROUP BY` query, so no raw rows leave the database.
+    Each cell has `n` (unweighted sample rows) plus the requested measures.
+    Requests are costed and admitted like `/query/{table_name}` (403 above
+    your role's cost limit) and stopped at its deadline (504); ones the
+    rollup cube answers cost little.
+    
+    **Measures:**
+    - `count`: rows, or the sum of weights when `weight` is given
+    - `sum:<col>`: sum of a column (weighted when `weight` is given)
+    - `mean:<col>`: mean of a column (weighted when `weight` is given)
+    
+    **Examples:**
+    
+    Weighted persons by state and sector:
+    ```
+    GET /api/v1/aggregate/person_survey?group_by=State_UT_Code,Sector&weight=Subsample_Multiplier
+    ```
+    
+    Mean monthly expenditure of rural households by district in one state:
+    ```
+    GET /api/v1/aggregate/household_survey?filters={"State_Ut_Code": 36, "Sector": 1}&group_by=District_Code&measures=count,mean:Monthly_Consumer_Expenditure&weight=Subsample_Multiplier
+    ```
+    """
+    
+    # Check rate limits
+    access_control = AccessControlService(db)
+    access_control.check_rate_limit(current_user)
+    
+    # Parse filters
+    filter_dict = {}
+    if filters:
+        try:
+            filter_dict = json.loads(filters)
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="Invalid JSON in filters parameter")
+    
+    group_list = [g.strip() for g in group_by.split(',') if g.strip()] if group_by else []
+    
+    if not schema_registry.has_table(table_name, db.bind):
+        raise HTTPException(status_code=404, detail=f"Table '{table_name}' not found")
+    
+    aggregation_service = AggregationService(db)
+    
+    try:
+        measure_list = aggregation_service.parse_measures(measures)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Serve repeated requests from the result cache; metering still runs below
+    version = dataset_versions.get(db, table_name)
+    cache_key = result_cache.make_key(
+        table_name,
+        version,
+        kind="aggregate",
+        filters=normalize_filters(filter_dict),
+        group_by=group_list,
+        measures=measure_list,
+        weight=weight,
+        limit=limit
+    )
+    result = result_cache.get(cache_key)
+    
+    if result is None:
+        cancel_event = threading.Event()
+        stop_watching = watch_disconnect(request.receive, cancel_event)
+        try:
+            # Cost the query before admitting it; rollup answers are cheap
+            estimate = QueryCostEstimator(db).estimate_aggregate_query(
+                table_name, filter_dict, group_list, measure_list, weight, limit
+            )
+            with access_control.admit_query(current_user, estimate), \
+                    QueryGuard(db, table_name, access_control.query_timeout(current_user), cancel_event):
+                result = aggregation_service.execute_aggregate_query(
+                    table_name=table_name,
+                    filters=filter_dict,
+                    group_by=group_list,
+                    measures=measure_list,
+                    weight=weight,
+                    limit=limit
+                )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except QueryTimeoutError as e:
+            raise HTTPException(status_code=504, detail=str(e))
+        except QueryCancelledError:
+            # Nobody is listening any more; skip metering and caching
+            raise HTTPException(status_code=499, detail="Client closed request")
+        finally:
+            stop_watching()
+        
+        result_cache.set(cache_key, result)
+    
+    # Encode once; the exact byte length is what gets metered and sent
+    body = dumps(result)
+    response_size = len(body)
+    
+    # Check volume limits
+    access_control.check_volume_limit(current_user, response_size)
+    
+    # Charge for query
+    payment_service = PaymentService(db)
+    payment_service.charge_for_query(current_user, response_size)
+    
+    # Log usage
+    access_control.log_usage(
+        user=current_user,
+        endpoint=f"/api/v1/aggregate/{table_name}",
+        method="GET",
+        dataset_name=table_name,
+        query_params=json.dumps({'filters': filter_dict, 'group_by': group_list, 'measures': measures, 'weight': weight}),
+        response_size=response_size
+    )
+    
+    return EncodedJSONResponse(body)
+
+
+@router.get("/{table_name}/crosstab")
+def crosstab_table(
+    table_name: str,
+    request: Request,
+    rows: str = QueryParam(..., description="Comma-separated row dimensions"),
+    columns: str = QueryParam(..., description="Comma-separated column dimensions"),
+    measure: str = QueryParam("count", description="Cell measure: count, sum:<col> or mean:<col>"),
+    weight: Optional[str] = QueryParam(None, description="Weight column, e.g. Subsample_Multiplier"),
+    filters: Optional[str] = QueryParam(None, description="JSON filters, same DSL as /query/{table_name}"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Cross-tabulate a survey table into a two-way table of (weighted) cells
+    
+    One `GROUP BY` over the row and column dimensions, returned as a matrix
+    instead of row dicts: `values[i][j]` is the cell for `row_keys[i]` and
+    `column_keys[j]` (null when no rows fall in it), `n[i][j]` its
+    unweighted sample rows. For `count` and `sum`, `margins` carries row,
+    column and grand totals.
+    
+    **Examples:**
+    
+    Weighted persons by sex and education level, per state:
+    ```
+    GET /api/v1/aggregate/person_survey/crosstab?rows=State_UT_Code,Sex&columns=General_Education_Level&weight=Subsample_Multiplier
+    ```
+    
+    Sector by principal activity status:
+    ```
+    GET /api/v1/aggregate/person_survey/crosstab?rows=Sector&columns=Principal_Status_Code&weight=Subsample_Multiplier
+    ```
+    """
+    
+    # Check rate limits
+    access_control = AccessControlService(db)
+    access_control.check_rate_limit(current_user)
+    
+    # Parse filters
+    filter_dict = {}
+    if filters:
+        try:
+            filter_dict = json.loads(filters)
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="Invalid JSON in filters parameter")
+    
+    row_list = [r.strip() for r in rows.split(',') if r.strip()]
+    column_list = [c.strip() for c in columns.split(',') if c.strip()]
+    
+    if not schema_registry.has_table(table_name, db.bind):
+        raise HTTPException(status_code=404, detail=f"Table '{table_name}' not found")
+    
+    aggregation_service = AggregationService(db)
+    
+    try:
+        measure_list = aggregation_service.parse_measures(measure)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(measure_list) != 1:
+        raise HTTPException(status_code=400, detail="A crosstab takes exactly one measure")
+    
+    # Serve repeated requests from the result cache; metering still runs below
+    version = dataset_versions.get(db, table_name)
+    cache_key = result_cache.make_key(
+        table_name,
+        version,
+        kind="crosstab",
+        filters=normalize_filters(filter_dict),
+        rows=row_list,
+        columns=column_list,
+        measure=measure_list[0],
+        weight=weight
+    )
+    result = result_cache.get(cache_key)
+    
+    if result is None:
+        cancel_event = threading.Event()
+        stop_watching = watch_disconnect(request.receive, cancel_event)
+        try:
+            # Cost the underlying GROUP BY before admitting it
+            estimate = QueryCostEstimator(db).estimate_aggregate_query(
+                table_name, filter_dict, row_list + column_list, measure_list, weight,
+                AggregationService.MAX_CROSSTAB_CELLS + 1
+            )
+            with access_control.admit_query(current_user, estimate), \
+                    QueryGuard(db, table_name, access_control.query_timeout(current_user), cancel_event):
+                result = aggregation_service.execute_crosstab_query(
+                    table_name=table_name,
+                    rows=row_list,
+                    columns=column_list,
+                    measure=measure_list[0],
+                    filters=filter_dict,
+                    weight=weight
+                )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except QueryTimeoutError as e:
+            raise HTTPException(status_code=504, detail=str(e))
+        except QueryCancelledError:
+            # Nobody is listening any more; skip metering and caching
+            raise HTTPException(status_code=499, detail="Client closed request")
+        finally:
+            stop_watching()
+        
+        result_cache.set(cache_key, result)
+    
+    # Encode once; the exact byte length is what gets metered and sent
+    body = dumps(result)
+    response_size = len(body)
+    
+    # Check volume limits
+    access_control.check_volume_limit(current_user, response_size)
+    
+    # Charge for query
+    payment_service = PaymentService(db)
+    payment_service.charge_for_query(current_user, response_size)
+    
+    # Log usage
+    access_control.log_usage(
+        user=current_user,
+        endpoint=f"/api/v1/aggregate/{table_name}/crosstab",
+        method="GET",
+        dataset_name=table_name,
+        query_params=json.dumps({'filters': filter_dict, 'rows': row_list, 'columns': column_list, 'measure': measure, 'weight': weight}),
+        response_size=response_size
+    )
+    
+    return EncodedJSONResponse(body)
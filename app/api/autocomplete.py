@@ -0,0 +1,52 @@
+"""
+Autocomplete API endpoint
+"""
+from fastapi import APIRouter, Depends, Query as QueryParam, HTTPException
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.models.user import User
+from app.auth import get_current_user
+from app.services.autocomplete import autocomplete_index
+import time
+
+router = APIRouter(prefix="/autocomplete", tags=["Autocomplete"])
+
+
+@router.get("")
+def autocomplete(
+    kind: str = QueryParam(..., description="What to suggest: state, district or item"),
+    q: str = QueryParam(..., min_length=1, description="Typed prefix of a name or of a word in it"),
+    limit: int = QueryParam(10, ge=1, le=50, description="Maximum suggestions"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Type-ahead suggestions for state, district and item names
+    
+    Served from in-memory prefix indexes over the PLFS district codes and
+    item codes tables, so every keystroke can query it. Names starting with
+    `q` come first, then names with a later word starting with `q`.
+    Matching ignores case, and `&` matches `and`.
+    
+    Each suggestion carries its `label` and codes: `STATE_CODE` for
+    states; `STATE_CODE`, `STATE_NAME` and `DISTRICT_CODE` for districts;
+    `BLOCK` and `ITEM_NO` for items.
+    
+    **Example:**
+    ```
+    GET /api/v1/autocomplete?kind=district&q=aur
+    ```
+    """
+    start_time = time.time()
+    
+    try:
+        suggestions = autocomplete_index.suggest(db, kind, q, limit)
+    except LookupError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        'kind': kind,
+        'query': q,
+        'suggestions': suggestions,
+        'query_time_ms': round((time.time() - start_time) * 1000, 3)
+    }
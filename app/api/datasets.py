@@ -1,16 +1,24 @@
 """
 Dataset management API endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from sqlalchemy import inspect, text
-from typing import List
+from typing import List, Optional
 from app.database import get_db
 from app.models import Dataset
 from app.models.user import User, UserRole
 from app.schemas.dataset import DatasetCreate, DatasetUpdate, DatasetResponse
 from app.auth import get_current_user
 from app.services.access_control import AccessControlService
+from app.services.payment import PaymentService
+from app.services.schema_registry import schema_registry
+from app.services.dataset_version import dataset_versions
+from app.services.query_builder import QueryBuilderService, normalize_filters
+from app.services.facets import facet_index
+from app.services.result_cache import result_cache
+from app.services.serialization import dumps, EncodedJSONResponse
+import json
 
 router = APIRouter(prefix="/datasets", tags=["Datasets"])
 
@@ -50,7 +58,7 @@ def list_available_tables(db: Session = Depends(get_db)):
             
             # Get columns
             columns = inspector.get_columns(table)
-            column_names = [col['name'] for col in columns]
+            column_names = [col['name'] for col in columns if not schema_registry.is_internal_column(col['name'])]
             
             # Check if registered
             is_registered = table in registered_datasets
@@ -138,6 +146,12 @@ def create_dataset(
     db.commit()
     db.refresh(dataset)
     
+    # The table may have been created out-of-band; forget any stale schema
+    schema_registry.invalidate(dataset.table_name)
+    
+    # Index the hot JSON keys declared for data_records-backed datasets
+    QueryBuilderService(db).create_json_indexes(dataset)
+    
     return dataset
 
 
@@ -170,6 +184,11 @@ def update_dataset(
     db.commit()
     db.refresh(dataset)
     
+    dataset_versions.bump(db, dataset.table_name)
+    
+    # The config may declare new JSON keys to index
+    QueryBuilderService(db).create_json_indexes(dataset)
+    
     return dataset
 
 
@@ -193,9 +212,12 @@ def delete_dataset(
             detail="Dataset not found"
         )
     
+    table_name = dataset.table_name
     db.delete(dataset)
     db.commit()
     
+    dataset_versions.bump(db, table_name)
+    
     return None
 
 
@@ -266,6 +288,8 @@ def get_dataset_schema(
     
     schema_info = []
     for col in columns:
+        if schema_registry.is_internal_column(col['name']):
+            continue
         schema_info.append({
             'name': col['name'],
             'type': str(col['type']),
@@ -274,7 +298,10 @@ def get_dataset_schema(
         })
     
     # Get indexes
-    indexes = inspector.get_indexes(dataset.table_name)
+    indexes = [
+        index for index in inspector.get_indexes(dataset.table_name)
+        if not any(schema_registry.is_internal_column(name) for name in index.get('column_names') or [] if name)
+    ]
     
     # Get row count
     row_count = db.execute(text(f"SELECT COUNT(*) FROM {dataset.table_name}")).scalar()
@@ -290,3 +317,98 @@ def get_dataset_schema(
         'config_schema': dataset.config.get('schema', []) if dataset.config else [],
         'row_count': row_count
     }
+
+
+@router.get("/{dataset_id}/facets")
+def get_dataset_facets(
+    dataset_id: int,
+    columns: str = Query(..., description="Comma-separated columns, e.g. State_Ut_Code,Sector"),
+    filters: Optional[str] = Query(None, description="JSON filters, same DSL as /query/{table_name}"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Distinct values of columns with their row counts, for filter dropdowns
+    
+    Without `filters` the counts come precomputed from ingestion. With
+    `filters` they count only matching rows, e.g. the districts of one
+    state: `columns=District_Code&filters={"State_Ut_Code": 36}`.
+    
+    Each column reports its `values` (`value`, `count`) in value order,
+    `distinct_values` and the `source` of the counts (`precomputed`,
+    `bitmap` or `sql`). NULL and blank values are left out.
+    """
+    # Check rate limits
+    access_control = AccessControlService(db)
+    access_control.check_rate_limit(current_user)
+    
+    dataset = db.query(Dataset).filter(Dataset.id == dataset_id).first()
+    if not dataset:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dataset not found"
+        )
+    
+    column_list = [c.strip() for c in columns.split(',') if c.strip()]
+    if not column_list:
+        raise HTTPException(status_code=400, detail="columns must name at least one column")
+    
+    filter_dict = {}
+    if filters:
+        try:
+            filter_dict = json.loads(filters)
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="Invalid JSON in filters parameter")
+    
+    dedicated_table = schema_registry.has_table(dataset.table_name, db.bind)
+    
+    # Filtered facets are cached per data version like query results
+    version = dataset_versions.get(db, dataset.table_name)
+    cache_key = result_cache.make_key(
+        dataset.table_name,
+        version,
+        kind="facets",
+        columns=column_list,
+        filters=normalize_filters(filter_dict)
+    )
+    facets = result_cache.get(cache_key) if filter_dict else None
+    
+    if facets is None:
+        try:
+            if dedicated_table:
+                facets = facet_index.facets(db, dataset.table_name, column_list, filter_dict)
+            else:
+                facets = facet_index.json_facets(db, dataset.id, column_list, filter_dict)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        if filter_dict:
+            result_cache.set(cache_key, facets)
+    
+    # Encode once; the exact byte length is what gets metered and sent
+    body = dumps({
+        'dataset_id': dataset.id,
+        'table_name': dataset.table_name if dedicated_table else 'data_records',
+        'filters_applied': filter_dict,
+        'facets': facets
+    })
+    response_size = len(body)
+    
+    # Check volume limits
+    access_control.check_volume_limit(current_user, response_size)
+    
+    # Charge for query
+    payment_service = PaymentService(db)
+    payment_service.charge_for_query(current_user, response_size)
+    
+    # Log usage
+    access_control.log_usage(
+        user=current_user,
+        endpoint=f"/api/v1/datasets/{dataset_id}/facets",
+        method="GET",
+        dataset_name=dataset.name,
+        query_params=json.dumps({'columns': column_list, 'filters': filter_dict}),
+        response_size=response_size
+    )
+    
+    return EncodedJSONResponse(body)
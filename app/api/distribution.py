@@ -0,0 +1,147 @@
+"""
+Distribution API endpoints
+"""
+from fastapi import APIRouter, Depends, Query as QueryParam, HTTPException, Request
+from sqlalchemy.orm import Session
+from typing import Optional
+from app.database import get_db
+from app.models.user import User
+from app.auth import get_current_user
+from app.services.distribution import DistributionService
+from app.services.access_control import AccessControlService
+from app.services.payment import PaymentService
+from app.services.query_guard import QueryGuard, QueryTimeoutError, QueryCancelledError, watch_disconnect
+from app.services.schema_registry import schema_registry
+from app.services.dataset_version import dataset_versions
+from app.services.result_cache import result_cache
+from app.services.query_builder import normalize_filters
+from app.services.serialization import dumps, EncodedJSONResponse
+import json
+import threading
+
+router = APIRouter(prefix="/distribution", tags=["Distribution"])
+
+
+@router.get("/{table_name}/{column}")
+def column_distribution(
+    table_name: str,
+    column: str,
+    request: Request,
+    filters: Optional[str] = QueryParam(None, description="JSON filters, same DSL as /query/{table_name}"),
+    weight: Optional[str] = QueryParam(None, description="Weight column, e.g. Subsample_Multiplier"),
+    bins: int = QueryParam(20, ge=1, le=DistributionService.MAX_BINS, description="Number of equal-width histogram bins"),
+    range_min: Optional[float] = QueryParam(None, description="Lower edge of the histogram (default: smallest value)"),
+    range_max: Optional[float] = QueryParam(None, description="Upper edge of the histogram (default: largest value)"),
+    quantiles: Optional[str] = QueryParam(None, description="Comma-separated shares, e.g. 0.1,0.5,0.9"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Weighted histogram and quantiles of a numeric column
+    
+    Computed in the database tier over just the column (and weight) of the
+    matching rows, so no raw rows leave the server.
+    
+    Returns `summary` (`n`, `total_weight`, `min`, `max`, weighted `mean`
+    and `std`), `quantiles` (weighted; default deciles 0.1/0.9, quartiles
+    and the median) and `histogram` bins with `n`, weighted `weight` and
+    `share` of the total weight. Blank values are left out.
+    
+    **Examples:**
+    
+    Weighted distribution of salaried earnings of urban women:
+    ```
+    GET /api/v1/distribution/person_survey/CWS_Earnings_Salaried?filters={"Sector": 2, "Sex": 2}&weight=Subsample_Multiplier&bins=25
+    ```
+    
+    Monthly expenditure percentiles for one state:
+    ```
+    GET /api/v1/distribution/household_survey/Monthly_Consumer_Expenditure?filters={"State_Ut_Code": 36}&weight=Subsample_Multiplier&quantiles=0.05,0.5,0.95
+    ```
+    """
+    
+    # Check rate limits
+    access_control = AccessControlService(db)
+    access_control.check_rate_limit(current_user)
+    
+    # Parse filters
+    filter_dict = {}
+    if filters:
+        try:
+            filter_dict = json.loads(filters)
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="Invalid JSON in filters parameter")
+    
+    if not schema_registry.has_table(table_name, db.bind):
+        raise HTTPException(status_code=404, detail=f"Table '{table_name}' not found")
+    
+    try:
+        quantile_list = DistributionService.parse_quantiles(quantiles)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Serve repeated requests from the result cache; metering still runs below
+    version = dataset_versions.get(db, table_name)
+    cache_key = result_cache.make_key(
+        table_name,
+        version,
+        kind="distribution",
+        column=column,
+        filters=normalize_filters(filter_dict),
+        weight=weight,
+        bins=bins,
+        range_min=range_min,
+        range_max=range_max,
+        quantiles=quantile_list
+    )
+    result = result_cache.get(cache_key)
+    
+    if result is None:
+        cancel_event = threading.Event()
+        stop_watching = watch_disconnect(request.receive, cancel_event)
+        try:
+            with QueryGuard(db, table_name, access_control.query_timeout(current_user), cancel_event):
+                result = DistributionService(db).compute(
+                    table_name=table_name,
+                    column_name=column,
+                    filters=filter_dict,
+                    weight=weight,
+                    bins=bins,
+                    range_min=range_min,
+                    range_max=range_max,
+                    quantiles=quantile_list
+                )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except QueryTimeoutError as e:
+            raise HTTPException(status_code=504, detail=str(e))
+        except QueryCancelledError:
+            # Nobody is listening any more; skip metering and caching
+            raise HTTPException(status_code=499, detail="Client closed request")
+        finally:
+            stop_watching()
+        
+        result_cache.set(cache_key, result)
+    
+    # Encode once; the exact byte length is what gets metered and sent
+    body = dumps(result)
+    response_size = len(body)
+    
+    # Check volume limits
+    access_control.check_volume_limit(current_user, response_size)
+    
+    # Charge for query
+    payment_service = PaymentService(db)
+    payment_service.charge_for_query(current_user, response_size)
+    
+    # Log usage
+    access_control.log_usage(
+        user=current_user,
+        endpoint=f"/api/v1/distribution/{table_name}/{column}",
+        method="GET",
+        dataset_name=table_name,
+        query_params=json.dumps({'filters': filter_dict, 'weight': weight, 'bins': bins, 'quantiles': quantile_list}),
+        response_size=response_size
+    )
+    
+    return EncodedJSONResponse(body)
@@ -3,15 +3,53 @@ Data visualization endpoints for charts and tables
 """
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Optional, List, Dict, Any
 from app.database import get_db
 from app.models.user import User
 from app.auth import get_current_user
 from app.services.export import ExportService
 from app.services.access_control import AccessControlService
+from app.services.query_builder import QueryBuilderService
+from app.services.schema_registry import schema_registry
 
 router = APIRouter(prefix="/export", tags=["Data Export & Visualization"])
 
+# Exportable reference datasets: typed table and output labels per column
+REFERENCE_EXPORTS = {
+    "plfs_districts": {
+        "table_name": "plfs_district_codes",
+        "csv": {"STATE_NAME": "state", "DISTRICT_NAME": "district", "DISTRICT_CODE": "nss_code"},
+        "table": {"STATE_NAME": "State", "DISTRICT_NAME": "District", "DISTRICT_CODE": "NSS Code"}
+    },
+    "plfs_items": {
+        "table_name": "plfs_item_codes",
+        "csv": {"ITEM_DESCRIPTION": "item", "CODE": "code", "BLOCK": "block"},
+        "table": {"ITEM_DESCRIPTION": "Item", "CODE": "Code", "BLOCK": "Block"}
+    }
+}
+
+
+def fetch_reference_rows(db: Session, dataset: str, view: str, limit: int) -> List[Dict[str, Any]]:
+    """Read an exportable reference dataset through the table query path"""
+    export = REFERENCE_EXPORTS.get(dataset)
+    if export is None or not schema_registry.has_table(export["table_name"], db.bind):
+        return []
+    
+    labels = export[view]
+    result = QueryBuilderService(db).execute_table_query(
+        export["table_name"],
+        fields=list(labels),
+        limit=limit,
+        include_total="none"
+    )
+    
+    # Table cells show missing values as blanks
+    blank = "" if view == "table" else None
+    return [
+        {label: blank if row[column] is None else row[column] for column, label in labels.items()}
+        for row in result["data"]
+    ]
+
 
 @router.get("/csv")
 def export_to_csv(
@@ -38,36 +76,7 @@ def export_to_csv(
     access_control.check_rate_limit(current_user)
     
     # Get data based on dataset
-    if dataset == "plfs_districts":
-        from app.models.user import PLFSData
-        records = db.query(PLFSData).filter(
-            PLFSData.dataset_name == "District_codes_PLFS"
-        ).limit(limit).all()
-        
-        data = [
-            {
-                "state": r.data.get("Unnamed: 1"),
-                "district": r.data.get("Unnamed: 3"),
-                "nss_code": r.data.get("Unnamed: 2")
-            }
-            for r in records
-        ]
-    elif dataset == "plfs_items":
-        from app.models.user import PLFSData
-        records = db.query(PLFSData).filter(
-            PLFSData.dataset_name == "PLFS_Item_Codes"
-        ).limit(limit).all()
-        
-        data = [
-            {
-                "item": r.data.get("Unnamed: 1"),
-                "code": r.data.get("Unnamed: 3"),
-                "block": r.sheet
-            }
-            for r in records
-        ]
-    else:
-        data = []
+    data = fetch_reference_rows(db, dataset, 'csv', limit)
     
     # Log usage
     access_control.log_usage(
@@ -167,36 +176,7 @@ def get_table_data(
     access_control.check_rate_limit(current_user)
     
     # Get data
-    if dataset == "plfs_districts":
-        from app.models.user import PLFSData
-        records = db.query(PLFSData).filter(
-            PLFSData.dataset_name == "District_codes_PLFS"
-        ).limit(limit).all()
-        
-        data = [
-            {
-                "State": r.data.get("Unnamed: 1", ""),
-                "District": r.data.get("Unnamed: 3", ""),
-                "NSS Code": r.data.get("Unnamed: 2", "")
-            }
-            for r in records
-        ]
-    elif dataset == "plfs_items":
-        from app.models.user import PLFSData
-        records = db.query(PLFSData).filter(
-            PLFSData.dataset_name == "PLFS_Item_Codes"
-        ).limit(limit).all()
-        
-        data = [
-            {
-                "Item": r.data.get("Unnamed: 1", ""),
-                "Code": r.data.get("Unnamed: 3", ""),
-                "Block": r.sheet or ""
-            }
-            for r in records
-        ]
-    else:
-        data = []
+    data = fetch_reference_rows(db, dataset, 'table', limit)
     
     # Prepare table data
     export_service = ExportService()
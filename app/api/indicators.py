@@ -0,0 +1,144 @@
+"""
+Labour-force indicator API endpoints
+"""
+from fastapi import APIRouter, Depends, Query as QueryParam, HTTPException
+from sqlalchemy.orm import Session
+from typing import Optional
+from app.database import get_db
+from app.models.dataset import Dataset
+from app.models.user import User
+from app.auth import get_current_user
+from app.services.indicators import IndicatorService
+from app.services.parameter_resolver import parameter_resolver
+from app.services.access_control import AccessControlService
+from app.services.payment import PaymentService
+from app.services.dataset_version import dataset_versions
+from app.services.result_cache import result_cache
+from app.services.serialization import dumps, EncodedJSONResponse
+import json
+
+router = APIRouter(prefix="/indicators", tags=["Indicators"])
+
+
+def split_list(value: Optional[str]):
+    """Items of a comma-separated parameter"""
+    return [item.strip() for item in value.split(',') if item.strip()] if value else []
+
+
+@router.get("/{table_name}")
+def labour_force_indicators(
+    table_name: str,
+    status: str = QueryParam("ps_ss", description="Activity status approach: ps_ss (usual status) or cws"),
+    indicators: Optional[str] = QueryParam(None, description="Comma-separated: lfpr, wpr, ur (default all)"),
+    by: Optional[str] = QueryParam(None, description="Comma-separated breakdowns: quarter, state, district, sector, sex, age_group"),
+    state: Optional[str] = QueryParam(None, description="State name or code"),
+    district: Optional[str] = QueryParam(None, description="District name or code"),
+    sector: Optional[int] = QueryParam(None, description="1 = rural, 2 = urban"),
+    gender: Optional[str] = QueryParam(None, description="Male/Female/Transgender, M/F/T or code"),
+    age_group: Optional[str] = QueryParam(None, description="Stored age group or a range of whole groups, e.g. 15-29 or 15+"),
+    quarter: Optional[str] = QueryParam(None, description="Comma-separated quarters, e.g. Q1,Q2"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    PLFS Labour Force Participation Rate, Worker Population Ratio and
+    Unemployment Rate
+    
+    Served from weighted sums precomputed at ingestion, so every breakdown
+    is a small GROUP BY over summary cells instead of a pass over the raw
+    rows. Rates are in percent; each row also carries the weighted
+    population, labour force, workers and unemployed and `sample_rows`.
+    
+    State, district and gender accept names as in `/query`.
+    
+    **Examples:**
+    
+    Headline rates (15 years and above) by sector and sex:
+    ```
+    GET /api/v1/indicators/person_survey?by=sector,sex&age_group=15%2B
+    ```
+    
+    Quarterly CWS unemployment rate of young people in one state, by district:
+    ```
+    GET /api/v1/indicators/person_survey?status=cws&indicators=ur&state=Telangana&age_group=15-29&by=quarter,district
+    ```
+    """
+    
+    # Check rate limits
+    access_control = AccessControlService(db)
+    access_control.check_rate_limit(current_user)
+    
+    dataset = db.query(Dataset).filter(Dataset.table_name == table_name).first()
+    spec = (dataset.config or {}).get('indicators') if dataset else None
+    if not spec:
+        raise HTTPException(status_code=404, detail=f"No indicators for table '{table_name}'")
+    
+    # Friendly names resolve to the person table's columns, which map back to the stored breakdowns
+    try:
+        resolved = parameter_resolver.resolve(db, table_name, {'state': state, 'district': district, 'gender': gender})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    breakdowns = {column: name for name, column in spec['dimensions'].items()}
+    filters = {breakdowns[column]: value for column, value in resolved.items() if column in breakdowns}
+    if sector is not None:
+        filters['sector'] = sector
+    if quarter:
+        filters['quarter'] = split_list(quarter)
+    
+    indicator_list = split_list(indicators)
+    by_list = split_list(by)
+    
+    # Serve repeated requests from the result cache; metering still runs below
+    version = dataset_versions.get(db, table_name)
+    cache_key = result_cache.make_key(
+        table_name,
+        version,
+        kind="indicators",
+        status=status,
+        indicators=indicator_list,
+        by=by_list,
+        filters=filters,
+        age_group=age_group
+    )
+    result = result_cache.get(cache_key)
+    
+    if result is None:
+        try:
+            result = IndicatorService(db).query(
+                table_name=table_name,
+                spec=spec,
+                status=status,
+                indicators=indicator_list,
+                by=by_list,
+                filters=filters,
+                age_group=age_group
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except LookupError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        
+        result_cache.set(cache_key, result)
+    
+    # Encode once; the exact byte length is what gets metered and sent
+    body = dumps(result)
+    response_size = len(body)
+    
+    # Check volume limits
+    access_control.check_volume_limit(current_user, response_size)
+    
+    # Charge for query
+    payment_service = PaymentService(db)
+    payment_service.charge_for_query(current_user, response_size)
+    
+    # Log usage
+    access_control.log_usage(
+        user=current_user,
+        endpoint=f"/api/v1/indicators/{table_name}",
+        method="GET",
+        dataset_name=table_name,
+        query_params=json.dumps({'status': status, 'by': by_list, 'filters': filters, 'age_group': age_group}),
+        response_size=response_size
+    )
+    
+    return EncodedJSONResponse(body)
@@ -9,6 +9,9 @@ from app.models import Dataset, DataRecord
 from app.models.user import User
 from app.auth import get_current_user
 from app.services.access_control import AccessControlService
+from app.services.query_builder import QueryBuilderService
+from app.services.schema_registry import schema_registry
+from app.services.full_text_search import FullTextSearchService
 import json
 
 router = APIRouter(prefix="/plfs", tags=["PLFS Data"])
@@ -64,17 +67,14 @@ def get_plfs_records(
     if not dataset:
         raise HTTPException(status_code=404, detail="Dataset not found")
     
-    # Build query
-    query = db.query(DataRecord).filter(DataRecord.dataset_id == dataset_id)
-    
-    # Filter by sheet if provided
-    if sheet:
-        # This requires checking JSON field - SQLite doesn't support JSON queries well
-        # For PostgreSQL, you would use: query = query.filter(DataRecord.data['sheet'].astext == sheet)
-        pass
+    # Build query; the sheet filter runs on the JSON key in the database
+    query = db.query(DataRecord).filter(
+        DataRecord.dataset_id == dataset_id,
+        *QueryBuilderService(db).build_json_conditions({'sheet': sheet} if sheet else None)
+    )
     
     total_count = query.count()
-    records = query.limit(limit).offset(offset).all()
+    records = query.order_by(DataRecord.id).limit(limit).offset(offset).all()
     
     # Extract data
     data = [record.data for record in records]
@@ -102,6 +102,55 @@ def get_plfs_records(
     }
 
 
+def query_reference_table(
+    db: Session,
+    table_name: str,
+    label: str,
+    filters: Dict[str, Any],
+    limit: int,
+    offset: int = 0
+) -> Dict[str, Any]:
+    """Query a typed PLFS reference table through the table query path"""
+    if not schema_registry.has_table(table_name, db.bind):
+        raise HTTPException(
+            status_code=404,
+            detail=f"{label} table not found - run materialize_reference_tables.py"
+        )
+    
+    return QueryBuilderService(db).execute_table_query(
+        table_name,
+        filters=filters,
+        limit=limit,
+        offset=offset
+    )
+
+
+def search_reference_table(
+    db: Session,
+    table_name: str,
+    label: str,
+    q: str,
+    filters: Dict[str, Any],
+    limit: int,
+    offset: int = 0
+) -> Dict[str, Any]:
+    """Ranked full-text search over a typed PLFS reference table"""
+    search_service = FullTextSearchService(db)
+    dataset = db.query(Dataset).filter(Dataset.table_name == table_name).first()
+    columns = (dataset.config or {}).get('full_text') if dataset else None
+    
+    if not columns or not search_service.has_index(table_name):
+        raise HTTPException(
+            status_code=404,
+            detail=f"{label} search index not found - run materialize_reference_tables.py"
+        )
+    
+    try:
+        return search_service.search(table_name, columns, q, filters=filters, limit=limit, offset=offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.get("/district-codes")
 def get_district_codes(
     state: Optional[str] = QueryParam(None, description="Filter by state name"),
@@ -112,101 +161,62 @@ def get_district_codes(
 ):
     """
     Get district codes from PLFS data
-    """
-    # Find district codes dataset
-    dataset = db.query(Dataset).filter(
-        Dataset.name.like('%District_codes%')
-    ).first()
-    
-    if not dataset:
-        raise HTTPException(status_code=404, detail="District codes dataset not found")
     
-    # Get records
-    query = db.query(DataRecord).filter(DataRecord.dataset_id == dataset.id)
+    Reads the `plfs_district_codes` table (STATE_CODE, STATE_NAME,
+    DISTRICT_CODE, DISTRICT_NAME). `state` matches part of the state name,
+    case-insensitively.
+    """
+    filters = {}
+    if state:
+        filters['STATE_NAME'] = {'$contains': state}
     
-    total_count = query.count()
+    return query_reference_table(db, 'plfs_district_codes', 'District codes', filters, limit, offset)
+
+
+@router.get("/district-codes/search")
+def search_district_codes(
+    q: str = QueryParam(..., min_length=1, description="Words or word prefixes of district/state names"),
+    state_code: Optional[int] = QueryParam(None, description="Restrict to a state/UT code"),
+    limit: int = QueryParam(20, ge=1, le=100),
+    offset: int = QueryParam(0, ge=0),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Full-text search over district and state names, best matches first
     
-    # Helper function to rename fields for better readability
-    def rename_district_fields(record):
-        """Rename Unnamed columns to meaningful names"""
-        renamed = record.copy()
-        if 'Unnamed: 1' in renamed:
-            renamed['STATE_NAME'] = renamed.pop('Unnamed: 1')
-        if 'Unnamed: 2' in renamed:
-            renamed['DISTRICT_CODE'] = renamed.pop('Unnamed: 2')
-        if 'Unnamed: 3' in renamed:
-            renamed['DISTRICT_NAME'] = renamed.pop('Unnamed: 3')
-        return renamed
+    Every word is matched as a prefix (`q=bangal` finds Bangalore), and all
+    words must match. Each row carries a relevance `score`.
+    """
+    filters = {}
+    if state_code is not None:
+        filters['STATE_CODE'] = state_code
     
-    # If filtering by state, fetch ALL records first, then filter
-    # (because SQLite doesn't support JSON querying efficiently)
-    if state:
-        # Fetch all records
-        all_records = query.all()
-        all_data = [record.data for record in all_records]
-        
-        # Filter by state - the state name is stored in 'Unnamed: 1' field from Excel import
-        filtered_data = [d for d in all_data if state.lower() in str(d.get('Unnamed: 1', '')).lower()]
-        
-        # Apply pagination to filtered results
-        paginated_data = filtered_data[offset:offset + limit]
-        
-        # Rename fields for better readability
-        data = [rename_district_fields(d) for d in paginated_data]
-        
-        return {
-            'total_records': total_count,
-            'filtered_count': len(filtered_data),
-            'returned_records': len(data),
-            'data': data
-        }
-    else:
-        # No filter - just apply pagination directly
-        records = query.limit(limit).offset(offset).all()
-        raw_data = [record.data for record in records]
-        
-        # Rename fields for better readability
-        data = [rename_district_fields(d) for d in raw_data]
-        
-        return {
-            'total_records': total_count,
-            'returned_records': len(data),
-            'data': data
-        }
+    return search_reference_table(db, 'plfs_district_codes', 'District codes', q, filters, limit, offset)
 
 
 @router.get("/data-layout")
 def get_plfs_data_layout(
     block: Optional[str] = QueryParam(None, description="Filter by block name"),
+    file: Optional[str] = QueryParam(None, description="Filter by unit-level file (e.g. CHHV1.txt)"),
+    limit: int = QueryParam(1000, ge=1, le=1000),
+    offset: int = QueryParam(0, ge=0),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Get PLFS data layout information
-    """
-    # Find data layout dataset
-    dataset = db.query(Dataset).filter(
-        Dataset.name.like('%Data_Layout%')
-    ).first()
-    
-    if not dataset:
-        raise HTTPException(status_code=404, detail="Data layout dataset not found")
-    
-    # Get all records
-    records = db.query(DataRecord).filter(
-        DataRecord.dataset_id == dataset.id
-    ).all()
-    
-    data = [record.data for record in records]
     
-    # Filter by block if provided
+    Reads the `plfs_data_layout` table, one row per field of the unit-level
+    files with its byte positions.
+    """
+    filters = {}
     if block:
-        data = [d for d in data if block.lower() in str(d.get('Block', '')).lower()]
+        filters['BLOCK'] = {'$contains': block}
+    if file:
+        filters['FILE'] = {'$contains': file}
     
-    return {
-        'total_records': len(data),
-        'data': data
-    }
+    return query_reference_table(db, 'plfs_data_layout', 'Data layout', filters, limit, offset)
 
 
 @router.get("/item-codes")
@@ -214,44 +224,52 @@ def get_plfs_item_codes(
     block: Optional[str] = QueryParam(None, description="Filter by block (e.g., 'Block 1', 'Block 4')"),
     search: Optional[str] = QueryParam(None, description="Search in item descriptions"),
     limit: int = QueryParam(100, ge=1, le=1000),
+    offset: int = QueryParam(0, ge=0),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Get PLFS item codes and descriptions
+    
+    Reads the `plfs_item_codes` table (BLOCK, ITEM_NO, ITEM_DESCRIPTION,
+    CODE_DESCRIPTION, CODE). With `search`, rows are ranked by full-text
+    relevance across descriptions and codes (see `/item-codes/search`).
     """
-    # Find item codes dataset
-    dataset = db.query(Dataset).filter(
-        Dataset.name.like('%Item Code Description%')
-    ).first()
+    filters = {}
+    if block:
+        filters['BLOCK'] = {'$contains': block}
     
-    if not dataset:
-        raise HTTPException(status_code=404, detail="Item codes dataset not found")
+    if search:
+        return search_reference_table(db, 'plfs_item_codes', 'Item codes', search, filters, limit, offset)
     
-    # Get records
-    records = db.query(DataRecord).filter(
-        DataRecord.dataset_id == dataset.id
-    ).limit(limit).all()
+    return query_reference_table(db, 'plfs_item_codes', 'Item codes', filters, limit, offset)
+
+
+@router.get("/item-codes/search")
+def search_plfs_item_codes(
+    q: str = QueryParam(..., min_length=1, description="Words or word prefixes of item/code descriptions or codes"),
+    block: Optional[str] = QueryParam(None, description="Filter by block (e.g., 'Block 1', 'Block 4')"),
+    limit: int = QueryParam(20, ge=1, le=100),
+    offset: int = QueryParam(0, ge=0),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Full-text search over item descriptions, code descriptions and codes
     
-    data = [record.data for record in records]
+    Every word is matched as a prefix and all words must match; results are
+    ranked by relevance (`score`) and paginated with `limit`/`offset`.
     
-    # Filter by sheet/block if provided
+    **Example:**
+    ```
+    GET /api/v1/plfs/item-codes/search?q=casual wage&block=Block 5.1
+    ```
+    """
+    filters = {}
     if block:
-        data = [d for d in data if block.lower() in str(d.get('sheet', '')).lower()]
-    
-    # Search in descriptions
-    if search:
-        search_lower = search.lower()
-        data = [
-            d for d in data 
-            if search_lower in str(d.get('Item Description', '')).lower() or
-               search_lower in str(d.get('Item Code', '')).lower()
-        ]
+        filters['BLOCK'] = {'$contains': block}
     
-    return {
-        'total_records': len(data),
-        'data': data
-    }
+    return search_reference_table(db, 'plfs_item_codes', 'Item codes', q, filters, limit, offset)
 
 
 @router.get("/summary")
@@ -1,23 +1,128 @@
 """
 Query API endpoints
 """
-from fastapi import APIRouter, Depends, Query as QueryParam, HTTPException
+from fastapi import APIRouter, Depends, Query as QueryParam, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
-from typing import Optional, Dict, Any
-from app.database import get_db
-from app.models.user import User
+from typing import Optional, Dict, Any, Callable, List, Iterator
+from functools import partial
+from app.database import get_db, SessionLocal
+from app.models import CensusData, DataRecord, Dataset
+from app.models.user import User, UserRole
 from app.schemas.dataset import QueryResponse
 from app.auth import get_current_user
-from app.services.query_builder import QueryBuilderService
-from app.services.access_control import AccessControlService
+from app.services.query_builder import QueryBuilderService, normalize_filters, decode_cursor
+from app.services.access_control import AccessControlService, QueryAdmission
+from app.services.cost_estimator import QueryCostEstimator
+from app.services.query_guard import (
+    QueryGuard, QueryTimeoutError, QueryCancelledError, query_metrics, watch_disconnect
+)
+from app.services.sampling import SamplingService, SAMPLE_KEY_RANGE
+from app.services.household_join import HouseholdJoinService, PERSON_TABLE, HOUSEHOLD_TABLE
+from app.services.parameter_resolver import parameter_resolver
 from app.services.payment import PaymentService
+from app.services.schema_registry import schema_registry
+from app.services.dataset_version import dataset_versions
+from app.services.result_cache import result_cache
+from app.services.serialization import dumps, EncodedJSONResponse
+from app.services.arrow_export import ArrowExportService, load_pyarrow, ARROW_MEDIA_TYPE, PARQUET_MEDIA_TYPE
 import json
+import logging
+import random
+import threading
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/query", tags=["Query"])
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def encode_ndjson(batches: Iterator[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    """Encode row batches as newline-delimited JSON, one chunk per batch"""
+    for batch in batches:
+        yield ''.join(json.dumps(row, default=str) + '\n' for row in batch).encode('utf-8')
+
+
+def stream_table_response(
+    user_id: int,
+    table_name: str,
+    filters: Dict[str, Any],
+    fields: Optional[List[str]],
+    limit: int,
+    offset: int,
+    cursor: Optional[str],
+    encode: Callable[[Iterator[List[Dict[str, Any]]]], Iterator[bytes]],
+    admission: QueryAdmission,
+    timeout_seconds: float,
+    receive: Callable
+) -> Iterator[bytes]:
+    """
+    Stream encoded table rows and meter the bytes actually sent
+    
+    Runs on its own session because the request's session is closed before
+    a streaming response body is produced. The charge and usage log entry
+    are recorded once the stream ends, including when the client
+    disconnects early; the query's admission is released then too.
+    
+    The whole stream runs under the user's query deadline; a timeout or a
+    client disconnect aborts the database work and ends the stream.
+    """
+    db = SessionLocal()
+    bytes_sent = 0
+    cancel_event = threading.Event()
+    stop_watching = watch_disconnect(receive, cancel_event)
+    
+    try:
+        with QueryGuard(db, table_name, timeout_seconds, cancel_event):
+            query_builder = QueryBuilderService(db)
+            batches = query_builder.stream_table_query(
+                table_name=table_name,
+                filters=filters,
+                fields=fields,
+                limit=limit,
+                offset=offset,
+                cursor=cursor
+            )
+            for chunk in encode(batches):
+                bytes_sent += len(chunk)
+                yield chunk
+    
+    except (QueryTimeoutError, QueryCancelledError) as e:
+        # Headers are already sent; the stream just ends early
+        logger.warning(f"Streamed query on '{table_name}' aborted: {e}")
+    
+    finally:
+        stop_watching()
+        admission.release()
+        
+        try:
+            user = db.get(User, user_id)
+            
+            # Charge for query
+            payment_service = PaymentService(db)
+            payment_service.charge_for_query(user, bytes_sent)
+        except HTTPException as e:
+            # Headers are already sent; record the failed charge in the log only
+            logger.warning(f"Could not charge user {user_id} for streamed query: {e.detail}")
+        
+        # Log usage
+        access_control = AccessControlService(db)
+        access_control.log_usage(
+            user=user,
+            endpoint=f"/api/v1/query/{table_name}",
+            method="GET",
+            dataset_name=table_name,
+            query_params=json.dumps(filters),
+            response_size=bytes_sent
+        )
+        db.close()
+
 
 @router.get("", response_model=QueryResponse)
 def query_data(
+    request: Request,
     dataset: int = QueryParam(..., description="Dataset ID to query"),
     state: Optional[str] = QueryParam(None, description="Filter by state"),
     district: Optional[str] = QueryParam(None, description="Filter by district"),
@@ -35,8 +140,14 @@ def query_data(
     Query data with multi-dimensional filters using dataset ID
     
     Example: /query?dataset=2&state=TELANGANA
+    Example: /query?dataset=5&district=Nirmal&gender=F&age_group=15-29
     Example: /query?dataset=4&limit=100
     
+    State names resolve through the NSS state codes in the dataset YAML,
+    falling back to the PLFS district codes table; district names need
+    that table, and a district name found in several states also needs
+    `state`.
+    
     Available dataset IDs:
     - 1: Data Layout
     - 2: District Codes  
@@ -44,8 +155,6 @@ def query_data(
     - 4: Household Survey
     - 5: Person Survey
     """
-    from app.models.dataset import Dataset
-    
     # Check rate limits and access control
     access_control = AccessControlService(db)
     access_control.check_rate_limit(current_user)
@@ -56,148 +165,100 @@ def query_data(
         raise HTTPException(status_code=404, detail=f"Dataset with ID {dataset} not found")
     
     # Check if dataset uses dedicated table or data_records
-    from sqlalchemy import inspect
-    inspector = inspect(db.bind)
-    has_dedicated_table = dataset_obj.table_name in inspector.get_table_names()
-    
-    # Map of state names to codes (from PLFS District Codes dataset)
-    STATE_CODES = {
-        'JAMMU & KASHMIR': 1, 'JAMMU AND KASHMIR': 1,
-        'HIMACHAL PRADESH': 2,
-        'PUNJAB': 3,
-        'CHANDIGARH': 4,
-        'UTTARAKHAND': 5,
-        'HARYANA': 6,
-        'DELHI': 7,
-        'RAJASTHAN': 8,
-        'UTTAR PRADESH': 9,
-        'BIHAR': 10,
-        'SIKKIM': 11,
-        'ARUNACHAL PRADESH': 12,
-        'NAGALAND': 13,
-        'MANIPUR': 14,
-        'MIZORAM': 15,
-        'TRIPURA': 16,
-        'MEGHALAYA': 17,
-        'ASSAM': 18,
-        'WEST BENGAL': 19,
-        'JHARKHAND': 20,
-        'ODISHA': 21,
-        'CHHATTISGARH': 22,
-        'MADHYA PRADESH': 23,
-        'GUJARAT': 24,
-        'DAMAN & DIU & D & N HAVELI': 25, 'DADRA AND NAGAR HAVELI AND DAMAN AND DIU': 25,
-        'MAHARASHTRA': 27,
-        'ANDHRA PRADESH': 28,
-        'KARNATAKA': 29,
-        'GOA': 30,
-        'LAKSHADWEEP': 31,
-        'KERALA': 32,
-        'TAMIL NADU': 33,
-        'PUDUCHERRY': 34,
-        'A & N ISLANDS': 35, 'ANDAMAN AND NICOBAR ISLANDS': 35,
-        'TELANGANA': 36,
-        'LADAKH': 37
-    }
-    
-    # Build filters - map generic names to actual column names
-    filters = {}
-    print(f"DEBUG: Query parameters - dataset={dataset}, state={state}, district={district}, gender={gender}, age={age}, year={year}")
+    has_dedicated_table = schema_registry.has_table(dataset_obj.table_name, db.bind)
+    
+    # Map friendly parameters to the dataset's columns and codes (see `parameters` in its YAML)
+    try:
+        filters = parameter_resolver.resolve(db, dataset_obj.table_name, {
+            'state': state,
+            'district': district,
+            'gender': gender,
+            'age_group': age,
+            'year': year
+        })
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Serve repeated requests from the result cache; metering still runs below
+    version = dataset_versions.get(db, dataset_obj.table_name)
+    cache_key = result_cache.make_key(
+        dataset_obj.table_name,
+        version,
+        dataset=dataset,
+        filters=normalize_filters(filters),
+        limit=limit,
+        offset=offset,
+        order_by=order_by,
+        order_direction=order_direction
+    )
+    result = result_cache.get(cache_key)
     
-    if has_dedicated_table:
-        # For dedicated tables (household_survey, person_survey), map to actual columns
-        table_name = dataset_obj.table_name.lower()
-        
-        if state:
-            # Try to convert state name to code
-            # Note: person_survey uses State_UT_Code, household_survey uses State_Ut_Code
-            state_column = 'State_UT_Code' if 'person' in table_name else 'State_Ut_Code'
-            if state.isdigit():
-                filters[state_column] = int(state)
-            elif state.upper() in STATE_CODES:
-                state_code = STATE_CODES[state.upper()]
-                filters[state_column] = state_code
-                print(f"DEBUG: Mapped state '{state}' to code {state_code} (column: {state_column})")
+    if result is not None:
+        result['cache_hit'] = True
+    else:
+        # Cost the query before admitting it
+        census = dataset_obj.name.lower().startswith("census")
+        estimator = QueryCostEstimator(db)
+        try:
+            if census:
+                estimate = estimator.estimate_table_query(
+                    CensusData.__tablename__, filters, limit=limit, offset=offset
+                )
+            elif has_dedicated_table:
+                estimate = estimator.estimate_table_query(
+                    dataset_obj.table_name, filters, limit=limit, offset=offset
+                )
             else:
-                print(f"DEBUG: State '{state}' not found in STATE_CODES")
+                estimate = estimator.estimate_records_query(dataset_obj, filters, limit=limit, offset=offset)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        if district:
-            # District should be a code
-            if district.isdigit():
-                filters['District_Code'] = int(district)
-            elif district.upper() == 'NIRMAL':
-                filters['District_Code'] = 4  # Nirmal district code
+        # Execute query
+        query_builder = QueryBuilderService(db)
+        cancel_event = threading.Event()
+        stop_watching = watch_disconnect(request.receive, cancel_event)
+        try:
+            with access_control.admit_query(current_user, estimate), \
+                    QueryGuard(db, dataset_obj.table_name, access_control.query_timeout(current_user), cancel_event):
+                if census:
+                    result = query_builder.execute_census_query(
+                        filters=filters,
+                        limit=limit,
+                        offset=offset,
+                        order_by=order_by,
+                        order_direction=order_direction
+                    )
+                elif has_dedicated_table:
+                    # Use table query for dedicated tables
+                    result = query_builder.execute_table_query(
+                        table_name=dataset_obj.table_name,
+                        filters=filters,
+                        fields=None,
+                        limit=limit,
+                        offset=offset
+                    )
+                else:
+                    # Use generic query for data_records JSON storage
+                    result = query_builder.execute_generic_query(
+                        dataset_name=dataset_obj.name,
+                        filters=filters,
+                        limit=limit,
+                        offset=offset
+                    )
+        except QueryTimeoutError as e:
+            raise HTTPException(status_code=504, detail=str(e))
+        except QueryCancelledError:
+            # Nobody is listening any more; skip metering and caching
+            raise HTTPException(status_code=499, detail="Client closed request")
+        finally:
+            stop_watching()
         
-        # Sex and Age filters only apply to Person Survey
-        if 'person' in table_name:
-            if gender:
-                # For person survey: Sex column (1=Male, 2=Female, 3=Transgender)
-                gender_upper = gender.upper()
-                if gender_upper in ['MALE', 'M', '1']:
-                    filters['Sex'] = 1
-                elif gender_upper in ['FEMALE', 'F', '2']:
-                    filters['Sex'] = 2
-                elif gender_upper in ['TRANSGENDER', 'T', '3']:
-                    filters['Sex'] = 3
-            
-            if age:
-                # Parse age range like "15-29"
-                if '-' in age:
-                    age_parts = age.split('-')
-                    if len(age_parts) == 2:
-                        filters['Age'] = {
-                            '$gte': int(age_parts[0]),
-                            '$lte': int(age_parts[1])
-                        }
-            elif age.isdigit():
-                filters['Age'] = int(age)
-    else:
-        # For JSON-based storage (data_records)
-        if state:
-            filters['state'] = state
-        if district:
-            filters['district'] = district
-        if gender:
-            filters['gender'] = gender
-        if age:
-            filters['age_group'] = age
-        if year:
-            filters['year'] = year
-    
-    print(f"DEBUG: Final filters dictionary: {filters}")
-    print(f"DEBUG: Dataset table name: {dataset_obj.table_name if has_dedicated_table else 'data_records'}")
-    
-    # Execute query
-    query_builder = QueryBuilderService(db)
+        result_cache.set(cache_key, result)
+        result['cache_hit'] = False
     
-    if dataset_obj.name.lower().startswith("census"):
-        result = query_builder.execute_census_query(
-            filters=filters,
-            limit=limit,
-            offset=offset,
-            order_by=order_by,
-            order_direction=order_direction
-        )
-    elif has_dedicated_table:
-        # Use table query for dedicated tables
-        result = query_builder.execute_table_query(
-            table_name=dataset_obj.table_name,
-            filters=filters,
-            fields=None,
-            limit=limit,
-            offset=offset
-        )
-    else:
-        # Use generic query for data_records JSON storage
-        result = query_builder.execute_generic_query(
-            dataset_name=dataset_obj.name,
-            filters=filters,
-            limit=limit,
-            offset=offset
-        )
-    
-    # Calculate response size
-    response_size = len(json.dumps(result))
+    # Encode once; the exact byte length is what gets metered and sent
+    body = dumps(result)
+    response_size = len(body)
     
     # Check volume limits
     access_control.check_volume_limit(current_user, response_size)
@@ -216,16 +277,196 @@ def query_data(
         response_size=response_size
     )
     
-    return result
+    return EncodedJSONResponse(body)
+
+
+@router.get("/cache/stats")
+def get_cache_stats(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Query result cache metrics (Admin only)
+    
+    Returns hit/miss/eviction counters, hit rate and the current size of the
+    in-process LRU tier, and whether the Redis tier is active.
+    """
+    access_control = AccessControlService(db)
+    access_control.check_permission(current_user, UserRole.ADMIN)
+    
+    return result_cache.stats()
+
+
+@router.get("/guard/stats")
+def get_query_guard_stats(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Query deadline and cancellation metrics (Admin only)
+    
+    Counts guarded table queries that completed, timed out (ran past the
+    role's deadline) or were cancelled (client disconnected), overall and
+    per table, plus the configured per-role deadlines.
+    """
+    access_control = AccessControlService(db)
+    access_control.check_permission(current_user, UserRole.ADMIN)
+    
+    return {
+        **query_metrics.stats(),
+        'timeouts_seconds': {role.value: seconds for role, seconds in AccessControlService.QUERY_TIMEOUTS.items()}
+    }
+
+
+@router.get("/join/person-household", response_model=QueryResponse)
+def query_person_household(
+    request: Request,
+    person_filters: Optional[str] = QueryParam(None, description="JSON filters on person_survey columns"),
+    household_filters: Optional[str] = QueryParam(None, description="JSON filters on household_survey columns"),
+    person_fields: Optional[str] = QueryParam(None, description="Comma-separated person fields (default: all)"),
+    household_fields: Optional[str] = QueryParam(None, description="Comma-separated household fields (default: Household_Size, Social_Group, Monthly_Consumer_Expenditure)"),
+    limit: int = QueryParam(100, ge=1, le=10000, description="Maximum records to return"),
+    offset: int = QueryParam(0, ge=0, description="Number of records to skip"),
+    cursor: Optional[str] = QueryParam(None, description="Opaque cursor from a previous page's next_cursor"),
+    include_total: str = QueryParam("exact", pattern="^(exact|none)$", description="Total count mode: exact or none"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Persons enriched with the attributes of their household
+    
+    Joins `person_survey` to `household_survey` on the household key
+    (panel, quarter, visit, FSU, sub-sample, second-stage stratum and
+    household number), which is built and indexed on both tables at
+    ingestion. Filters use the same DSL as `/query/{table_name}` and apply
+    to either side.
+    
+    **Example:** adults in Bihar from households of 6 or more
+    ```
+    GET /api/v1/query/join/person-household?person_filters={"State_UT_Code": 10, "Age": {"$gte": 18}}&household_filters={"Household_Size": {"$gte": 6}}&person_fields=Age,Sex,General_Education_Level
+    ```
+    
+    Household fields that clash with a selected person field are returned
+    as `household_<name>`. Paging, cursors, caching, cost limits, deadlines
+    and metering work as for `/query/{table_name}`.
+    """
+    access_control = AccessControlService(db)
+    access_control.check_rate_limit(current_user)
+    
+    def parse_filters(raw: Optional[str], name: str) -> Dict[str, Any]:
+        if not raw:
+            return {}
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON in {name} parameter")
+    
+    person_filter_dict = parse_filters(person_filters, 'person_filters')
+    household_filter_dict = parse_filters(household_filters, 'household_filters')
+    person_field_list = [f.strip() for f in person_fields.split(',')] if person_fields else None
+    household_field_list = [f.strip() for f in household_fields.split(',')] if household_fields else None
+    
+    for table_name in (PERSON_TABLE, HOUSEHOLD_TABLE):
+        if not schema_registry.has_table(table_name, db.bind):
+            raise HTTPException(status_code=404, detail=f"Table '{table_name}' not found")
+    
+    # Serve repeated requests from the result cache; either table's reingestion invalidates it
+    cache_key = result_cache.make_key(
+        PERSON_TABLE,
+        dataset_versions.get(db, PERSON_TABLE),
+        kind="person_household",
+        household_version=dataset_versions.get(db, HOUSEHOLD_TABLE),
+        person_filters=normalize_filters(person_filter_dict),
+        household_filters=normalize_filters(household_filter_dict),
+        person_fields=person_field_list,
+        household_fields=household_field_list,
+        limit=limit,
+        offset=offset,
+        cursor=cursor,
+        include_total=include_total
+    )
+    result = result_cache.get(cache_key)
+    
+    if result is not None:
+        result['cache_hit'] = True
+    else:
+        # The person side drives the scan; cost it like a person query
+        try:
+            estimate = QueryCostEstimator(db).estimate_table_query(
+                table_name=PERSON_TABLE,
+                filters=person_filter_dict,
+                fields=person_field_list,
+                limit=limit,
+                offset=offset,
+                cursor=cursor,
+                include_total=include_total
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        cancel_event = threading.Event()
+        stop_watching = watch_disconnect(request.receive, cancel_event)
+        try:
+            with access_control.admit_query(current_user, estimate), \
+                    QueryGuard(db, PERSON_TABLE, access_control.query_timeout(current_user), cancel_event):
+                result = HouseholdJoinService(db).execute_join_query(
+                    person_filters=person_filter_dict,
+                    household_filters=household_filter_dict,
+                    person_fields=person_field_list,
+                    household_fields=household_field_list,
+                    limit=limit,
+                    offset=offset,
+                    cursor=cursor,
+                    include_total=include_total
+                )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except QueryTimeoutError as e:
+            raise HTTPException(status_code=504, detail=str(e))
+        except QueryCancelledError:
+            raise HTTPException(status_code=499, detail="Client closed request")
+        finally:
+            stop_watching()
+        
+        result_cache.set(cache_key, result)
+        result['cache_hit'] = False
+    
+    # Encode once; the exact byte length is what gets metered and sent
+    body = dumps(result)
+    response_size = len(body)
+    
+    access_control.check_volume_limit(current_user, response_size)
+    
+    payment_service = PaymentService(db)
+    payment_service.charge_for_query(current_user, response_size)
+    
+    access_control.log_usage(
+        user=current_user,
+        endpoint="/api/v1/query/join/person-household",
+        method="GET",
+        dataset_name=PERSON_TABLE,
+        query_params=json.dumps({'person_filters': person_filter_dict, 'household_filters': household_filter_dict}),
+        response_size=response_size
+    )
+    
+    return EncodedJSONResponse(body)
 
 
 @router.get("/{table_name}", response_model=QueryResponse)
 def query_table(
     table_name: str,
+    request: Request,
     filters: Optional[str] = QueryParam(None, description="JSON filters (e.g., {'State_Ut_Code': 28})"),
     limit: int = QueryParam(100, ge=1, le=10000, description="Maximum records to return"),
     offset: int = QueryParam(0, ge=0, description="Number of records to skip"),
     fields: Optional[str] = QueryParam(None, description="Comma-separated fields to return"),
+    cursor: Optional[str] = QueryParam(None, description="Opaque cursor from a previous page's next_cursor"),
+    include_total: str = QueryParam("exact", pattern="^(exact|estimated|none)$", description="Total count mode: exact, estimated or none"),
+    output_format: Optional[str] = QueryParam(None, alias="format", pattern="^(json|arrow|parquet)$", description="Output format: json (default), arrow or parquet"),
+    dry_run: bool = QueryParam(False, description="Return the cost estimate without running the query"),
+    sample: Optional[str] = QueryParam(None, pattern="^(uniform|stratified)$", description="Return a random sample of `limit` rows: uniform or stratified"),
+    strata: Optional[str] = QueryParam(None, description="Comma-separated stratum columns for sample=stratified"),
+    seed: Optional[int] = QueryParam(None, ge=0, description="Seed that makes a sample reproducible"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -235,6 +476,7 @@ def query_table(
     **Available PLFS Survey Tables:**
     - `household_survey`: PLFS Household data (CHHV1) with 41 columns
     - `person_survey`: PLFS Person-level data (CPERV1) with 140+ columns
+    - `plfs_district_codes`, `plfs_item_codes`, `plfs_data_layout`: PLFS reference tables
     
     **Filter Operators:**
     - Equality: `{"State_Ut_Code": 28}`
@@ -243,6 +485,7 @@ def query_table(
     - Range: `{"Age": {"$gte": 25, "$lte": 35}}`
     - In list: `{"State_Ut_Code": {"$in": [28, 29, 30]}}`
     - Not equal: `{"Sex": {"$ne": 1}}`
+    - Contains (case-insensitive): `{"DISTRICT_NAME": {"$contains": "pur"}}`
     
     **Examples:**
     
@@ -263,7 +506,48 @@ def query_table(
     
     **Field Selection:**
     - Omit `fields` to get all columns
-    - Use `fields=col1,col2,col3` to get specific columns only
+    - Use `fields=col1,col2,col3` to get specific columns only; only these
+      columns are read from the database, and unknown names return 400
+    
+    **Pagination:**
+    - `limit`/`offset` work as before, but deep offsets scan every skipped row
+    - Every full page returns a `next_cursor`; pass it back as `cursor` to get
+      the next page in constant time (`offset` is ignored when `cursor` is set)
+    - `include_total=exact` (default) counts all matches, cached per filter;
+      `estimated` uses table statistics or a sampled count; `none` skips it
+    
+    **Streaming:**
+    - Send `Accept: application/x-ndjson` to get one JSON row per line,
+      streamed in batches from a server-side cursor instead of one document
+    - No total or `next_cursor` is returned; usage is metered on the bytes
+      actually streamed and charged when the stream ends
+    
+    **Columnar formats:**
+    - `format=arrow` streams an Apache Arrow IPC stream, `format=parquet` a
+      Parquet file, both typed from the dataset YAML schema
+      (e.g. `pandas.read_parquet(io.BytesIO(response.content))`)
+    - Streamed and metered like NDJSON; needs `pyarrow` on the server (501 otherwise)
+    
+    **Cost and admission:**
+    - Every query is costed before it runs from the table size, index
+      coverage of the filter columns and the width of the selected fields
+    - `dry_run=true` returns that estimate (rows scanned, rows and bytes
+      returned, `estimated_cost`) without running the query or charging
+    - Queries above your role's cost limit are rejected with 403; large
+      queries wait for a free slot and get 503 if none frees up in time
+    - Each query runs under your role's deadline and returns 504 when it
+      runs past it; it is also cancelled if you disconnect
+    
+    **Sampling:**
+    - `sample=uniform` returns `limit` rows drawn at random from the
+      matching rows instead of the first ones (which cluster by FSU)
+    - `sample=stratified&strata=State_Ut_Code` splits `limit` across the
+      strata in proportion to their matching rows; `sample.allocation` in
+      the response lists population and sample size per stratum
+    - The same `seed` returns the same sample for the same data; without
+      one a seed is picked and returned in `sample.seed`
+    - Samples are read off a random key stored per row at ingestion, so
+      they cost about the same as a page; JSON only, no `cursor`/`offset`
     
     **Note:** To see available tables, use `GET /api/v1/datasets/tables`
     """
@@ -288,29 +572,156 @@ def query_table(
     if fields:
         field_list = [f.strip() for f in fields.split(',')]
     
-    # Execute query using raw SQL for dynamic table access
-    from sqlalchemy import text, inspect
-    
     # Verify table exists
-    inspector = inspect(db.bind)
-    if table_name not in inspector.get_table_names():
+    if not schema_registry.has_table(table_name, db.bind):
         raise HTTPException(
             status_code=404,
             detail=f"Table '{table_name}' not found"
         )
     
-    # Build query
-    query_builder = QueryBuilderService(db)
-    result = query_builder.execute_table_query(
-        table_name=table_name,
-        filters=filter_dict,
+    streaming = output_format in ArrowExportService.FORMATS or NDJSON_MEDIA_TYPE in request.headers.get('accept', '')
+    
+    # Sampling parameters
+    strata_list = [name.strip() for name in strata.split(',') if name.strip()] if strata else None
+    if sample is not None:
+        if streaming or cursor is not None or offset:
+            raise HTTPException(status_code=400, detail="sample cannot be combined with streaming, cursor or offset")
+        if (sample == 'stratified') != bool(strata_list):
+            raise HTTPException(status_code=400, detail="strata is required with sample=stratified and only used there")
+        if seed is None:
+            # Pick the seed here so it is part of the cache key and the response
+            seed = random.randrange(SAMPLE_KEY_RANGE)
+    
+    # Cost the query before running it; a dry run returns the estimate only
+    def estimate_cost() -> Dict[str, Any]:
+        try:
+            return QueryCostEstimator(db).estimate_table_query(
+                table_name=table_name,
+                filters=filter_dict,
+                fields=field_list,
+                limit=limit,
+                offset=offset,
+                cursor=cursor,
+                include_total="none" if streaming else include_total
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    if dry_run:
+        body = dumps(estimate_cost())
+        access_control.log_usage(
+            user=current_user,
+            endpoint=f"/api/v1/query/{table_name}",
+            method="GET",
+            dataset_name=table_name,
+            query_params=json.dumps({'filters': filter_dict, 'dry_run': True}),
+            response_size=len(body)
+        )
+        return EncodedJSONResponse(body)
+    
+    # Stream NDJSON, Arrow or Parquet when asked; size is only known once the stream ends
+    columnar_format = output_format in ArrowExportService.FORMATS
+    if streaming:
+        # Validate up front; errors can't change the status once streaming starts
+        try:
+            if cursor is not None:
+                decode_cursor(cursor)
+            QueryBuilderService(db).resolve_projection(schema_registry.get_table(table_name, db.bind), field_list)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        access_control.check_volume_limit(current_user, 0)
+        
+        headers = {}
+        if columnar_format:
+            if load_pyarrow() is None:
+                raise HTTPException(
+                    status_code=501,
+                    detail=f"format={output_format} requires pyarrow, which is not installed on this server"
+                )
+            schema = ArrowExportService(db).build_schema(table_name, field_list)
+            encode = partial(ArrowExportService.encode, schema, fmt=output_format)
+            media_type = PARQUET_MEDIA_TYPE if output_format == 'parquet' else ARROW_MEDIA_TYPE
+            extension = 'parquet' if output_format == 'parquet' else 'arrows'
+            headers["Content-Disposition"] = f"attachment; filename={table_name}.{extension}"
+        else:
+            encode = encode_ndjson
+            media_type = NDJSON_MEDIA_TYPE
+        
+        admission = access_control.admit_query(current_user, estimate_cost())
+        
+        return StreamingResponse(
+            stream_table_response(
+                current_user.id, table_name, filter_dict, field_list, limit, offset, cursor, encode,
+                admission, access_control.query_timeout(current_user), request.receive
+            ),
+            media_type=media_type,
+            headers=headers,
+            # Also release if the stream never starts
+            background=BackgroundTask(admission.release)
+        )
+    
+    # Serve repeated requests from the result cache; metering still runs below
+    version = dataset_versions.get(db, table_name)
+    cache_key = result_cache.make_key(
+        table_name,
+        version,
+        filters=normalize_filters(filter_dict),
         fields=field_list,
         limit=limit,
-        offset=offset
+        offset=offset,
+        cursor=cursor,
+        include_total=include_total,
+        sample=sample,
+        strata=strata_list,
+        seed=seed
     )
+    result = result_cache.get(cache_key)
+    
+    if result is not None:
+        result['cache_hit'] = True
+    else:
+        # Build query
+        query_builder = QueryBuilderService(db)
+        cancel_event = threading.Event()
+        stop_watching = watch_disconnect(request.receive, cancel_event)
+        try:
+            with access_control.admit_query(current_user, estimate_cost()), \
+                    QueryGuard(db, table_name, access_control.query_timeout(current_user), cancel_event):
+                if sample is not None:
+                    result = SamplingService(db).sample_table(
+                        table_name=table_name,
+                        size=limit,
+                        filters=filter_dict,
+                        fields=field_list,
+                        seed=seed,
+                        strata=strata_list
+                    )
+                else:
+                    result = query_builder.execute_table_query(
+                        table_name=table_name,
+                        filters=filter_dict,
+                        fields=field_list,
+                        limit=limit,
+                        offset=offset,
+                        cursor=cursor,
+                        include_total=include_total
+                    )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except QueryTimeoutError as e:
+            raise HTTPException(status_code=504, detail=str(e))
+        except QueryCancelledError:
+            # Nobody is listening any more; skip metering and caching
+            raise HTTPException(status_code=499, detail="Client closed request")
+        finally:
+            stop_watching()
+        
+        result_cache.set(cache_key, result)
+        result['cache_hit'] = False
     
-    # Calculate response size
-    response_size = len(json.dumps(result))
+    # Encode once; the exact byte length is what gets metered and sent
+    body = dumps(result)
+    response_size = len(body)
     
     # Check volume limits
     access_control.check_volume_limit(current_user, response_size)
@@ -329,7 +740,7 @@ def query_table(
         response_size=response_size
     )
     
-    return result
+    return EncodedJSONResponse(body)
 
 
 @router.post("", response_model=QueryResponse)
@@ -371,29 +782,57 @@ def advanced_query(
     if not dataset:
         raise HTTPException(status_code=400, detail="Dataset name is required")
     
+    # Cost the query before admitting it
+    census = dataset.lower() == "census"
+    table_name = CensusData.__tablename__ if census else DataRecord.__tablename__
+    estimator = QueryCostEstimator(db)
+    try:
+        if census:
+            estimate = estimator.estimate_table_query(
+                table_name, filters, fields or QueryBuilderService.CENSUS_FIELDS, limit=limit, offset=offset
+            )
+        else:
+            dataset_obj = db.query(Dataset).filter(Dataset.name == dataset).first()
+            if not dataset_obj:
+                raise ValueError(f"Dataset '{dataset}' not found")
+            estimate = estimator.estimate_records_query(dataset_obj, filters, fields, limit=limit, offset=offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     # Execute query
     query_builder = QueryBuilderService(db)
     
-    if dataset.lower() == "census":
-        result = query_builder.execute_census_query(
-            filters=filters,
-            fields=fields,
-            limit=limit,
-            offset=offset,
-            order_by=order_by,
-            order_direction=order_direction
-        )
-    else:
-        result = query_builder.execute_generic_query(
-            dataset_name=dataset,
-            filters=filters,
-            fields=fields,
-            limit=limit,
-            offset=offset
-        )
-    
-    # Calculate response size and log usage
-    response_size = len(json.dumps(result))
+    # The body has been read, so only the deadline applies; disconnects are not watched
+    try:
+        with access_control.admit_query(current_user, estimate), \
+                QueryGuard(db, table_name, access_control.query_timeout(current_user)):
+            if census:
+                result = query_builder.execute_census_query(
+                    filters=filters,
+                    fields=fields,
+                    limit=limit,
+                    offset=offset,
+                    order_by=order_by,
+                    order_direction=order_direction
+                )
+            else:
+                result = query_builder.execute_generic_query(
+                    dataset_name=dataset,
+                    filters=filters,
+                    fields=fields,
+                    limit=limit,
+                    offset=offset
+                )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except QueryTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except QueryCancelledError:
+        raise HTTPException(status_code=499, detail="Client closed request")
+    
+    # Encode once; the exact byte length is what gets metered and sent
+    body = dumps(result)
+    response_size = len(body)
     
     # Check volume limits
     access_control.check_volume_limit(current_user, response_size)
@@ -412,12 +851,13 @@ def advanced_query(
         response_size=response_size
     )
     
-    return result
+    return EncodedJSONResponse(body)
 
 
 @router.get("/dataset/{dataset_id}/records")
 def query_dataset_by_id(
     dataset_id: int,
+    request: Request,
     filters: Optional[str] = QueryParam(None, description="JSON filters"),
     limit: int = QueryParam(100, ge=1, le=10000),
     offset: int = QueryParam(0, ge=0),
@@ -431,9 +871,6 @@ def query_dataset_by_id(
     - Datasets with dedicated tables (household_survey, person_survey)
     - Datasets using data_records JSON storage (district codes, item codes, etc.)
     """
-    from app.models.dataset import Dataset, DataRecord
-    from sqlalchemy import inspect
-    
     # Check rate limits
     access_control = AccessControlService(db)
     access_control.check_rate_limit(current_user)
@@ -452,51 +889,67 @@ def query_dataset_by_id(
             raise HTTPException(status_code=400, detail="Invalid JSON in filters")
     
     # Check if dataset uses dedicated table or data_records
-    inspector = inspect(db.bind)
+    dedicated_table = schema_registry.has_table(dataset.table_name, db.bind)
+    
+    # Cost the query before admitting it
+    estimator = QueryCostEstimator(db)
+    try:
+        if dedicated_table:
+            estimate = estimator.estimate_table_query(dataset.table_name, filter_dict, limit=limit, offset=offset)
+        else:
+            estimate = estimator.estimate_records_query(dataset, filter_dict, limit=limit, offset=offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    if dataset.table_name in inspector.get_table_names():
-        # Use dedicated table
-        query_builder = QueryBuilderService(db)
-        result = query_builder.execute_table_query(
-            table_name=dataset.table_name,
-            filters=filter_dict,
-            fields=None,
-            limit=limit,
-            offset=offset
-        )
-    else:
-        # Use data_records table
-        query = db.query(DataRecord).filter(DataRecord.dataset_id == dataset_id)
-        
-        # Apply filters to JSON data
-        all_records = query.all()
-        filtered_records = []
-        
-        for record in all_records:
-            match = True
-            for key, value in filter_dict.items():
-                if key not in record.data or record.data[key] != value:
-                    match = False
-                    break
-            if match:
-                filtered_records.append(record.data)
-        
-        # Apply pagination
-        total = len(filtered_records)
-        paginated = filtered_records[offset:offset + limit]
-        
-        result = {
-            'data': paginated,
-            'total': total,
-            'limit': limit,
-            'offset': offset,
-            'dataset_id': dataset_id,
-            'dataset_name': dataset.name,
-            'storage_type': 'data_records (JSON)'
-        }
-    
-    # Calculate response size
-    response_size = len(json.dumps(result))
+    query_builder = QueryBuilderService(db)
+    cancel_event = threading.Event()
+    stop_watching = watch_disconnect(request.receive, cancel_event)
+    try:
+        with access_control.admit_query(current_user, estimate), QueryGuard(
+            db,
+            dataset.table_name if dedicated_table else DataRecord.__tablename__,
+            access_control.query_timeout(current_user),
+            cancel_event
+        ):
+            if dedicated_table:
+                # Use dedicated table
+                result = query_builder.execute_table_query(
+                    table_name=dataset.table_name,
+                    filters=filter_dict,
+                    fields=None,
+                    limit=limit,
+                    offset=offset
+                )
+            else:
+                # Use data_records table, filtering on the JSON keys in the database
+                query = db.query(DataRecord.data).filter(
+                    DataRecord.dataset_id == dataset_id,
+                    *query_builder.build_json_conditions(filter_dict)
+                )
+                
+                # Only the matching page leaves the database
+                total = query.count()
+                paginated = [row.data for row in query.order_by(DataRecord.id).limit(limit).offset(offset)]
+                
+                result = {
+                    'data': paginated,
+                    'total': total,
+                    'limit': limit,
+                    'offset': offset,
+                    'dataset_id': dataset_id,
+                    'dataset_name': dataset.name,
+                    'storage_type': 'data_records (JSON)'
+                }
+    except QueryTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except QueryCancelledError:
+        raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        stop_watching()
+    
+    # Encode once; the exact byte length is what gets metered and sent
+    body = dumps(result)
+    response_size = len(body)
     
     # Check volume limits
     access_control.check_volume_limit(current_user, response_size)
@@ -515,4 +968,4 @@ def query_dataset_by_id(
         response_size=response_size
     )
     
-    return result
+    return EncodedJSONResponse(body)
@@ -34,6 +34,17 @@ class Settings(BaseSettings):
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
     
+    # Query result cache
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # In-process LRU tier budget
+    RESULT_CACHE_MAX_ENTRY_BYTES: int = 4 * 1024 * 1024  # Larger results are not cached
+    RESULT_CACHE_REDIS_ENABLED: bool = False  # Shared tier in REDIS_URL
+    RESULT_CACHE_REDIS_TTL_SECONDS: int = 3600
+    DATASET_VERSION_TTL_SECONDS: float = 5.0
+    
+    # Query admission control
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 10.0  # Wait for a heavy-query slot before 503
+    
     # Payment
     PAYMENT_GATEWAY_URL: str = "https://mock-payment-gateway.example.com"
     PAYMENT_API_KEY: str = "mock-api-key"
@@ -116,6 +116,7 @@ def load_csv_data_if_needed(db):
         from pathlib import Path
         import pandas as pd
         from app.models.dataset import Dataset
+        from app.services.dataset_version import dataset_versions
         
         inspector = inspect(engine)
         tables = inspector.get_table_names()
@@ -166,6 +167,7 @@ def load_csv_data_if_needed(db):
                         }
                         df = df.rename(columns=column_mapping)
                         df.to_sql('household_survey', engine, if_exists='replace', index=False)
+                        dataset_versions.bump(db, 'household_survey')
                         print(f"✅ Loaded {len(df):,} household records")
                         
                         # Register dataset
@@ -222,6 +224,7 @@ def load_csv_data_if_needed(db):
                         }
                         df = df.rename(columns=column_mapping)
                         df.to_sql('person_survey', engine, if_exists='replace', index=False)
+                        dataset_versions.bump(db, 'person_survey')
                         print(f"✅ Loaded {len(df):,} person records")
                         
                         # Register dataset
@@ -9,8 +9,11 @@ import time
 import os
 from pathlib import Path
 from app.config import get_settings
-from app.database import init_db
-from app.api import auth, datasets, query, users, plfs, frontend, export  # , dataset_info
+from app.database import init_db, SessionLocal
+from app.api import auth, datasets, query, aggregate, distribution, indicators, autocomplete, users, plfs, frontend, export  # , dataset_info
+from app.services.parameter_resolver import parameter_resolver
+from app.services.autocomplete import autocomplete_index
+from app.services.reference_tables import ReferenceTableMaterializer
 from app.middleware.security import (
     SecurityHeadersMiddleware,
     HTTPSRedirectMiddleware
@@ -153,6 +156,10 @@ app.include_router(frontend.router)  # Landing page at /
 app.include_router(auth.router, prefix=settings.API_V1_PREFIX)
 app.include_router(datasets.router, prefix=settings.API_V1_PREFIX)
 app.include_router(query.router, prefix=settings.API_V1_PREFIX)
+app.include_router(aggregate.router, prefix=settings.API_V1_PREFIX)  # Survey-weighted GROUP BY
+app.include_router(distribution.router, prefix=settings.API_V1_PREFIX)  # Weighted histograms and quantiles
+app.include_router(indicators.router, prefix=settings.API_V1_PREFIX)  # PLFS LFPR/WPR/UR
+app.include_router(autocomplete.router, prefix=settings.API_V1_PREFIX)  # Type-ahead for states, districts, items
 app.include_router(users.router, prefix=settings.API_V1_PREFIX)
 app.include_router(plfs.router, prefix=settings.API_V1_PREFIX)
 app.include_router(export.router, prefix=settings.API_V1_PREFIX)  # CSV/Chart/Table exports
@@ -163,6 +170,17 @@ app.include_router(export.router, prefix=settings.API_V1_PREFIX)  # CSV/Chart/Ta
 async def startup_event():
     """Initialize database on startup"""
     init_db()
+    parameter_resolver.compile()
+    
+    # Reference tables whose JSON sources were loaded but never materialized
+    ReferenceTableMaterializer().run(missing_only=True)
+    
+    # Type-ahead indexes are ready before the first keystroke
+    db = SessionLocal()
+    try:
+        autocomplete_index.warm(db)
+    finally:
+        db.close()
 
 
 @app.get("/health")
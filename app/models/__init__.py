@@ -1,12 +1,16 @@
 """
 Models package initialization
 """
-from app.models.dataset import Dataset, DataRecord, CensusData
+from app.models.dataset import Dataset, DataRecord, DatasetVersion, BitmapIndex, FacetCount, LabourForceIndicator, CensusData
 from app.models.user import User, UsageLog, Transaction, UserRole
 
 __all__ = [
     "Dataset",
     "DataRecord",
+    "DatasetVersion",
+    "BitmapIndex",
+    "FacetCount",
+    "LabourForceIndicator",
     "CensusData",
     "User",
     "UsageLog",
@@ -1,7 +1,7 @@
 """
 Database models for datasets and data storage
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, JSON, ForeignKey, Index
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, JSON, ForeignKey, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -41,6 +41,74 @@ class DataRecord(Base):
     dataset = relationship("Dataset", back_populates="records")
 
 
+class DatasetVersion(Base):
+    """Data version of a dataset table, bumped every time it is (re)ingested"""
+    __tablename__ = "dataset_versions"
+    
+    table_name = Column(String(255), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class BitmapIndex(Base):
+    """Compressed bitset of the rows of a table holding one value of a column"""
+    __tablename__ = "bitmap_indexes"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    table_name = Column(String(255), nullable=False)
+    column_name = Column(String(255), nullable=False)
+    value = Column(String(255), nullable=False)
+    version = Column(Integer, nullable=False)  # Data version the bitmap was built for
+    row_count = Column(Integer, nullable=False)
+    bitmap = Column(LargeBinary, nullable=False)  # zlib-compressed, bit N = row key N
+    
+    __table_args__ = (
+        Index('idx_bitmap_table_version', 'table_name', 'version'),
+    )
+
+
+class FacetCount(Base):
+    """Row count of one distinct value of a column, precomputed at ingestion"""
+    __tablename__ = "facet_counts"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    table_name = Column(String(255), nullable=False)
+    column_name = Column(String(255), nullable=False)
+    value = Column(JSON, nullable=False)  # Typed column value (number or text)
+    version = Column(Integer, nullable=False)  # Data version the count was taken for
+    row_count = Column(Integer, nullable=False)
+    
+    __table_args__ = (
+        Index('idx_facet_table_version', 'table_name', 'version'),
+    )
+
+
+class LabourForceIndicator(Base):
+    """Weighted labour-force sums of one quarter and cell, re-aggregated into LFPR/WPR/UR"""
+    __tablename__ = "labour_force_indicators"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    table_name = Column(String(255), nullable=False)
+    quarter = Column(String(20))
+    state = Column(Integer)
+    district = Column(Integer)
+    sector = Column(Integer)
+    sex = Column(Integer)
+    age_group = Column(String(20))
+    sample_rows = Column(Integer, nullable=False)
+    population = Column(Float, nullable=False)  # Sum of weights
+    ps_labour_force = Column(Float, nullable=False)  # Usual status (principal + subsidiary)
+    ps_workers = Column(Float, nullable=False)
+    ps_unemployed = Column(Float, nullable=False)
+    cws_labour_force = Column(Float, nullable=False)  # Current weekly status
+    cws_workers = Column(Float, nullable=False)
+    cws_unemployed = Column(Float, nullable=False)
+    
+    __table_args__ = (
+        Index('idx_labour_force_table_quarter', 'table_name', 'quarter'),
+    )
+
+
 class CensusData(Base):
     """Example: Census data specific model"""
     __tablename__ = "census_data"
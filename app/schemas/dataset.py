@@ -67,7 +67,10 @@ class QueryRequest(BaseModel):
 class QueryResponse(BaseModel):
     """Schema for query response"""
     dataset: str
-    total_records: int
+    total_records: Optional[int] = Field(None, description="Total matching records (None when include_total=none)")
+    total_mode: Optional[str] = Field(None, description="How total_records was computed: exact or estimated")
     returned_records: int
     data: List[Dict[str, Any]]
     query_time_ms: float
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page (keyset pagination)")
+    cache_hit: bool = Field(False, description="Whether the result was served from the result cache")
@@ -5,10 +5,16 @@ from app.services.ingestion import DataIngestionService
 from app.services.query_builder import QueryBuilderService
 from app.services.access_control import AccessControlService
 from app.services.payment import PaymentService
+from app.services.schema_registry import SchemaRegistry
+from app.services.sampling import SamplingService
+from app.services.household_join import HouseholdJoinService
 
 __all__ = [
     "DataIngestionService",
     "QueryBuilderService",
     "AccessControlService",
-    "PaymentService"
+    "PaymentService",
+    "SchemaRegistry",
+    "SamplingService",
+    "HouseholdJoinService"
 ]
@@ -1,16 +1,37 @@
 """
 Access control service for role-based permissions
 """
-from typing import Optional
+from typing import Optional, Dict, Any
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from app.models.user import User, UsageLog, UserRole
 from app.config import get_settings
+import threading
 
 settings = get_settings()
 
 
+class QueryAdmission:
+    """An admitted query; releases its heavy-query slot (if any) once"""
+    
+    def __init__(self, slot: Optional[threading.Semaphore] = None):
+        self._slot = slot
+        self._lock = threading.Lock()
+    
+    def release(self) -> None:
+        with self._lock:
+            if self._slot is not None:
+                self._slot.release()
+                self._slot = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.release()
+
+
 class AccessControlService:
     """Service for managing access control and rate limiting"""
     
@@ -30,9 +51,93 @@ class AccessControlService:
         UserRole.ADMIN: 999999
     }
     
+    # Maximum estimated cost of a single query (see QueryCostEstimator);
+    # None means unlimited
+    QUERY_COST_LIMITS = {
+        UserRole.PUBLIC: 200000,
+        UserRole.RESEARCHER: 2000000,
+        UserRole.PREMIUM: 20000000,
+        UserRole.ADMIN: None
+    }
+    
+    # Queries estimated above HEAVY_QUERY_COST run at most this many at a
+    # time per role; further ones queue for a slot
+    HEAVY_QUERY_COST = 100000
+    HEAVY_QUERY_SLOTS = {
+        UserRole.PUBLIC: 2,
+        UserRole.RESEARCHER: 4,
+        UserRole.PREMIUM: 8,
+        UserRole.ADMIN: 16
+    }
+    
+    # Query deadline per role (seconds), enforced inside the database
+    QUERY_TIMEOUTS = {
+        UserRole.PUBLIC: 10,
+        UserRole.RESEARCHER: 30,
+        UserRole.PREMIUM: 60,
+        UserRole.ADMIN: 300
+    }
+    
+    _slots_lock = threading.Lock()
+    _heavy_slots: Dict[UserRole, threading.Semaphore] = {}
+    
     def __init__(self, db: Session):
         self.db = db
     
+    @staticmethod
+    def limit_role(user: User) -> UserRole:
+        """Role whose limits apply; every admin role gets the admin limits"""
+        return UserRole.ADMIN if user.is_admin() else user.role
+    
+    def query_timeout(self, user: User) -> float:
+        """Deadline in seconds for a single query of this user"""
+        return self.QUERY_TIMEOUTS.get(self.limit_role(user), self.QUERY_TIMEOUTS[UserRole.PUBLIC])
+    
+    def admit_query(self, user: User, estimate: Dict[str, Any]) -> QueryAdmission:
+        """
+        Admit a query by its estimated cost
+        
+        Rejects it (403) above the role's cost limit. A heavy query waits up
+        to ``ADMISSION_QUEUE_TIMEOUT_SECONDS`` for one of the role's slots
+        (503 if none frees up); release the returned admission when the query
+        is done.
+        """
+        role = self.limit_role(user)
+        cost = estimate['estimated_cost']
+        cost_limit = self.QUERY_COST_LIMITS.get(role, self.QUERY_COST_LIMITS[UserRole.PUBLIC])
+        
+        if cost_limit is not None and cost > cost_limit:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail={
+                    'message': (
+                        f"Estimated query cost {cost:,} exceeds your limit of {cost_limit:,}. "
+                        "Add filters, select fewer fields or lower the limit "
+                        "(use dry_run=true to check the estimate)."
+                    ),
+                    'cost_limit': cost_limit,
+                    'estimate': estimate
+                }
+            )
+        
+        if cost <= self.HEAVY_QUERY_COST:
+            return QueryAdmission()
+        
+        with self._slots_lock:
+            slot = self._heavy_slots.get(role)
+            if slot is None:
+                slot = threading.Semaphore(self.HEAVY_QUERY_SLOTS.get(role, self.HEAVY_QUERY_SLOTS[UserRole.PUBLIC]))
+                self._heavy_slots[role] = slot
+        
+        if not slot.acquire(timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many large queries are running for your role. Please retry shortly.",
+                headers={"Retry-After": str(max(1, int(settings.ADMISSION_QUEUE_TIMEOUT_SECONDS)))}
+            )
+        
+        return QueryAdmission(slot)
+    
     def check_rate_limit(self, user: User) -> bool:
         """Check if user has exceeded rate limit"""
         
@@ -0,0 +1,344 @@
+"""
+Aggregation service for survey-weighted GROUP BY queries
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import Float, case, cast, func, select, text
+from sqlalchemy.orm import Session
+from app.models.dataset import Dataset
+from app.services.query_builder import QueryBuilderService
+from app.services.schema_registry import schema_registry
+import time
+
+
+class AggregationService:
+    """
+    Service for compiling aggregate requests into a single GROUP BY query
+    
+    Requests whose grouping, filters, weight and measures are all covered by
+    the dataset's rollup cube (built at ingestion) are answered from the
+    much smaller ``<table>_rollup`` table instead of the raw rows.
+    """
+    
+    SUPPORTED_MEASURES = ('count', 'sum', 'mean')
+    
+    # Largest crosstab returned, in non-empty cells
+    MAX_CROSSTAB_CELLS = 100000
+    
+    def __init__(self, db: Session):
+        self.db = db
+        self.query_builder = QueryBuilderService(db)
+    
+    @classmethod
+    def parse_measures(cls, measures: Optional[str]) -> List[Tuple[str, Optional[str]]]:
+        """
+        Parse a measure list such as ``count,sum:Age,mean:Total_Earnings_Received``
+        
+        Returns (operation, column) pairs; ``count`` has no column.
+        """
+        parsed = []
+        
+        for item in (measures or 'count').split(','):
+            item = item.strip()
+            if not item:
+                continue
+            
+            operation, _, column = item.partition(':')
+            operation = operation.strip().lower()
+            column = column.strip() or None
+            
+            if operation not in cls.SUPPORTED_MEASURES:
+                raise ValueError(
+                    f"Unsupported measure '{operation}'. Use one of: {', '.join(cls.SUPPORTED_MEASURES)}"
+                )
+            if operation == 'count':
+                column = None
+            elif column is None:
+                raise ValueError(f"Measure '{operation}' needs a column, e.g. {operation}:Age")
+            
+            parsed.append((operation, column))
+        
+        if not parsed:
+            raise ValueError("At least one measure is required")
+        
+        return parsed
+    
+    @staticmethod
+    def measure_name(operation: str, column: Optional[str]) -> str:
+        """Output key of a measure in each cell"""
+        return operation if column is None else f"{operation}_{column}"
+    
+    def numeric(self, column):
+        """Treat blank strings (CSV ingestion fills NaN with '') as NULL on SQLite"""
+        if self.db.bind.dialect.name == 'sqlite':
+            return func.nullif(column, '')
+        return column
+    
+    def resolve_column(self, table, name: str):
+        """Get a public column of the table or fail with a readable error"""
+        if name not in table.c or schema_registry.is_internal_column(name):
+            raise ValueError(f"Column '{name}' not found in table '{table.name}'")
+        return table.c[name]
+    
+    def build_measure(self, table, operation: str, column_name: Optional[str], weight):
+        """Build the SQL expression for one measure, weighted if a weight is given"""
+        if operation == 'count':
+            return func.count() if weight is None else func.sum(weight)
+        
+        value = self.numeric(self.resolve_column(table, column_name))
+        
+        if operation == 'sum':
+            return func.sum(value) if weight is None else func.sum(value * weight)
+        
+        # Weighted mean only counts the weight of rows where the value is present
+        if weight is None:
+            return func.avg(value)
+        present_weight = func.sum(case((value.isnot(None), weight), else_=None))
+        return cast(func.sum(value * weight), Float) / func.nullif(present_weight, 0)
+    
+    @staticmethod
+    def rollup_table_name(table_name: str) -> str:
+        """Name of the rollup cube table of a dataset table"""
+        return f"{table_name}_rollup"
+    
+    def build_rollup(
+        self,
+        table_name: str,
+        dimensions: List[str],
+        measures: Optional[List[str]] = None,
+        weight: Optional[str] = None
+    ) -> int:
+        """
+        Materialize the rollup cube of a table and return its cell count
+        
+        One row per combination of ``dimensions`` with ``n`` (rows) and, for
+        each measure column, ``sum_<col>`` and ``n_<col>`` (rows where it is
+        present). With a weight the cube also keeps ``w`` (sum of weights),
+        ``wsum_<col>`` and ``w_<col>``, so counts, sums and means - weighted
+        or not - can be re-aggregated to any subset of the dimensions.
+        """
+        table = schema_registry.get_table(table_name, self.db.bind)
+        dimension_columns = [self.resolve_column(table, name) for name in dimensions]
+        weight_column = self.numeric(self.resolve_column(table, weight)) if weight else None
+        
+        columns = [*dimension_columns, func.count().label('n')]
+        if weight_column is not None:
+            columns.append(func.sum(weight_column).label('w'))
+        
+        for name in measures or []:
+            value = self.numeric(self.resolve_column(table, name))
+            columns.append(func.sum(value).label(f'sum_{name}'))
+            columns.append(func.count(value).label(f'n_{name}'))
+            if weight_column is not None:
+                columns.append(func.sum(value * weight_column).label(f'wsum_{name}'))
+                columns.append(
+                    func.sum(case((value.isnot(None), weight_column), else_=None)).label(f'w_{name}')
+                )
+        
+        query = select(*columns).select_from(table).group_by(*dimension_columns)
+        compiled = query.compile(dialect=self.db.bind.dialect, compile_kwargs={"literal_binds": True})
+        
+        rollup_name = self.rollup_table_name(table_name)
+        dimension_list = ', '.join(f'"{name}"' for name in dimensions)
+        
+        self.db.execute(text(f"DROP TABLE IF EXISTS {rollup_name}"))
+        self.db.execute(text(f"CREATE TABLE {rollup_name} AS {compiled}"))
+        self.db.execute(text(f"CREATE INDEX idx_{rollup_name}_dims ON {rollup_name} ({dimension_list})"))
+        cells = self.db.execute(text(f"SELECT COUNT(*) FROM {rollup_name}")).scalar()
+        self.db.commit()
+        
+        schema_registry.invalidate(rollup_name)
+        return cells
+    
+    def find_rollup(
+        self,
+        table_name: str,
+        filters: Dict[str, Any],
+        group_by: List[str],
+        measures: List[Tuple[str, Optional[str]]],
+        weight: Optional[str]
+    ) -> Optional[Dict[str, Any]]:
+        """Get the rollup config of a table if it can answer the request"""
+        dataset = self.db.query(Dataset).filter(Dataset.table_name == table_name).first()
+        rollup = (dataset.config or {}).get('rollup') if dataset else None
+        
+        if not rollup or not schema_registry.has_table(self.rollup_table_name(table_name), self.db.bind):
+            return None
+        
+        dimensions = set(rollup.get('dimensions', []))
+        if not set(group_by) <= dimensions or not set(filters) <= dimensions:
+            return None
+        if weight is not None and weight != rollup.get('weight'):
+            return None
+        if any(column is not None and column not in rollup.get('measures', []) for _, column in measures):
+            return None
+        
+        return rollup
+    
+    def build_rollup_measure(self, cube, operation: str, column_name: Optional[str], weighted: bool):
+        """Build the expression re-aggregating one measure from the cube columns"""
+        if operation == 'count':
+            return func.sum(cube.c.w) if weighted else func.sum(cube.c.n)
+        
+        prefix = 'w' if weighted else ''
+        total = func.sum(cube.c[f'{prefix}sum_{column_name}'])
+        
+        if operation == 'sum':
+            return total
+        return cast(total, Float) / func.nullif(func.sum(cube.c[f'{"w" if weighted else "n"}_{column_name}']), 0)
+    
+    def execute_aggregate_query(
+        self,
+        table_name: str,
+        filters: Optional[Dict[str, Any]] = None,
+        group_by: Optional[List[str]] = None,
+        measures: Optional[List[Tuple[str, Optional[str]]]] = None,
+        weight: Optional[str] = None,
+        limit: int = 10000
+    ) -> Dict[str, Any]:
+        """
+        Execute an aggregate query and return only the aggregated cells
+        
+        Every cell carries ``n`` (unweighted sample rows) next to the requested
+        measures. With a ``weight`` column, ``count`` becomes the sum of
+        weights and ``sum``/``mean`` are weighted.
+        """
+        start_time = time.time()
+        
+        group_by = group_by or []
+        measures = measures or [('count', None)]
+        
+        rollup = self.find_rollup(table_name, filters or {}, group_by, measures, weight)
+        
+        if rollup is not None:
+            table = schema_registry.get_table(self.rollup_table_name(table_name), self.db.bind)
+            row_count = func.sum(table.c.n)
+            measure_columns = [
+                self.build_rollup_measure(table, operation, column, weight is not None)
+                .label(self.measure_name(operation, column))
+                for operation, column in measures
+            ]
+        else:
+            table = schema_registry.get_table(table_name, self.db.bind)
+            row_count = func.count()
+            weight_column = self.numeric(self.resolve_column(table, weight)) if weight else None
+            measure_columns = [
+                self.build_measure(table, operation, column, weight_column).label(self.measure_name(operation, column))
+                for operation, column in measures
+            ]
+        
+        group_columns = [self.resolve_column(table, name) for name in group_by]
+        conditions = self.query_builder.build_table_conditions(table, filters)
+        
+        query = (
+            select(*group_columns, row_count.label('n'), *measure_columns)
+            .select_from(table)
+            .where(*conditions)
+        )
+        if group_columns:
+            query = query.group_by(*group_columns).order_by(*group_columns)
+        query = query.limit(limit)
+        
+        cells = [dict(row._mapping) for row in self.db.execute(query)]
+        
+        query_time = (time.time() - start_time) * 1000
+        
+        return {
+            'dataset': table_name,
+            'group_by': group_by,
+            'measures': [self.measure_name(operation, column) for operation, column in measures],
+            'weight': weight,
+            'filters_applied': filters or {},
+            'answered_from': 'rollup' if rollup is not None else 'table',
+            'cell_count': len(cells),
+            'cells': cells,
+            'query_time_ms': round(query_time, 2)
+        }
+    
+    @staticmethod
+    def dimension_sort_key(key: tuple) -> List[Tuple[bool, bool, Any]]:
+        """Order dimension values: numbers, then strings, then nulls"""
+        return [(v is None, isinstance(v, str), v) for v in key]
+    
+    def execute_crosstab_query(
+        self,
+        table_name: str,
+        rows: List[str],
+        columns: List[str],
+        measure: Tuple[str, Optional[str]] = ('count', None),
+        filters: Optional[Dict[str, Any]] = None,
+        weight: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Pivot one measure over row and column dimensions
+        
+        Runs a single GROUP BY over the row and column dimensions (through
+        ``execute_aggregate_query``, so the rollup cube is used when it
+        covers the request) and folds the cells into a dense matrix:
+        ``values[i][j]`` belongs to ``row_keys[i]`` and ``column_keys[j]``,
+        ``n`` holds the unweighted sample rows and empty cells are null.
+        Margins are returned for ``count`` and ``sum``, which add up.
+        """
+        if not rows or not columns:
+            raise ValueError("A crosstab needs at least one row and one column dimension")
+        overlap = set(rows) & set(columns)
+        if overlap:
+            raise ValueError(f"Dimension(s) used as both row and column: {', '.join(sorted(overlap))}")
+        
+        result = self.execute_aggregate_query(
+            table_name=table_name,
+            filters=filters,
+            group_by=rows + columns,
+            measures=[measure],
+            weight=weight,
+            limit=self.MAX_CROSSTAB_CELLS + 1
+        )
+        if result['cell_count'] > self.MAX_CROSSTAB_CELLS:
+            raise ValueError(f"Crosstab has more than {self.MAX_CROSSTAB_CELLS:,} non-empty cells; add filters or fewer dimensions")
+        
+        name = self.measure_name(*measure)
+        row_index: Dict[tuple, int] = {}
+        column_index: Dict[tuple, int] = {}
+        for cell in result['cells']:
+            row_index.setdefault(tuple(cell[dim] for dim in rows), len(row_index))
+            column_index.setdefault(tuple(cell[dim] for dim in columns), len(column_index))
+        
+        # Keys in sorted order; blank CSV cells ('') sit in numeric columns, so
+        # the sort key never compares a string with a number
+        row_keys = sorted(row_index, key=self.dimension_sort_key)
+        row_position = {key: i for i, key in enumerate(row_keys)}
+        column_keys = sorted(column_index, key=self.dimension_sort_key)
+        column_position = {key: j for j, key in enumerate(column_keys)}
+        
+        values = [[None] * len(column_keys) for _ in row_keys]
+        n = [[0] * len(column_keys) for _ in row_keys]
+        for cell in result['cells']:
+            i = row_position[tuple(cell[dim] for dim in rows)]
+            j = column_position[tuple(cell[dim] for dim in columns)]
+            values[i][j] = cell[name]
+            n[i][j] = cell['n']
+        
+        margins = None
+        if measure[0] in ('count', 'sum'):
+            row_totals = [sum(v for v in row if v is not None) for row in values]
+            column_totals = [sum(row[j] for row in values if row[j] is not None) for j in range(len(column_keys))]
+            margins = {
+                'row_totals': row_totals,
+                'column_totals': column_totals,
+                'grand_total': sum(row_totals)
+            }
+        
+        return {
+            'dataset': table_name,
+            'rows': rows,
+            'columns': columns,
+            'measure': name,
+            'weight': weight,
+            'filters_applied': filters or {},
+            'answered_from': result['answered_from'],
+            'row_keys': [list(key) for key in row_keys],
+            'column_keys': [list(key) for key in column_keys],
+            'values': values,
+            'n': n,
+            'margins': margins,
+            'query_time_ms': result['query_time_ms']
+        }
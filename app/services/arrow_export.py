@@ -0,0 +1,190 @@
+"""
+Apache Arrow IPC and Parquet encoding for table query results
+"""
+from typing import Dict, Any, Callable, Iterator, List, Optional
+from sqlalchemy import Float, Integer, Numeric
+from sqlalchemy.orm import Session
+from app.models.dataset import Dataset
+from app.services.schema_registry import schema_registry
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+
+
+def load_pyarrow():
+    """Import pyarrow lazily; it is an optional dependency"""
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def _to_int(value: Any) -> Optional[int]:
+    if value is None or value == '':
+        return None
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value: Any) -> Optional[float]:
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_str(value: Any) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+class _ChunkSink:
+    """Write-only file object whose contents are drained after each batch"""
+    
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+    
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self._position
+    
+    def flush(self) -> None:
+        pass
+    
+    def close(self) -> None:
+        self.closed = True
+    
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ArrowExportService:
+    """
+    Encodes streamed row batches column-wise as Arrow IPC or Parquet
+    
+    Column types come from the dataset YAML schema (stored in
+    ``Dataset.config``), falling back to the reflected SQL type, so numeric
+    columns keep their types even though CSV ingestion stores blanks as ''.
+    """
+    
+    FORMATS = ('arrow', 'parquet')
+    
+    # Rows per Parquet row group; streamed batches are buffered up to this
+    # size so readers get large column chunks instead of one per batch
+    PARQUET_ROW_GROUP_ROWS = 65536
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def build_schema(self, table_name: str, fields: Optional[List[str]] = None):
+        """Build the Arrow schema of a table query in column order"""
+        pa = load_pyarrow()
+        
+        yaml_types = {}
+        dataset = self.db.query(Dataset).filter(Dataset.table_name == table_name).first()
+        if dataset and dataset.config:
+            yaml_types = {col['name']: col.get('type') for col in dataset.config.get('schema', [])}
+        
+        arrow_types = {'integer': pa.int64(), 'float': pa.float64(), 'string': pa.string()}
+        table = schema_registry.get_table(table_name, self.db.bind)
+        
+        schema_fields = []
+        for column in schema_registry.public_columns(table):
+            if fields and column.name not in fields:
+                continue
+            
+            arrow_type = arrow_types.get(yaml_types.get(column.name))
+            if arrow_type is None:
+                if isinstance(column.type, Integer):
+                    arrow_type = pa.int64()
+                elif isinstance(column.type, (Float, Numeric)):
+                    arrow_type = pa.float64()
+                else:
+                    arrow_type = pa.string()
+            
+            schema_fields.append(pa.field(column.name, arrow_type))
+        
+        return pa.schema(schema_fields)
+    
+    @classmethod
+    def encode(cls, schema, batches: Iterator[List[Dict[str, Any]]], fmt: str) -> Iterator[bytes]:
+        """
+        Encode row batches as an Arrow IPC stream or a Parquet file
+        
+        Arrow streams one message per batch. Parquet buffers batches and
+        writes a row group (and a chunk) every ``PARQUET_ROW_GROUP_ROWS``
+        rows, plus one for the rows left at the end.
+        """
+        pa = load_pyarrow()
+        import pyarrow.parquet as pq
+        
+        converters: Dict[str, Callable[[Any], Any]] = {}
+        for field in schema:
+            if pa.types.is_integer(field.type):
+                converters[field.name] = _to_int
+            elif pa.types.is_floating(field.type):
+                converters[field.name] = _to_float
+            else:
+                converters[field.name] = _to_str
+        
+        sink = _ChunkSink()
+        if fmt == 'parquet':
+            writer = pq.ParquetWriter(sink, schema, compression='snappy')
+        else:
+            writer = pa.ipc.new_stream(sink, schema)
+        
+        group_rows = cls.PARQUET_ROW_GROUP_ROWS
+        pending: List[Any] = []
+        pending_rows = 0
+        
+        try:
+            for batch in batches:
+                if not batch:
+                    continue
+                arrays = [
+                    pa.array([converters[field.name](row.get(field.name)) for row in batch], type=field.type)
+                    for field in schema
+                ]
+                record_batch = pa.RecordBatch.from_arrays(arrays, schema=schema)
+                
+                if fmt == 'parquet':
+                    pending.append(record_batch)
+                    pending_rows += record_batch.num_rows
+                    if pending_rows < group_rows:
+                        continue
+                    # Write whole row groups; carry the remainder over
+                    table = pa.Table.from_batches(pending, schema=schema)
+                    full = (pending_rows // group_rows) * group_rows
+                    writer.write_table(table.slice(0, full), row_group_size=group_rows)
+                    rest = table.slice(full)
+                    pending, pending_rows = rest.to_batches(), rest.num_rows
+                else:
+                    writer.write_batch(record_batch)
+                
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+            
+            if pending_rows:
+                writer.write_table(pa.Table.from_batches(pending, schema=schema), row_group_size=group_rows)
+        finally:
+            writer.close()
+        
+        # Stream end marker (Arrow) or footer (Parquet)
+        chunk = sink.drain()
+        if chunk:
+            yield chunk
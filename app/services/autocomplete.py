@@ -0,0 +1,163 @@
+"""
+In-memory prefix index for type-ahead over reference table names
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from bisect import bisect_left
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models.dataset import Dataset
+from app.services.schema_registry import schema_registry
+from app.services.dataset_version import dataset_versions
+from app.services.parameter_resolver import normalize_name
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PrefixIndex:
+    """
+    Sorted arrays of normalized keys searched by binary search
+    
+    Every entry is keyed by its whole label and by each word-initial
+    suffix of it, so ``wage`` finds "Casual wage labour" too. A prefix
+    query is two bisections over a sorted list; entries matching on the
+    whole label come before entries matching on a later word.
+    """
+    
+    def __init__(self, entries: List[Dict[str, Any]]):
+        self.entries = entries
+        labels: List[Tuple[str, int]] = []
+        words: List[Tuple[str, int]] = []
+        
+        for position, entry in enumerate(entries):
+            parts = normalize_name(str(entry['label'])).split(' ')
+            labels.append((' '.join(parts), position))
+            for start in range(1, len(parts)):
+                words.append((' '.join(parts[start:]), position))
+        
+        labels.sort()
+        words.sort()
+        self.label_keys = [key for key, _ in labels]
+        self.label_positions = [position for _, position in labels]
+        self.word_keys = [key for key, _ in words]
+        self.word_positions = [position for _, position in words]
+    
+    @staticmethod
+    def scan(keys: List[str], positions: List[int], prefix: str):
+        """Positions of the entries whose keys start with ``prefix``, in key order"""
+        i = bisect_left(keys, prefix)
+        while i < len(keys) and keys[i].startswith(prefix):
+            yield positions[i]
+            i += 1
+    
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Up to ``limit`` entries with a label or label word starting with ``query``"""
+        prefix = normalize_name(query)
+        if not prefix:
+            return []
+        
+        found: List[int] = []
+        seen = set()
+        for keys, positions in ((self.label_keys, self.label_positions), (self.word_keys, self.word_positions)):
+            for position in self.scan(keys, positions, prefix):
+                if position not in seen:
+                    seen.add(position)
+                    found.append(position)
+                    if len(found) == limit:
+                        return [self.entries[p] for p in found]
+        return [self.entries[p] for p in found]
+
+
+class AutocompleteService:
+    """
+    Type-ahead suggestions for the kinds declared under ``autocomplete`` in
+    reference_tables.yaml (state, district, item)
+    
+    Each kind names the table, the ``label`` column matched against the
+    query and the ``fields`` returned with every suggestion; rows with the
+    same label and fields are suggested once. The index of a kind is built
+    from its table on first use (or at startup) and rebuilt when the
+    table's data version changes, so lookups never touch the database.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        # kind -> (table, version, index)
+        self._indexes: Dict[str, Tuple[str, int, PrefixIndex]] = {}
+    
+    @staticmethod
+    def kinds(db: Session) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+        """Autocomplete kinds of the registered datasets: kind -> (table, spec)"""
+        kinds = {}
+        for dataset in db.query(Dataset).all():
+            for kind, spec in ((dataset.config or {}).get('autocomplete') or {}).items():
+                kinds[kind] = (dataset.table_name, spec)
+        return kinds
+    
+    def build(self, db: Session, kind: str, table_name: str, spec: Dict[str, Any]) -> PrefixIndex:
+        """Read the distinct suggestions of a kind and index them"""
+        version = dataset_versions.get(db, table_name)
+        table = schema_registry.get_table(table_name, db.bind)
+        
+        label = table.c[spec['label']]
+        fields = [table.c[name] for name in spec.get('fields', [])]
+        rows = db.execute(
+            select(label, *fields)
+            .where(label.isnot(None), label != '')
+            .distinct()
+            .order_by(label, *fields)
+        ).all()
+        
+        entries = [
+            {'label': row[0], **{column.name: value for column, value in zip(fields, row[1:])}}
+            for row in rows
+        ]
+        index = PrefixIndex(entries)
+        
+        with self._lock:
+            self._indexes[kind] = (table_name, version, index)
+        logger.info(f"Built {kind} autocomplete index: {len(entries):,} entries from {table_name}")
+        return index
+    
+    def get(self, db: Session, kind: str) -> PrefixIndex:
+        """Prefix index of a kind for its table's current data version"""
+        cached = self._indexes.get(kind)
+        if cached is not None and dataset_versions.get(db, cached[0]) == cached[1]:
+            return cached[2]
+        
+        kinds = self.kinds(db)
+        if kind not in kinds:
+            raise LookupError(
+                f"No autocomplete for '{kind}'; available: {', '.join(sorted(kinds)) or 'none'} "
+                f"(run materialize_reference_tables.py)"
+            )
+        table_name, spec = kinds[kind]
+        return self.build(db, kind, table_name, spec)
+    
+    def warm(self, db: Session) -> int:
+        """Build the index of every kind whose table exists; returns the kinds built"""
+        built = 0
+        for kind, (table_name, spec) in self.kinds(db).items():
+            if schema_registry.has_table(table_name, db.bind):
+                self.build(db, kind, table_name, spec)
+                built += 1
+        return built
+    
+    def suggest(self, db: Session, kind: str, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Suggestions of a kind whose label (or a word of it) starts with ``query``"""
+        return self.get(db, kind).search(query, limit)
+    
+    def invalidate(self, table_name: Optional[str] = None) -> None:
+        """Drop the indexes built from a table so they are rebuilt on next use"""
+        with self._lock:
+            if table_name is None:
+                self._indexes.clear()
+            else:
+                for kind in [kind for kind, cached in self._indexes.items() if cached[0] == table_name]:
+                    del self._indexes[kind]
+
+
+# Shared autocomplete instance; indexes follow schema invalidation
+autocomplete_index = AutocompleteService()
+schema_registry.add_invalidation_listener(autocomplete_index.invalidate)
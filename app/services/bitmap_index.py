@@ -0,0 +1,195 @@
+"""
+Bitmap indexes for low-cardinality survey filter columns
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models.dataset import BitmapIndex
+from app.services.schema_registry import schema_registry
+from app.services.dataset_version import dataset_versions
+import numpy as np
+import threading
+import logging
+import zlib
+
+logger = logging.getLogger(__name__)
+
+
+def value_key(value: Any) -> Optional[str]:
+    """
+    Normalize a column or filter value to the string a bitmap is stored under
+    
+    Numeric values collapse to one spelling (``1``, ``1.0`` and ``"1"`` all
+    become ``"1"``), mirroring SQLite's numeric comparison of coded columns.
+    """
+    if value is None:
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+    if number.is_integer():
+        return str(int(number))
+    return str(number)
+
+
+class BitmapIndexService:
+    """
+    Builds, stores and evaluates one compressed bitset per distinct value
+    
+    Bit N of a bitmap is set when the row with row key N holds the value.
+    Bitmaps are persisted zlib-compressed in ``bitmap_indexes`` at ingestion
+    and held in memory as Python ints for the current data version, so
+    equality and ``$in`` filters become AND/OR of ints and counts are a
+    popcount.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        # table -> (version, {column: {value: bitset}})
+        self._bitmaps: Dict[str, Tuple[int, Dict[str, Dict[str, int]]]] = {}
+    
+    def build(self, db: Session, table_name: str, columns: List[str], version: int) -> int:
+        """
+        Build and persist bitmaps for the given columns of a table
+        
+        Bitmaps are stamped with ``version``. Ingestion builds them for the
+        upcoming data version before bumping it, so readers never see the
+        new version without its bitmaps.
+        """
+        from app.services.query_builder import QueryBuilderService
+        
+        BitmapIndex.__table__.create(bind=db.get_bind(), checkfirst=True)
+        schema_registry.invalidate(BitmapIndex.__tablename__)
+        db.query(BitmapIndex).filter(BitmapIndex.table_name == table_name).delete()
+        
+        table = schema_registry.get_table(table_name, db.bind)
+        row_key = QueryBuilderService(db).get_row_key(table)
+        if row_key is None:
+            logger.warning(f"Table '{table_name}' has no row key, skipping bitmap indexes")
+            db.commit()
+            return 0
+        
+        built = 0
+        
+        for column_name in columns:
+            if column_name not in table.c:
+                logger.warning(f"  Bitmap column '{column_name}' not in '{table_name}', skipping")
+                continue
+            
+            rows = db.execute(select(row_key, table.c[column_name])).all()
+            if not rows:
+                continue
+            
+            keys = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+            groups: Dict[str, List[int]] = {}
+            for position, row in enumerate(rows):
+                key = value_key(row[1])
+                if key is not None and key != '':
+                    groups.setdefault(key, []).append(position)
+            
+            for key, positions in groups.items():
+                bits = np.zeros(int(keys.max()) + 1, dtype=bool)
+                bits[keys[positions]] = True
+                packed = np.packbits(bits, bitorder='little').tobytes()
+                db.add(BitmapIndex(
+                    table_name=table_name,
+                    column_name=column_name,
+                    value=key,
+                    version=version,
+                    row_count=len(positions),
+                    bitmap=zlib.compress(packed)
+                ))
+                built += 1
+            
+            logger.info(f"  Built bitmap index on {column_name}: {len(groups)} values")
+        
+        db.commit()
+        self.invalidate(table_name)
+        return built
+    
+    def load(self, db: Session, table_name: str) -> Dict[str, Dict[str, int]]:
+        """Get the bitmaps of a table for its current data version"""
+        version = dataset_versions.get(db, table_name)
+        cached = self._bitmaps.get(table_name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        
+        bitmaps: Dict[str, Dict[str, int]] = {}
+        if schema_registry.has_table(BitmapIndex.__tablename__, db.bind):
+            entries = db.query(BitmapIndex).filter(
+                BitmapIndex.table_name == table_name,
+                BitmapIndex.version == version
+            ).all()
+            for entry in entries:
+                bitmaps.setdefault(entry.column_name, {})[entry.value] = int.from_bytes(
+                    zlib.decompress(entry.bitmap), 'little'
+                )
+        
+        with self._lock:
+            self._bitmaps[table_name] = (version, bitmaps)
+        return bitmaps
+    
+    def match(self, db: Session, table_name: str, filters: Optional[Dict[str, Any]]) -> Optional[int]:
+        """
+        Evaluate filters against the bitmaps
+        
+        Returns the bitset of matching row keys, or None when any filter is
+        not an equality/``$in`` filter on a bitmap-indexed column (the caller
+        then falls back to SQL).
+        """
+        if not filters:
+            return None
+        
+        bitmaps = self.load(db, table_name)
+        if not bitmaps:
+            return None
+        
+        result = None
+        for field, value in filters.items():
+            column = bitmaps.get(field)
+            if column is None:
+                return None
+            
+            if isinstance(value, dict):
+                if set(value) != {'$in'}:
+                    return None
+                values = value['$in']
+            elif isinstance(value, list):
+                values = value
+            else:
+                values = [value]
+            
+            bitset = 0
+            for item in values:
+                bitset |= column.get(value_key(item), 0)
+            
+            result = bitset if result is None else result & bitset
+        
+        return result
+    
+    @staticmethod
+    def count(bitset: int) -> int:
+        """Number of rows in a bitset"""
+        return bitset.bit_count()
+    
+    @staticmethod
+    def row_keys(bitset: int) -> np.ndarray:
+        """Sorted row keys set in a bitset"""
+        if not bitset:
+            return np.empty(0, dtype=np.int64)
+        packed = np.frombuffer(bitset.to_bytes((bitset.bit_length() + 7) // 8, 'little'), dtype=np.uint8)
+        return np.flatnonzero(np.unpackbits(packed, bitorder='little'))
+    
+    def invalidate(self, table_name: Optional[str] = None) -> None:
+        """Drop in-memory bitmaps so they are reloaded on next use"""
+        with self._lock:
+            if table_name is None:
+                self._bitmaps.clear()
+            else:
+                self._bitmaps.pop(table_name, None)
+
+
+# Shared bitmap index instance; in-memory bitmaps follow schema invalidation
+bitmap_indexes = BitmapIndexService()
+schema_registry.add_invalidation_listener(bitmap_indexes.invalidate)
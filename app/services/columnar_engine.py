@@ -0,0 +1,302 @@
+"""
+In-memory columnar query engine for survey tables
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models.dataset import Dataset
+from app.services.schema_registry import schema_registry
+from app.services.dataset_version import dataset_versions
+import numpy as np
+import pandas as pd
+import threading
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ColumnarTable:
+    """
+    A survey table held as one NumPy array per column
+    
+    Integral columns are downcast to the smallest integer dtype that fits,
+    other numeric columns stay float64 (blank values become NaN), and text
+    columns are dictionary-encoded as integer codes plus a categories array.
+    """
+    
+    def __init__(self, table_name: str, version: int, frame: pd.DataFrame, key_column: str):
+        self.table_name = table_name
+        self.version = version
+        self.column_order: List[str] = [c for c in frame.columns if c != key_column]
+        self.arrays: Dict[str, np.ndarray] = {}
+        self.categories: Dict[str, np.ndarray] = {}
+        self.row_count = len(frame)
+        
+        self.keys = frame[key_column].to_numpy(dtype=np.int64)
+        
+        for name in self.column_order:
+            self._add_column(name, frame[name])
+    
+    def _add_column(self, name: str, series: pd.Series) -> None:
+        """Store a column with the most compact dtype that keeps its values"""
+        if series.dtype == object:
+            numeric = pd.to_numeric(series.replace('', np.nan), errors='coerce')
+            # Treat as numeric only if every non-blank value parsed
+            if numeric.notna().sum() == (series.replace('', np.nan).notna()).sum():
+                series = numeric
+        
+        if pd.api.types.is_numeric_dtype(series.dtype):
+            values = series.to_numpy(dtype=np.float64)
+            finite = values[~np.isnan(values)]
+            if len(finite) == len(values) and np.all(np.mod(finite, 1) == 0):
+                low = finite.min() if len(finite) else 0
+                high = finite.max() if len(finite) else 0
+                dtype = np.int64
+                for candidate in (np.int8, np.int16, np.int32):
+                    info = np.iinfo(candidate)
+                    if info.min <= low and high <= info.max:
+                        dtype = candidate
+                        break
+                self.arrays[name] = values.astype(dtype)
+            else:
+                self.arrays[name] = values
+            return
+        
+        codes, uniques = pd.factorize(series.astype(str), sort=True)
+        code_dtype = np.int16 if len(uniques) < np.iinfo(np.int16).max else np.int32
+        self.arrays[name] = codes.astype(code_dtype)
+        self.categories[name] = np.asarray(uniques, dtype=object)
+    
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the column arrays"""
+        return int(self.keys.nbytes + sum(a.nbytes for a in self.arrays.values()))
+    
+    def _coerce(self, name: str, value: Any) -> Any:
+        """Coerce a filter value to the column's representation"""
+        if name in self.categories:
+            return str(value)
+        if isinstance(value, str):
+            try:
+                return float(value)
+            except ValueError:
+                return np.nan
+        return value
+    
+    def _compare(self, name: str, op: str, value: Any) -> np.ndarray:
+        """Evaluate one comparison as a boolean mask over all rows"""
+        ops = {
+            '$gte': np.greater_equal,
+            '$lte': np.less_equal,
+            '$gt': np.greater,
+            '$lt': np.less,
+            '$eq': np.equal,
+            '$ne': np.not_equal
+        }
+        
+        if name in self.categories:
+            # Evaluate on the (small) categories array, then gather by code
+            categories = self.categories[name]
+            if op == '$contains':
+                needle = str(value).lower()
+                category_mask = np.array([needle in c.lower() for c in categories], dtype=bool)
+            elif op == '$in':
+                wanted = {str(v) for v in value}
+                category_mask = np.array([c in wanted for c in categories], dtype=bool)
+            else:
+                category_mask = ops[op](categories, self._coerce(name, value)).astype(bool)
+            return category_mask[self.arrays[name]]
+        
+        column = self.arrays[name]
+        if op == '$contains':
+            needle = str(value).lower()
+            return np.array([needle in str(v) for v in column.tolist()], dtype=bool)
+        if op == '$in':
+            return np.isin(column, [self._coerce(name, v) for v in value])
+        
+        mask = ops[op](column, self._coerce(name, value))
+        if op == '$ne' and column.dtype.kind == 'f':
+            # SQL '!=' never matches NULL
+            mask &= ~np.isnan(column)
+        return mask
+    
+    def build_mask(self, filters: Optional[Dict[str, Any]]) -> np.ndarray:
+        """Compile the JSON filter DSL into a single vectorized row mask"""
+        mask = np.ones(self.row_count, dtype=bool)
+        
+        for field, value in (filters or {}).items():
+            if field not in self.arrays:
+                continue
+            
+            if isinstance(value, dict):
+                for op in ('$gte', '$lte', '$gt', '$lt', '$in', '$ne', '$contains'):
+                    if op in value:
+                        mask &= self._compare(field, op, value[op])
+            elif isinstance(value, list):
+                mask &= self._compare(field, '$in', value)
+            else:
+                mask &= self._compare(field, '$eq', value)
+        
+        return mask
+    
+    def materialize(self, indices: np.ndarray, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Build row dicts for the selected row positions and columns only"""
+        if fields:
+            unknown = [field for field in fields if field not in self.arrays]
+            if unknown:
+                raise ValueError(f"Unknown field(s) for '{self.table_name}': {', '.join(unknown)}")
+        names = [n for n in self.column_order if not fields or n in fields]
+        columns = {}
+        
+        for name in names:
+            values = self.arrays[name][indices]
+            if name in self.categories:
+                columns[name] = self.categories[name][values].tolist()
+            elif values.dtype.kind == 'f':
+                columns[name] = [None if v != v else v for v in values.tolist()]
+            else:
+                columns[name] = values.tolist()
+        
+        return [
+            {name: columns[name][i] for name in names}
+            for i in range(len(indices))
+        ]
+
+
+class ColumnarEngine:
+    """
+    Loads configured survey tables into memory and answers table queries
+    
+    A dataset opts in with ``query_engine: "columnar"`` in its YAML config.
+    Tables are keyed by data version, so a re-ingestion (which bumps the
+    version) makes the next query rebuild the arrays.
+    """
+    
+    LOAD_CHUNK_SIZE = 50000
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._tables: Dict[str, ColumnarTable] = {}
+        self._enabled: Dict[str, Tuple[int, bool]] = {}
+    
+    def is_enabled(self, db: Session, table_name: str) -> bool:
+        """Check whether a table's dataset selects the columnar engine"""
+        version = dataset_versions.get(db, table_name)
+        cached = self._enabled.get(table_name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        
+        dataset = db.query(Dataset).filter(Dataset.table_name == table_name).first()
+        enabled = bool(dataset and (dataset.config or {}).get('query_engine') == 'columnar')
+        self._enabled[table_name] = (version, enabled)
+        return enabled
+    
+    def load_table(self, db: Session, table_name: str, version: int) -> ColumnarTable:
+        """Read a table from the database into column arrays"""
+        from app.services.query_builder import QueryBuilderService
+        
+        start_time = time.time()
+        table = schema_registry.get_table(table_name, db.bind)
+        row_key = QueryBuilderService(db).get_row_key(table)
+        if row_key is None:
+            raise ValueError(f"Table '{table_name}' has no row key for the columnar engine")
+        
+        query = select(*schema_registry.public_columns(table), row_key.label('_row_key')).order_by(row_key)
+        frames = pd.read_sql_query(query, db.connection(), chunksize=self.LOAD_CHUNK_SIZE)
+        frame = pd.concat(list(frames), ignore_index=True)
+        
+        columnar = ColumnarTable(table_name, version, frame, '_row_key')
+        logger.info(
+            f"Loaded '{table_name}' v{version} into columnar engine: "
+            f"{columnar.row_count:,} rows, {columnar.nbytes / (1024 * 1024):.1f} MB "
+            f"in {time.time() - start_time:.1f}s"
+        )
+        return columnar
+    
+    def get_table(self, db: Session, table_name: str) -> ColumnarTable:
+        """Get the in-memory table for the current data version, loading it if needed"""
+        version = dataset_versions.get(db, table_name)
+        columnar = self._tables.get(table_name)
+        if columnar is not None and columnar.version == version:
+            return columnar
+        
+        with self._lock:
+            load_lock = self._load_locks.setdefault(table_name, threading.Lock())
+        
+        # One loader per table; concurrent requests wait for it
+        with load_lock:
+            columnar = self._tables.get(table_name)
+            if columnar is None or columnar.version != version:
+                columnar = self.load_table(db, table_name, version)
+                self._tables[table_name] = columnar
+        
+        return columnar
+    
+    def invalidate(self, table_name: Optional[str] = None) -> None:
+        """Drop loaded tables so they are rebuilt on next use"""
+        with self._lock:
+            if table_name is None:
+                self._tables.clear()
+                self._enabled.clear()
+            else:
+                self._tables.pop(table_name, None)
+                self._enabled.pop(table_name, None)
+    
+    def execute_table_query(
+        self,
+        db: Session,
+        table_name: str,
+        filters: Optional[Dict[str, Any]] = None,
+        fields: Optional[List[str]] = None,
+        limit: int = 100,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        include_total: str = "exact"
+    ) -> Dict[str, Any]:
+        """Columnar counterpart of QueryBuilderService.execute_table_query"""
+        from app.services.query_builder import encode_cursor, decode_cursor
+        
+        start_time = time.time()
+        columnar = self.get_table(db, table_name)
+        
+        mask = columnar.build_mask(filters)
+        
+        # Counting the mask is as cheap as estimating it, so totals are always exact
+        total_count = None if include_total == "none" else int(np.count_nonzero(mask))
+        
+        # Keyset pagination: rows are stored in key order
+        if cursor is not None:
+            start = int(np.searchsorted(columnar.keys, decode_cursor(cursor)[0], side='right'))
+            mask[:start] = False
+            matches = np.flatnonzero(mask)[:limit]
+        else:
+            matches = np.flatnonzero(mask)[offset:offset + limit]
+        
+        data = columnar.materialize(matches, fields)
+        
+        next_cursor = None
+        if len(matches) == limit:
+            next_cursor = encode_cursor([int(columnar.keys[matches[-1]])])
+        
+        query_time = (time.time() - start_time) * 1000
+        
+        return {
+            'dataset': table_name,
+            'total_records': total_count,
+            'total_mode': include_total if include_total == "none" else "exact",
+            'returned_records': len(data),
+            'data': data,
+            'query_time_ms': round(query_time, 2),
+            'filters_applied': filters or {},
+            'limit': limit,
+            'offset': offset if cursor is None else None,
+            'next_cursor': next_cursor,
+            'engine': 'columnar'
+        }
+
+
+# Shared engine instance; loaded tables are dropped when a table is invalidated
+columnar_engine = ColumnarEngine()
+schema_registry.add_invalidation_listener(columnar_engine.invalidate)
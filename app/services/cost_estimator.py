@@ -0,0 +1,370 @@
+"""
+Pre-execution cost estimation for table queries
+"""
+from typing import Dict, Any, List, Optional, Set, Tuple
+from sqlalchemy import and_, case, func, inspect, select, union_all
+from sqlalchemy.orm import Session
+from app.models.dataset import Dataset, DataRecord
+from app.services.query_builder import QueryBuilderService, normalize_filters
+from app.services.aggregation import AggregationService
+from app.services.schema_registry import schema_registry
+from app.services.dataset_version import dataset_versions
+from app.services.bitmap_index import bitmap_indexes
+from app.services.columnar_engine import columnar_engine
+from app.services.count_cache import count_cache
+from app.services.serialization import dumps
+import math
+import threading
+
+
+class QueryCostEstimator:
+    """
+    Predicts the work and response size of a table query before running it
+    
+    The estimate combines the table's row count, which filter columns an
+    index (or bitmap index) can answer, the filter selectivity from the
+    sampled count estimator and the encoded width of the selected columns.
+    ``estimated_cost`` folds rows read and bytes returned into one number
+    that admission limits are expressed in.
+    
+    JSON datasets in ``data_records`` and aggregate queries are estimated
+    on the same scale, so every query path is admitted against the same
+    limits.
+    """
+    
+    # Cost units per row read for the page, per row counted for the total,
+    # and per response byte
+    ROW_SCAN_COST = 1.0
+    ROW_COUNT_COST = 0.05
+    BYTE_COST = 0.01
+    
+    # The columnar engine evaluates filters over in-memory arrays
+    COLUMNAR_ROW_COST = 0.01
+    
+    WIDTH_SAMPLE_ROWS = 50
+    
+    # Encoded bytes per value of an aggregate cell, on top of its key
+    CELL_VALUE_BYTES = 16
+    
+    _lock = threading.Lock()
+    # table -> leading columns of its indexes
+    _indexed_columns: Dict[str, Set[str]] = {}
+    # (table, version, fields) -> encoded bytes per row
+    _row_widths: Dict[Tuple[str, int, Tuple[str, ...]], float] = {}
+    
+    def __init__(self, db: Session):
+        self.db = db
+        self.query_builder = QueryBuilderService(db)
+    
+    @classmethod
+    def invalidate(cls, table_name: Optional[str] = None) -> None:
+        """Drop cached index and width metadata"""
+        with cls._lock:
+            if table_name is None:
+                cls._indexed_columns.clear()
+                cls._row_widths.clear()
+            else:
+                cls._indexed_columns.pop(table_name, None)
+                for key in [k for k in cls._row_widths if k[0] == table_name]:
+                    del cls._row_widths[key]
+    
+    def indexed_columns(self, table) -> Set[str]:
+        """Columns that lead an index, so a filter on them is an index seek"""
+        cached = self._indexed_columns.get(table.name)
+        if cached is not None:
+            return cached
+        
+        columns = {col.name for col in table.primary_key.columns}
+        for index in inspect(self.db.bind).get_indexes(table.name):
+            names = index.get('column_names') or []
+            if names and names[0]:
+                columns.add(names[0])
+        
+        with self._lock:
+            self._indexed_columns[table.name] = columns
+        return columns
+    
+    def row_width(self, table, row_key, fields: Optional[List[str]]) -> float:
+        """Average encoded JSON bytes per row of the projection, from a sample"""
+        key = (table.name, dataset_versions.get(self.db, table.name), tuple(fields or ()))
+        cached = self._row_widths.get(key)
+        if cached is not None:
+            return cached
+        
+        columns = self.query_builder.resolve_projection(table, fields)
+        query = self.query_builder.build_page_query(
+            table, columns, row_key, [], None, self.WIDTH_SAMPLE_ROWS, 0, None
+        )
+        rows = [dict(row._mapping) for row in self.db.execute(query).all()]
+        for row in rows:
+            row.pop('_row_key', None)
+        
+        # Each row in a response is followed by a comma
+        width = (len(dumps(rows)) / len(rows)) + 1 if rows else 0.0
+        
+        with self._lock:
+            self._row_widths[key] = width
+        return width
+    
+    def estimate_table_query(
+        self,
+        table_name: str,
+        filters: Optional[Dict[str, Any]] = None,
+        fields: Optional[List[str]] = None,
+        limit: int = 100,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        include_total: str = "exact"
+    ) -> Dict[str, Any]:
+        """Estimate rows scanned, rows and bytes returned, and the cost of a table query"""
+        table = schema_registry.get_table(table_name, self.db.bind)
+        row_key = self.query_builder.get_row_key(table)
+        conditions = self.query_builder.build_table_conditions(table, filters)
+        
+        filter_columns = [field for field in (filters or {}) if field in table.c]
+        indexed = self.indexed_columns(table) | set(bitmap_indexes.load(self.db, table_name))
+        indexed_filters = [col for col in filter_columns if col in indexed]
+        unindexed_filters = [col for col in filter_columns if col not in indexed]
+        
+        table_rows = self.query_builder.estimate_table_rows(table, row_key)
+        bitset = bitmap_indexes.match(self.db, table_name, filters) if row_key is not None else None
+        columnar = columnar_engine.is_enabled(self.db, table_name)
+        
+        if bitset is not None:
+            access_path = 'bitmap'
+            matching_rows = bitmap_indexes.count(bitset)
+        elif conditions:
+            access_path = 'index' if indexed_filters else 'scan'
+            matching_rows = self.query_builder.estimate_filtered_rows(table, row_key, conditions)
+        else:
+            access_path = 'key_range'
+            matching_rows = table_rows
+        
+        # Rows read to produce the page
+        rows_needed = limit + (0 if cursor is not None else offset)
+        if access_path in ('key_range', 'bitmap'):
+            page_scanned = min(matching_rows, rows_needed)
+        elif access_path == 'index':
+            page_scanned = matching_rows
+        elif matching_rows <= rows_needed:
+            page_scanned = table_rows
+        else:
+            # Matches are spread through the table; stop once the page is full
+            page_scanned = min(table_rows, math.ceil(rows_needed * table_rows / matching_rows))
+        
+        # Rows counted for the total
+        count_scanned = 0
+        cached_total = count_cache.get(table_name, include_total, normalize_filters(filters))
+        if include_total != "none" and cached_total is None and bitset is None:
+            if include_total == "estimated":
+                count_scanned = self.query_builder.SAMPLE_WINDOWS * self.query_builder.SAMPLE_WINDOW_SIZE if conditions else 0
+            else:
+                count_scanned = matching_rows if access_path == 'index' else table_rows
+        
+        if cursor is not None:
+            rows_returned = min(limit, matching_rows)
+        else:
+            rows_returned = min(limit, max(0, matching_rows - offset))
+        
+        bytes_per_row = self.row_width(table, row_key, fields)
+        bytes_returned = int(rows_returned * bytes_per_row)
+        
+        if columnar:
+            engine = 'columnar'
+            scan_cost = table_rows * self.COLUMNAR_ROW_COST
+        else:
+            engine = 'sql'
+            scan_cost = page_scanned * self.ROW_SCAN_COST + count_scanned * self.ROW_COUNT_COST
+        
+        return {
+            'dataset': table_name,
+            'engine': engine,
+            'access_path': access_path,
+            'indexed_filter_columns': indexed_filters,
+            'unindexed_filter_columns': unindexed_filters,
+            'table_rows': table_rows,
+            'estimated_matching_rows': matching_rows,
+            'estimated_rows_scanned': table_rows if columnar else page_scanned + count_scanned,
+            'estimated_rows_returned': rows_returned,
+            'estimated_bytes_per_row': round(bytes_per_row, 1),
+            'estimated_bytes_returned': bytes_returned,
+            'estimated_cost': int(round(scan_cost + bytes_returned * self.BYTE_COST))
+        }
+    
+    
+    def estimate_records_query(
+        self,
+        dataset: Dataset,
+        filters: Optional[Dict[str, Any]] = None,
+        fields: Optional[List[str]] = None,
+        limit: int = 100,
+        offset: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Estimate a query on a dataset stored as JSON in data_records
+        
+        Filters run in the database on the JSON keys, so they are estimated
+        like table filters: keys listed in ``json_indexes`` are index seeks,
+        the others a scan of the dataset's records that stops once the page
+        is full, and the match count comes from sampled windows.
+        """
+        table_rows = self.db.query(func.count(DataRecord.id)).filter(DataRecord.dataset_id == dataset.id).scalar()
+        
+        json_indexes = set((dataset.config or {}).get('json_indexes', []))
+        indexed_filters = [key for key in (filters or {}) if key in json_indexes]
+        unindexed_filters = [key for key in (filters or {}) if key not in json_indexes]
+        
+        if filters:
+            access_path = 'index' if indexed_filters else 'scan'
+            conditions = self.query_builder.build_json_conditions(filters)
+            matching_rows = self.estimate_matching_records(dataset, table_rows, conditions)
+        else:
+            access_path = 'key_range'
+            matching_rows = table_rows
+        
+        # Rows read to produce the page
+        rows_needed = limit + offset
+        if access_path == 'key_range':
+            page_scanned = min(table_rows, rows_needed)
+        elif access_path == 'index':
+            page_scanned = matching_rows
+        elif matching_rows <= rows_needed:
+            page_scanned = table_rows
+        else:
+            # Matches are spread through the records; stop once the page is full
+            page_scanned = min(table_rows, math.ceil(rows_needed * table_rows / matching_rows))
+        
+        # The total is always counted: over the dataset_id index, or the filtered records
+        count_scanned = matching_rows if access_path == 'index' else table_rows
+        rows_returned = min(limit, max(0, matching_rows - offset))
+        
+        bytes_per_row = self.records_width(dataset, fields)
+        bytes_returned = int(rows_returned * bytes_per_row)
+        scan_cost = page_scanned * self.ROW_SCAN_COST + count_scanned * self.ROW_COUNT_COST
+        
+        return {
+            'dataset': dataset.table_name,
+            'engine': 'json',
+            'access_path': access_path,
+            'indexed_filter_columns': indexed_filters,
+            'unindexed_filter_columns': unindexed_filters,
+            'table_rows': table_rows,
+            'estimated_matching_rows': matching_rows,
+            'estimated_rows_scanned': page_scanned + count_scanned,
+            'estimated_rows_returned': rows_returned,
+            'estimated_bytes_per_row': round(bytes_per_row, 1),
+            'estimated_bytes_returned': bytes_returned,
+            'estimated_cost': int(round(scan_cost + bytes_returned * self.BYTE_COST))
+        }
+    
+    def estimate_matching_records(self, dataset: Dataset, table_rows: int, conditions: List[Any]) -> int:
+        """
+        Estimate the records of a dataset matching JSON conditions
+        
+        Small datasets are counted outright; larger ones from evenly spaced
+        id windows across the dataset, as ``estimate_filtered_rows`` does
+        for tables.
+        """
+        window_size = self.query_builder.SAMPLE_WINDOW_SIZE
+        windows = self.query_builder.SAMPLE_WINDOWS
+        in_dataset = DataRecord.dataset_id == dataset.id
+        
+        if table_rows <= windows * window_size:
+            return self.db.query(func.count(DataRecord.id)).filter(in_dataset, *conditions).scalar()
+        
+        low, high = self.db.query(func.min(DataRecord.id), func.max(DataRecord.id)).filter(in_dataset).one()
+        step = (high - low + 1) // windows
+        
+        # One range seek per window; each reports records sampled and matched
+        matched_expr = func.sum(case((and_(*conditions), 1), else_=0))
+        samples = union_all(*[
+            select(func.count().label('sampled'), matched_expr.label('matched'))
+            .where(in_dataset, DataRecord.id.between(low + i * step, low + i * step + window_size - 1))
+            for i in range(windows)
+        ]).subquery()
+        
+        sampled, matched = self.db.query(func.sum(samples.c.sampled), func.sum(samples.c.matched)).one()
+        if not sampled:
+            return 0
+        
+        return int(round(table_rows * (matched or 0) / sampled))
+    
+    def records_width(self, dataset: Dataset, fields: Optional[List[str]]) -> float:
+        """Average encoded JSON bytes per record of a data_records dataset, from a sample"""
+        key = (dataset.table_name, dataset_versions.get(self.db, dataset.table_name), tuple(fields or ()))
+        cached = self._row_widths.get(key)
+        if cached is not None:
+            return cached
+        
+        records = [
+            row.data for row in self.db.query(DataRecord.data)
+            .filter(DataRecord.dataset_id == dataset.id)
+            .order_by(DataRecord.id)
+            .limit(self.WIDTH_SAMPLE_ROWS)
+        ]
+        if fields:
+            records = [{field: record.get(field) for field in fields} for record in records]
+        width = (len(dumps(records)) / len(records)) + 1 if records else 0.0
+        
+        with self._lock:
+            self._row_widths[key] = width
+        return width
+    
+    def estimate_aggregate_query(
+        self,
+        table_name: str,
+        filters: Optional[Dict[str, Any]] = None,
+        group_by: Optional[List[str]] = None,
+        measures: Optional[List[Tuple[str, Optional[str]]]] = None,
+        weight: Optional[str] = None,
+        limit: int = 10000
+    ) -> Dict[str, Any]:
+        """
+        Estimate an aggregate (or crosstab) query
+        
+        A request the rollup cube covers reads its cells; otherwise every
+        matching row of the table is read once. At most ``limit`` cells come
+        back, and never more than the rows read.
+        """
+        aggregation = AggregationService(self.db)
+        group_by = group_by or []
+        measures = measures or [('count', None)]
+        
+        table = schema_registry.get_table(table_name, self.db.bind)
+        row_key = self.query_builder.get_row_key(table)
+        conditions = self.query_builder.build_table_conditions(table, filters)
+        table_rows = self.query_builder.estimate_table_rows(table, row_key)
+        
+        if aggregation.find_rollup(table_name, filters or {}, group_by, measures, weight) is not None:
+            access_path = 'rollup'
+            cube = schema_registry.get_table(aggregation.rollup_table_name(table_name), self.db.bind)
+            rows_scanned = self.query_builder.estimate_table_rows(cube, None)
+        elif conditions:
+            filter_columns = [field for field in (filters or {}) if field in table.c]
+            indexed = self.indexed_columns(table) | set(bitmap_indexes.load(self.db, table_name))
+            access_path = 'index' if any(col in indexed for col in filter_columns) else 'scan'
+            matching_rows = self.query_builder.estimate_filtered_rows(table, row_key, conditions)
+            rows_scanned = matching_rows if access_path == 'index' else table_rows
+        else:
+            access_path = 'scan'
+            rows_scanned = table_rows
+        
+        names = group_by + [aggregation.measure_name(operation, column) for operation, column in measures] + ['n']
+        bytes_per_cell = sum(len(name) + self.CELL_VALUE_BYTES for name in names)
+        cells_returned = min(limit, rows_scanned)
+        bytes_returned = int(cells_returned * bytes_per_cell)
+        
+        return {
+            'dataset': table_name,
+            'engine': 'sql',
+            'access_path': access_path,
+            'table_rows': table_rows,
+            'estimated_rows_scanned': rows_scanned,
+            'estimated_cells_returned': cells_returned,
+            'estimated_bytes_returned': bytes_returned,
+            'estimated_cost': int(round(rows_scanned * self.ROW_SCAN_COST + bytes_returned * self.BYTE_COST))
+        }
+
+
+# Cached index and width metadata follow schema invalidation
+schema_registry.add_invalidation_listener(QueryCostEstimator.invalidate)
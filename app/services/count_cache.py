@@ -0,0 +1,53 @@
+"""
+Cache of total row counts for filtered table queries
+"""
+from collections import OrderedDict
+from typing import Optional, Tuple
+from app.services.schema_registry import schema_registry
+import threading
+
+
+class CountCache:
+    """
+    Bounded LRU cache of row counts keyed by table, count mode and normalized filter
+    
+    Survey tables only change on ingestion, so a count computed once stays
+    valid until the table is invalidated in the schema registry.
+    """
+    
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str, str], int]" = OrderedDict()
+    
+    def get(self, table_name: str, mode: str, filter_key: str) -> Optional[int]:
+        """Get a cached count, or None on a miss"""
+        key = (table_name, mode, filter_key)
+        with self._lock:
+            count = self._entries.get(key)
+            if count is not None:
+                self._entries.move_to_end(key)
+            return count
+    
+    def set(self, table_name: str, mode: str, filter_key: str, count: int) -> None:
+        """Store a count, evicting the least recently used entry when full"""
+        key = (table_name, mode, filter_key)
+        with self._lock:
+            self._entries[key] = count
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, table_name: Optional[str] = None) -> None:
+        """Drop cached counts for one table, or all of them"""
+        with self._lock:
+            if table_name is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] == table_name]:
+                del self._entries[key]
+
+
+# Shared cache instance, dropped together with the table's schema
+count_cache = CountCache()
+schema_registry.add_invalidation_listener(count_cache.invalidate)
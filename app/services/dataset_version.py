@@ -0,0 +1,80 @@
+"""
+Dataset version tracking for cache invalidation across processes
+"""
+from typing import Dict, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.models.dataset import DatasetVersion
+from app.services.schema_registry import schema_registry
+from app.config import get_settings
+import threading
+import time
+
+settings = get_settings()
+
+
+class DatasetVersionTracker:
+    """
+    Tracks the data version of each dataset table
+    
+    Ingestion bumps the version in the ``dataset_versions`` table, so caches
+    in every process can tag entries with it. Versions are memoized for
+    ``DATASET_VERSION_TTL_SECONDS``; a bump in this process takes effect
+    immediately, a bump from another process (e.g. the ingestion CLI) within
+    the TTL.
+    """
+    
+    def __init__(self, ttl_seconds: float = None):
+        self.ttl_seconds = settings.DATASET_VERSION_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._lock = threading.Lock()
+        self._versions: Dict[str, Tuple[int, float]] = {}
+    
+    def get(self, db: Session, table_name: str) -> int:
+        """Get the current data version of a table (0 if never ingested)"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._versions.get(table_name)
+            if cached is not None and now - cached[1] < self.ttl_seconds:
+                return cached[0]
+        
+        row = db.query(DatasetVersion.version).filter(DatasetVersion.table_name == table_name).first()
+        version = row[0] if row else 0
+        
+        with self._lock:
+            previous = self._versions.get(table_name)
+            self._versions[table_name] = (version, now)
+        
+        # Another process re-ingested the table - drop everything derived from it
+        if previous is not None and previous[0] != version:
+            schema_registry.invalidate(table_name)
+        
+        return version
+    
+    def bump(self, db: Session, table_name: str) -> int:
+        """Increment the data version of a table after it has changed"""
+        DatasetVersion.__table__.create(bind=db.get_bind(), checkfirst=True)
+        
+        entry = db.query(DatasetVersion).filter(DatasetVersion.table_name == table_name).first()
+        if entry is None:
+            entry = DatasetVersion(table_name=table_name, version=1)
+            db.add(entry)
+        else:
+            entry.version += 1
+        db.commit()
+        
+        with self._lock:
+            self._versions[table_name] = (entry.version, time.monotonic())
+        
+        schema_registry.invalidate(table_name)
+        return entry.version
+    
+    def forget(self, table_name: Optional[str] = None) -> None:
+        """Drop memoized versions so the next lookup reads the database"""
+        with self._lock:
+            if table_name is None:
+                self._versions.clear()
+            else:
+                self._versions.pop(table_name, None)
+
+
+# Shared tracker instance for the whole process
+dataset_versions = DatasetVersionTracker()
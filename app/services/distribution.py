@@ -0,0 +1,189 @@
+"""
+Weighted histograms and quantiles of numeric survey columns
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import Float, cast, func, select
+from sqlalchemy.orm import Session
+from app.services.schema_registry import schema_registry
+from app.services.query_builder import QueryBuilderService
+from app.services.columnar_engine import columnar_engine
+import numpy as np
+import time
+
+
+class DistributionService:
+    """
+    Computes the distribution of one numeric column in the database tier
+    
+    Only the column and the weight of the matching rows are read, through a
+    server-side cursor in batches of ``BATCH_SIZE`` (or straight from the
+    arrays of a columnar-engine table). Histogram, quantiles and moments
+    are then computed with NumPy over those two arrays, so no raw rows are
+    sent to the client. Quantiles are weighted inverse-CDF values: the
+    smallest value whose cumulative weight reaches the requested share.
+    """
+    
+    BATCH_SIZE = 50000
+    MAX_BINS = 1000
+    DEFAULT_QUANTILES = [0.1, 0.25, 0.5, 0.75, 0.9]
+    
+    def __init__(self, db: Session):
+        self.db = db
+        self.query_builder = QueryBuilderService(db)
+    
+    @staticmethod
+    def parse_quantiles(quantiles: Optional[str]) -> List[float]:
+        """Parse a comma-separated list of shares between 0 and 1"""
+        if not quantiles:
+            return list(DistributionService.DEFAULT_QUANTILES)
+        
+        parsed = []
+        for item in quantiles.split(','):
+            try:
+                share = float(item)
+            except ValueError:
+                raise ValueError(f"Invalid quantile '{item.strip()}'")
+            if not 0 <= share <= 1:
+                raise ValueError(f"Quantile {share:g} is not between 0 and 1")
+            parsed.append(share)
+        return parsed
+    
+    def numeric(self, column):
+        """Read a column as a number; blank strings (CSV ingestion fills NaN with '') become NULL"""
+        if self.db.bind.dialect.name == 'sqlite':
+            column = func.nullif(column, '')
+        return cast(column, Float)
+    
+    def load_values(
+        self,
+        table_name: str,
+        column_name: str,
+        filters: Optional[Dict[str, Any]],
+        weight: Optional[str]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Values and weights of the matching rows with a value (weight 1 when unweighted)"""
+        if columnar_engine.is_enabled(self.db, table_name):
+            columnar = columnar_engine.get_table(self.db, table_name)
+            for name in filter(None, (column_name, weight)):
+                if name not in columnar.arrays:
+                    raise ValueError(f"Column '{name}' not found in table '{table_name}'")
+                if name in columnar.categories:
+                    raise ValueError(f"Column '{name}' is not numeric")
+            mask = columnar.build_mask(filters)
+            values = columnar.arrays[column_name][mask].astype(np.float64)
+            weights = columnar.arrays[weight][mask].astype(np.float64) if weight else np.ones(len(values))
+        else:
+            table = schema_registry.get_table(table_name, self.db.bind)
+            for name in filter(None, (column_name, weight)):
+                if name not in table.c:
+                    raise ValueError(f"Column '{name}' not found in table '{table_name}'")
+            
+            value = self.numeric(table.c[column_name])
+            columns = [value, self.numeric(table.c[weight])] if weight else [value]
+            conditions = self.query_builder.build_table_conditions(table, filters)
+            query = select(*columns).where(value.isnot(None), *conditions)
+            
+            result = self.db.execute(query.execution_options(stream_results=True, yield_per=self.BATCH_SIZE))
+            batches = [np.array(partition, dtype=np.float64).reshape(-1, len(columns)) for partition in result.partitions()]
+            pairs = np.concatenate(batches) if batches else np.empty((0, len(columns)))
+            
+            values = pairs[:, 0]
+            weights = pairs[:, 1] if weight else np.ones(len(values))
+        
+        # Rows without a value or a usable weight do not count
+        keep = ~np.isnan(values) & ~np.isnan(weights) & (weights > 0)
+        return values[keep], weights[keep]
+    
+    def compute(
+        self,
+        table_name: str,
+        column_name: str,
+        filters: Optional[Dict[str, Any]] = None,
+        weight: Optional[str] = None,
+        bins: int = 20,
+        range_min: Optional[float] = None,
+        range_max: Optional[float] = None,
+        quantiles: Optional[List[float]] = None
+    ) -> Dict[str, Any]:
+        """
+        Weighted histogram, quantiles and summary of a column under filters
+        
+        ``bins`` equal-width bins span ``range_min``..``range_max`` (the
+        data's range by default); values outside the range are counted in
+        ``below_range``/``above_range``. Each bin reports ``n`` (sample
+        rows), ``weight`` (weighted count) and ``share`` of the total weight.
+        """
+        start_time = time.time()
+        
+        if not 1 <= bins <= self.MAX_BINS:
+            raise ValueError(f"bins must be between 1 and {self.MAX_BINS}")
+        quantiles = self.DEFAULT_QUANTILES if quantiles is None else quantiles
+        
+        values, weights = self.load_values(table_name, column_name, filters, weight)
+        total_weight = float(weights.sum())
+        
+        summary: Dict[str, Any] = {'n': int(len(values)), 'total_weight': total_weight}
+        histogram: List[Dict[str, Any]] = []
+        quantile_values: Dict[str, Optional[float]] = {f"{share:g}": None for share in quantiles}
+        below = above = 0
+        
+        if len(values):
+            mean = float(np.average(values, weights=weights))
+            summary.update({
+                'min': float(values.min()),
+                'max': float(values.max()),
+                'mean': mean,
+                'std': float(np.sqrt(np.average((values - mean) ** 2, weights=weights)))
+            })
+            
+            # Weighted inverse CDF over the sorted values
+            order = np.argsort(values, kind='stable')
+            sorted_values = values[order]
+            cumulative = np.cumsum(weights[order])
+            positions = np.searchsorted(cumulative, np.asarray(quantiles) * total_weight, side='left')
+            positions = np.minimum(positions, len(sorted_values) - 1)
+            quantile_values = {
+                f"{share:g}": float(sorted_values[position])
+                for share, position in zip(quantiles, positions)
+            }
+            
+            low = summary['min'] if range_min is None else range_min
+            high = summary['max'] if range_max is None else range_max
+            if low > high:
+                raise ValueError("range_min must not be greater than range_max")
+            if low == high:
+                high = low + 1
+            
+            in_range = (values >= low) & (values <= high)
+            below = int((values < low).sum())
+            above = int((values > high).sum())
+            
+            edges = np.linspace(low, high, bins + 1)
+            counts, _ = np.histogram(values[in_range], bins=edges)
+            weighted, _ = np.histogram(values[in_range], bins=edges, weights=weights[in_range])
+            
+            histogram = [
+                {
+                    'lower': float(edges[i]),
+                    'upper': float(edges[i + 1]),
+                    'n': int(counts[i]),
+                    'weight': float(weighted[i]),
+                    'share': float(weighted[i] / total_weight) if total_weight else 0.0
+                }
+                for i in range(bins)
+            ]
+        
+        query_time = (time.time() - start_time) * 1000
+        
+        return {
+            'dataset': table_name,
+            'column': column_name,
+            'weight': weight,
+            'filters_applied': filters or {},
+            'summary': summary,
+            'quantiles': quantile_values,
+            'histogram': histogram,
+            'below_range': below,
+            'above_range': above,
+            'query_time_ms': round(query_time, 2)
+        }
@@ -0,0 +1,227 @@
+"""
+Distinct values and counts (facets) of survey table columns
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import String, select, func
+from sqlalchemy.orm import Session
+from app.models.dataset import DataRecord, FacetCount
+from app.services.schema_registry import schema_registry
+from app.services.dataset_version import dataset_versions
+from app.services.bitmap_index import bitmap_indexes, value_key
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Facet values in value order: [(value, row count), ...]
+FacetValues = List[Tuple[Any, int]]
+
+
+class FacetService:
+    """
+    Distinct values of a column with their row counts, for filter dropdowns
+    
+    Unfiltered facets of the configured columns are counted at ingestion and
+    persisted in ``facet_counts`` for the upcoming data version; they are
+    held in memory per version, and facets of other columns join them on
+    first use. Filtered facets intersect the filter's bitset with each
+    value's bitmap when both are bitmap-indexed (a popcount per value), and
+    otherwise run one GROUP BY over the filtered rows, which uses the
+    table's indexes on the filter columns.
+    
+    NULL and blank values are not facet values.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        # table -> (version, {column: values})
+        self._facets: Dict[str, Tuple[int, Dict[str, FacetValues]]] = {}
+    
+    @staticmethod
+    def count_values(db: Session, table, column_name: str, conditions: Optional[List[Any]] = None) -> FacetValues:
+        """Count the rows per distinct value of a column with one GROUP BY"""
+        column = table.c[column_name]
+        present = [column.isnot(None)]
+        # CSV ingestion fills NaN with '' in every column, numeric ones included
+        if isinstance(column.type, String) or db.bind.dialect.name == 'sqlite':
+            present.append(column != '')
+        
+        rows = db.execute(
+            select(column, func.count())
+            .where(*present, *(conditions or []))
+            .group_by(column)
+            .order_by(column)
+        ).all()
+        return [(row[0], row[1]) for row in rows]
+    
+    def build(self, db: Session, table_name: str, columns: List[str], version: int) -> int:
+        """
+        Count and persist the unfiltered facets of the given columns
+        
+        Counts are stamped with ``version``; like bitmaps, ingestion builds
+        them for the upcoming data version before bumping it.
+        """
+        FacetCount.__table__.create(bind=db.get_bind(), checkfirst=True)
+        schema_registry.invalidate(FacetCount.__tablename__)
+        db.query(FacetCount).filter(FacetCount.table_name == table_name).delete()
+        
+        table = schema_registry.get_table(table_name, db.bind)
+        stored = 0
+        
+        for column_name in dict.fromkeys(columns):
+            if column_name not in table.c:
+                logger.warning(f"  Facet column '{column_name}' not in '{table_name}', skipping")
+                continue
+            
+            values = self.count_values(db, table, column_name)
+            db.add_all([
+                FacetCount(
+                    table_name=table_name,
+                    column_name=column_name,
+                    value=value,
+                    version=version,
+                    row_count=count
+                )
+                for value, count in values
+            ])
+            stored += len(values)
+            logger.info(f"  Counted facet {column_name}: {len(values)} values")
+        
+        db.commit()
+        self.invalidate(table_name)
+        return stored
+    
+    def load(self, db: Session, table_name: str) -> Dict[str, FacetValues]:
+        """Get the unfiltered facets of a table for its current data version"""
+        version = dataset_versions.get(db, table_name)
+        cached = self._facets.get(table_name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        
+        facets: Dict[str, FacetValues] = {}
+        if schema_registry.has_table(FacetCount.__tablename__, db.bind):
+            entries = db.query(FacetCount).filter(
+                FacetCount.table_name == table_name,
+                FacetCount.version == version
+            ).order_by(FacetCount.id).all()
+            for entry in entries:
+                if entry.value == '':
+                    continue  # Counted before blanks were left out of numeric columns
+                facets.setdefault(entry.column_name, []).append((entry.value, entry.row_count))
+        
+        with self._lock:
+            self._facets[table_name] = (version, facets)
+        return facets
+    
+    def facets(
+        self,
+        db: Session,
+        table_name: str,
+        columns: List[str],
+        filters: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Facets of several columns of a table, optionally under a filter
+        
+        Returns ``{column: {'values': [{'value', 'count'}], 'distinct_values',
+        'source'}}`` where ``source`` is ``precomputed``, ``bitmap`` or
+        ``sql``. Raises ``ValueError`` for unknown or internal columns and
+        for the primary key, whose every value is distinct.
+        """
+        from app.services.query_builder import QueryBuilderService
+        
+        table = schema_registry.get_table(table_name, db.bind)
+        unknown = [
+            name for name in columns
+            if name not in table.c or schema_registry.is_internal_column(name)
+        ]
+        if unknown:
+            raise ValueError(f"Unknown column(s) for '{table_name}': {', '.join(unknown)}")
+        keys = [name for name in columns if table.c[name].primary_key]
+        if keys:
+            raise ValueError(f"No facets for primary key column(s): {', '.join(keys)}")
+        
+        unfiltered = self.load(db, table_name)
+        query_builder = QueryBuilderService(db)
+        
+        conditions = query_builder.build_table_conditions(table, filters)
+        bitset = None
+        if filters and query_builder.get_row_key(table) is not None:
+            bitset = bitmap_indexes.match(db, table_name, filters)
+        bitmaps = bitmap_indexes.load(db, table_name) if bitset is not None else {}
+        
+        result = {}
+        for column_name in columns:
+            if not filters:
+                values = unfiltered.get(column_name)
+                source = 'precomputed'
+                if values is None:
+                    values = self.count_values(db, table, column_name)
+                    with self._lock:
+                        unfiltered[column_name] = values
+                    source = 'sql'
+            elif bitset is not None and column_name in bitmaps and column_name in unfiltered:
+                # Popcount of the filter's rows within each value's bitmap
+                column_bitmaps = bitmaps[column_name]
+                values = []
+                for value, _ in unfiltered[column_name]:
+                    count = bitmap_indexes.count(bitset & column_bitmaps.get(value_key(value), 0))
+                    if count:
+                        values.append((value, count))
+                source = 'bitmap'
+            else:
+                values = self.count_values(db, table, column_name, conditions)
+                source = 'sql'
+            
+            result[column_name] = {
+                'values': [{'value': value, 'count': count} for value, count in values],
+                'distinct_values': len(values),
+                'source': source
+            }
+        
+        return result
+    
+    def json_facets(
+        self,
+        db: Session,
+        dataset_id: int,
+        keys: List[str],
+        filters: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """Facets of JSON keys of a data_records dataset, counted in the database"""
+        from app.services.query_builder import QueryBuilderService
+        
+        query_builder = QueryBuilderService(db)
+        conditions = [DataRecord.dataset_id == dataset_id, *query_builder.build_json_conditions(filters)]
+        
+        result = {}
+        for key in keys:
+            field = query_builder.json_field(key)
+            rows = db.execute(
+                select(field, func.count())
+                .where(*conditions, field.isnot(None))
+                .group_by(field)
+                .order_by(field)
+            ).all()
+            values = [(row[0], row[1]) for row in rows if row[0] != '']
+            
+            result[key] = {
+                'values': [{'value': value, 'count': count} for value, count in values],
+                'distinct_values': len(values),
+                'source': 'sql'
+            }
+        
+        return result
+    
+    def invalidate(self, table_name: Optional[str] = None) -> None:
+        """Drop in-memory facets so they are reloaded on next use"""
+        with self._lock:
+            if table_name is None:
+                self._facets.clear()
+            else:
+                self._facets.pop(table_name, None)
+
+
+# Shared facet instance; in-memory facets follow schema invalidation
+facet_index = FacetService()
+schema_registry.add_invalidation_listener(facet_index.invalidate)
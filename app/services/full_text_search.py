@@ -0,0 +1,157 @@
+"""
+Full-text search over typed reference tables
+"""
+from typing import Dict, Any, List, Optional
+from sqlalchemy import select, func, text, literal_column, table as sql_table, column as sql_column
+from sqlalchemy.orm import Session
+from app.services.schema_registry import schema_registry
+from app.services.query_builder import QueryBuilderService
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def fts_table_name(table_name: str) -> str:
+    """Name of the SQLite FTS5 index of a table"""
+    return f"{table_name}_fts"
+
+
+def fts_index_name(table_name: str) -> str:
+    """Name of the PostgreSQL GIN index of a table"""
+    return f"idx_{table_name}_search"
+
+
+def search_terms(query: str) -> List[str]:
+    """Split a user query into word tokens; punctuation never reaches the FTS syntax"""
+    return re.findall(r'\w+', query.lower())
+
+
+class FullTextSearchService:
+    """
+    Ranked full-text search over selected text columns of a table
+    
+    SQLite uses an external-content FTS5 table (``<table>_fts``) ranked by
+    bm25; PostgreSQL uses a GIN index over a ``to_tsvector`` expression of
+    the same columns ranked by ``ts_rank``. Every query term is matched as a
+    prefix, so partial words ("agri") find "agriculture".
+    """
+    
+    TS_CONFIG = 'simple'
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    @property
+    def dialect(self) -> str:
+        return self.db.bind.dialect.name
+    
+    def _tsvector_sql(self, columns: List[str]) -> str:
+        document = " || ' ' || ".join(f"coalesce(\"{col}\", '')" for col in columns)
+        return f"to_tsvector('{self.TS_CONFIG}', {document})"
+    
+    def build_index(self, table_name: str, columns: List[str]) -> None:
+        """(Re)build the full-text index of a table after its rows were loaded"""
+        with self.db.bind.begin() as conn:
+            if self.dialect == 'postgresql':
+                conn.execute(text(f"DROP INDEX IF EXISTS {fts_index_name(table_name)}"))
+                conn.execute(text(
+                    f"CREATE INDEX {fts_index_name(table_name)} ON {table_name} "
+                    f"USING GIN ({self._tsvector_sql(columns)})"
+                ))
+            else:
+                fts = fts_table_name(table_name)
+                column_list = ', '.join(f'"{col}"' for col in columns)
+                conn.execute(text(f"DROP TABLE IF EXISTS {fts}"))
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE {fts} USING fts5({column_list}, "
+                    f"content='{table_name}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+                ))
+                conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES('rebuild')"))
+        
+        schema_registry.invalidate(fts_table_name(table_name))
+        logger.info(f"  Built full-text index on {table_name} ({', '.join(columns)})")
+    
+    def has_index(self, table_name: str) -> bool:
+        """Check whether a table has a full-text index"""
+        if self.dialect == 'postgresql':
+            row = self.db.execute(
+                text("SELECT 1 FROM pg_indexes WHERE indexname = :name"),
+                {'name': fts_index_name(table_name)}
+            ).first()
+            return row is not None
+        return schema_registry.has_table(fts_table_name(table_name), self.db.bind)
+    
+    def search(
+        self,
+        table_name: str,
+        columns: List[str],
+        query: str,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: int = 20,
+        offset: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Search a table, best matches first
+        
+        Returns the table query response shape with a ``score`` on every row
+        (higher is better). ``filters`` use the JSON filter DSL on the
+        table's own columns.
+        """
+        start_time = time.time()
+        table = schema_registry.get_table(table_name, self.db.bind)
+        terms = search_terms(query)
+        
+        if not terms:
+            raise ValueError("Search query must contain at least one word")
+        
+        conditions = QueryBuilderService(self.db).build_table_conditions(table, filters)
+        
+        if self.dialect == 'postgresql':
+            ts_query = func.to_tsquery(self.TS_CONFIG, ' & '.join(f"{term}:*" for term in terms))
+            document = literal_column(self._tsvector_sql(columns))
+            score = func.ts_rank(document, ts_query)
+            source = table
+            conditions.append(document.op('@@')(ts_query))
+        else:
+            fts = sql_table(fts_table_name(table_name), sql_column('rowid'))
+            # bm25() is lower-is-better; negate it so scores sort descending
+            score = -literal_column(f"bm25({fts.name})")
+            source = table.join(fts, fts.c.rowid == table.c.id)
+            conditions.append(text(f"{fts.name} MATCH :match").bindparams(
+                match=' '.join(f'"{term}"*' for term in terms)
+            ))
+        
+        total_count = self.db.execute(
+            select(func.count()).select_from(source).where(*conditions)
+        ).scalar()
+        
+        rows = self.db.execute(
+            select(*schema_registry.public_columns(table), score.label('score'))
+            .select_from(source)
+            .where(*conditions)
+            .order_by(score.desc(), table.c.id)
+            .limit(limit)
+            .offset(offset)
+        ).all()
+        
+        data = []
+        for row in rows:
+            record = dict(row._mapping)
+            record['score'] = round(float(record['score']), 4)
+            data.append(record)
+        
+        query_time = (time.time() - start_time) * 1000
+        
+        return {
+            'dataset': table_name,
+            'query': query,
+            'total_records': total_count,
+            'returned_records': len(data),
+            'data': data,
+            'query_time_ms': round(query_time, 2),
+            'filters_applied': filters or {},
+            'limit': limit,
+            'offset': offset
+        }
@@ -0,0 +1,177 @@
+"""
+Person-household join over the composite PLFS household key
+"""
+from typing import Dict, Any, List, Optional
+from sqlalchemy import Float, Integer, Numeric, String, cast, func, literal, select, text, update
+from sqlalchemy.orm import Session
+from app.services.schema_registry import schema_registry
+from app.services.query_builder import QueryBuilderService, encode_cursor, decode_cursor
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+PERSON_TABLE = 'person_survey'
+HOUSEHOLD_TABLE = 'household_survey'
+
+# Column holding the composite household key on both tables
+HOUSEHOLD_KEY = 'household_key'
+schema_registry.add_internal_column(HOUSEHOLD_KEY)
+
+# Household attributes returned when no household fields are requested
+DEFAULT_HOUSEHOLD_FIELDS = ['Household_Size', 'Social_Group', 'Monthly_Consumer_Expenditure']
+
+
+class HouseholdJoinService:
+    """
+    Joins persons to the household they belong to
+    
+    A household is identified by panel, quarter, visit, FSU, sub-sample,
+    second-stage stratum and household number, the columns listed under
+    ``household_key`` in both survey YAMLs. Ingestion concatenates them
+    into one indexed ``household_key`` column on each table, so the join is
+    a single equality on an indexed column: each person page looks up its
+    households by index instead of joining seven columns.
+    """
+    
+    def __init__(self, db: Session):
+        self.db = db
+        self.query_builder = QueryBuilderService(db)
+    
+    def key_expression(self, table, columns: List[str]):
+        """SQL expression concatenating the key columns, numbers without decimals"""
+        parts = []
+        for name in columns:
+            column = table.c[name]
+            if isinstance(column.type, (Integer, Float, Numeric)):
+                column = cast(column, Integer)
+            parts.append(func.coalesce(cast(column, String), ''))
+        
+        expression = parts[0]
+        for part in parts[1:]:
+            expression = expression + literal('-') + part
+        return expression
+    
+    def build_household_key(self, table_name: str, columns: List[str]) -> int:
+        """
+        Add, fill and index the household key column of a table
+        
+        Also used to backfill tables ingested before the join existed.
+        Returns the number of rows keyed.
+        """
+        table = schema_registry.get_table(table_name, self.db.bind)
+        
+        missing = [name for name in columns if name not in table.c]
+        if missing:
+            raise ValueError(f"Household key column(s) not in '{table_name}': {', '.join(missing)}")
+        
+        if HOUSEHOLD_KEY not in table.c:
+            self.db.execute(text(f'ALTER TABLE {table_name} ADD COLUMN "{HOUSEHOLD_KEY}" TEXT'))
+            schema_registry.invalidate(table_name)
+            table = schema_registry.get_table(table_name, self.db.bind)
+        
+        keyed = self.db.execute(
+            update(table).values({HOUSEHOLD_KEY: self.key_expression(table, columns)})
+        ).rowcount
+        
+        self.db.execute(text(
+            f'CREATE INDEX IF NOT EXISTS idx_{table_name}_{HOUSEHOLD_KEY} ON {table_name} ("{HOUSEHOLD_KEY}")'
+        ))
+        self.db.commit()
+        schema_registry.invalidate(table_name)
+        
+        logger.info(f"  Built {HOUSEHOLD_KEY} on {keyed:,} rows of {table_name}")
+        return keyed
+    
+    def execute_join_query(
+        self,
+        person_filters: Optional[Dict[str, Any]] = None,
+        household_filters: Optional[Dict[str, Any]] = None,
+        person_fields: Optional[List[str]] = None,
+        household_fields: Optional[List[str]] = None,
+        limit: int = 100,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        include_total: str = "exact"
+    ) -> Dict[str, Any]:
+        """
+        Persons matching ``person_filters`` whose household matches ``household_filters``
+        
+        Each row holds the person fields followed by the household fields;
+        a household field whose name is also a selected person field is
+        returned as ``household_<name>``. Paging works as in
+        ``execute_table_query``: offset, or a keyset ``cursor`` on the
+        person row key. Persons whose household is not on file are left out.
+        """
+        start_time = time.time()
+        
+        if include_total not in ("exact", "none"):
+            raise ValueError("include_total must be one of: exact, none")
+        
+        persons = schema_registry.get_table(PERSON_TABLE, self.db.bind)
+        households = schema_registry.get_table(HOUSEHOLD_TABLE, self.db.bind)
+        for table in (persons, households):
+            if HOUSEHOLD_KEY not in table.c:
+                raise ValueError(f"Table '{table.name}' has no {HOUSEHOLD_KEY}; re-run its ingestion to enable joins")
+        
+        row_key = self.query_builder.get_row_key(persons)
+        if cursor is not None and row_key is None:
+            raise ValueError(f"Table '{PERSON_TABLE}' does not support cursor pagination")
+        
+        # The household key is internal, so neither projection includes it
+        person_columns = self.query_builder.resolve_projection(persons, person_fields)
+        person_names = {column.name for column in person_columns}
+        household_columns = [
+            column.label(f"household_{column.name}" if column.name in person_names else column.name)
+            for column in self.query_builder.resolve_projection(households, household_fields or DEFAULT_HOUSEHOLD_FIELDS)
+        ]
+        
+        source = persons.join(households, persons.c[HOUSEHOLD_KEY] == households.c[HOUSEHOLD_KEY])
+        conditions = (
+            self.query_builder.build_table_conditions(persons, person_filters)
+            + self.query_builder.build_table_conditions(households, household_filters)
+        )
+        
+        total_count = None
+        if include_total == "exact":
+            total_count = self.db.execute(
+                select(func.count()).select_from(source).where(*conditions)
+            ).scalar()
+        
+        if row_key is not None:
+            query = select(*person_columns, *household_columns, row_key.label('_row_key'))
+        else:
+            query = select(*person_columns, *household_columns)
+        query = query.select_from(source).where(*conditions)
+        
+        if row_key is not None:
+            if cursor is not None:
+                query = query.where(row_key > decode_cursor(cursor)[0])
+            query = query.order_by(row_key)
+        query = query.limit(limit) if cursor is not None else query.limit(limit).offset(offset)
+        
+        data = []
+        last_row_key = None
+        for row in self.db.execute(query).all():
+            row_dict = dict(row._mapping)
+            last_row_key = row_dict.pop('_row_key', None)
+            data.append(row_dict)
+        
+        next_cursor = None
+        if row_key is not None and len(data) == limit:
+            next_cursor = encode_cursor([last_row_key])
+        
+        query_time = (time.time() - start_time) * 1000
+        
+        return {
+            'dataset': f"{PERSON_TABLE}+{HOUSEHOLD_TABLE}",
+            'total_records': total_count,
+            'total_mode': include_total,
+            'returned_records': len(data),
+            'data': data,
+            'query_time_ms': round(query_time, 2),
+            'filters_applied': {'person': person_filters or {}, 'household': household_filters or {}},
+            'limit': limit,
+            'offset': offset if cursor is None else None,
+            'next_cursor': next_cursor
+        }
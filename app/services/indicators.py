@@ -0,0 +1,306 @@
+"""
+PLFS labour-force indicators (LFPR, WPR, UR) from precomputed weighted sums
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import Float, and_, case, cast, delete, func, insert, or_, select
+from sqlalchemy.orm import Session
+from app.models.dataset import LabourForceIndicator
+from app.services.schema_registry import schema_registry
+from app.services.parameter_resolver import ParameterResolver
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+# Breakdowns stored per cell; each maps to a column named in the `indicators` YAML block
+DIMENSIONS = ['state', 'district', 'sector', 'sex']
+GROUPINGS = ['quarter', *DIMENSIONS, 'age_group']
+
+INDICATORS = ['lfpr', 'wpr', 'ur']
+
+# Activity status approaches and the column prefix of their stored sums
+STATUSES = {
+    'ps_ss': 'ps',
+    'cws': 'cws'
+}
+
+
+class IndicatorService:
+    """
+    Labour Force Participation Rate, Worker Population Ratio and
+    Unemployment Rate of a person table
+    
+    After ingestion the weighted population, labour force, workers and
+    unemployed are summed per quarter, state, district, sector, sex and age
+    group, by usual status (principal + subsidiary, ps+ss) and by current
+    weekly status (CWS), into ``labour_force_indicators``. Sums re-aggregate
+    exactly, so any breakdown is a GROUP BY over those cells followed by the
+    ratios: LFPR = labour force / population, WPR = workers / population
+    and UR = unemployed / labour force, in percent.
+    
+    Refreshing compares each quarter's row count and weight total with the
+    stored cells and only recomputes quarters that are new or changed, so
+    appending a quarter aggregates just that quarter.
+    """
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def numeric(self, column):
+        """Read a column as a number; blank strings (CSV ingestion fills NaN with '') become NULL"""
+        if self.db.bind.dialect.name == 'sqlite':
+            column = func.nullif(column, '')
+        return cast(column, Float)
+    
+    @staticmethod
+    def age_bounds(age_groups: List[str]) -> List[Tuple[str, float, float]]:
+        """(label, lowest age, highest age) of each configured age group"""
+        bounds = []
+        for label in age_groups:
+            parsed = ParameterResolver.parse_range(label)
+            if isinstance(parsed, dict):
+                bounds.append((label, parsed['$gte'], parsed.get('$lte', math.inf)))
+            else:
+                bounds.append((label, parsed, parsed))
+        return bounds
+    
+    def quarter_totals(self, table, spec: Dict[str, Any]) -> Dict[Any, Tuple[int, float]]:
+        """Row count and weight total of every quarter of the person table"""
+        quarter = table.c[spec['quarter']]
+        weight = func.coalesce(self.numeric(table.c[spec['weight']]), 0)
+        rows = self.db.execute(
+            select(quarter, func.count(), func.sum(weight)).group_by(quarter)
+        ).all()
+        return {row[0]: (row[1], float(row[2] or 0)) for row in rows}
+    
+    def stored_totals(self, table_name: str) -> Dict[Any, Tuple[int, float]]:
+        """Row count and weight total of every quarter already summed"""
+        cells = LabourForceIndicator.__table__
+        rows = self.db.execute(
+            select(cells.c.quarter, func.sum(cells.c.sample_rows), func.sum(cells.c.population))
+            .where(cells.c.table_name == table_name)
+            .group_by(cells.c.quarter)
+        ).all()
+        return {row[0]: (int(row[1]), float(row[2])) for row in rows}
+    
+    def summarize(self, table, spec: Dict[str, Any], quarters: List[Any]) -> List[Dict[str, Any]]:
+        """Weighted labour-force sums per cell of the given quarters"""
+        weight = func.coalesce(self.numeric(table.c[spec['weight']]), 0)
+        principal = self.numeric(table.c[spec['principal_status']])
+        subsidiary = self.numeric(table.c[spec['subsidiary_status']])
+        weekly = self.numeric(table.c[spec['cws_status']])
+        age = self.numeric(table.c[spec['age']])
+        
+        # Codes 11-51 (usual) and 11-72 (weekly) are work, 81 and 81-82 seeking work.
+        # ps+ss: a worker in the principal or a subsidiary capacity; unemployed
+        # when seeking work in the principal status without subsidiary work
+        subsidiary_work = subsidiary.between(11, 51)
+        ps_workers = or_(principal.between(11, 51), subsidiary_work)
+        ps_unemployed = and_(principal == 81, or_(subsidiary.is_(None), ~subsidiary_work))
+        cws_workers = weekly.between(11, 72)
+        cws_unemployed = weekly.between(81, 82)
+        
+        def weighted(condition):
+            return func.sum(case((condition, weight), else_=0))
+        
+        age_group = case(
+            *[
+                (age >= low if math.isinf(high) else age.between(low, high), label)
+                for label, low, high in self.age_bounds(spec['age_groups'])
+            ],
+            else_=None
+        )
+        
+        groups = [
+            table.c[spec['quarter']].label('quarter'),
+            *[table.c[spec['dimensions'][name]].label(name) for name in DIMENSIONS],
+            age_group.label('age_group')
+        ]
+        query = (
+            select(
+                *groups,
+                func.count().label('sample_rows'),
+                func.sum(weight).label('population'),
+                weighted(or_(ps_workers, ps_unemployed)).label('ps_labour_force'),
+                weighted(ps_workers).label('ps_workers'),
+                weighted(ps_unemployed).label('ps_unemployed'),
+                weighted(or_(cws_workers, cws_unemployed)).label('cws_labour_force'),
+                weighted(cws_workers).label('cws_workers'),
+                weighted(cws_unemployed).label('cws_unemployed')
+            )
+            .where(table.c[spec['quarter']].in_(quarters))
+            .group_by(*groups)
+        )
+        
+        cells = []
+        for row in self.db.execute(query).all():
+            cell = dict(row._mapping)
+            for name in DIMENSIONS:
+                value = cell[name]
+                cell[name] = None if value is None or value == '' else int(float(value))
+            cells.append(cell)
+        return cells
+    
+    def refresh(self, table_name: str, spec: Dict[str, Any]) -> Dict[str, List[Any]]:
+        """
+        Bring the stored sums of a table up to date with its rows
+        
+        Returns the quarters ``computed`` (new or changed), ``unchanged``
+        and ``removed`` (no longer in the table).
+        """
+        LabourForceIndicator.__table__.create(bind=self.db.get_bind(), checkfirst=True)
+        schema_registry.invalidate(LabourForceIndicator.__tablename__)
+        
+        table = schema_registry.get_table(table_name, self.db.bind)
+        columns = [spec['quarter'], spec['weight'], spec['age'], spec['principal_status'],
+                   spec['subsidiary_status'], spec['cws_status'], *spec['dimensions'].values()]
+        missing = [name for name in columns if name not in table.c]
+        if missing:
+            raise ValueError(f"Indicator column(s) not in '{table_name}': {', '.join(missing)}")
+        
+        current = self.quarter_totals(table, spec)
+        stored = self.stored_totals(table_name)
+        
+        changed = [
+            quarter for quarter, (rows, total) in current.items()
+            if quarter not in stored
+            or stored[quarter][0] != rows
+            or not math.isclose(stored[quarter][1], total, rel_tol=1e-9, abs_tol=1e-6)
+        ]
+        removed = [quarter for quarter in stored if quarter not in current]
+        
+        cells = LabourForceIndicator.__table__
+        stale = changed + removed
+        if stale:
+            self.db.execute(
+                delete(cells).where(cells.c.table_name == table_name, cells.c.quarter.in_(stale))
+            )
+        if changed:
+            rows = self.summarize(table, spec, changed)
+            self.db.execute(insert(cells), [{'table_name': table_name, **row} for row in rows])
+            logger.info(f"  Summed {len(rows):,} indicator cells for quarter(s) {', '.join(map(str, changed))}")
+        self.db.commit()
+        
+        return {
+            'computed': changed,
+            'unchanged': [quarter for quarter in current if quarter not in changed],
+            'removed': removed
+        }
+    
+    @staticmethod
+    def match_age_groups(age_groups: List[str], requested: str) -> List[str]:
+        """Configured age groups making up a requested label or range such as 15+"""
+        if requested in age_groups:
+            return [requested]
+        
+        bounds = IndicatorService.age_bounds(age_groups)
+        parsed = ParameterResolver.parse_range(requested)
+        if isinstance(parsed, dict):
+            low, high = parsed['$gte'], parsed.get('$lte', math.inf)
+        else:
+            low = high = parsed
+        
+        selected = [(label, lo, hi) for label, lo, hi in bounds if lo >= low and hi <= high]
+        if not selected or min(lo for _, lo, _ in selected) != low or max(hi for _, _, hi in selected) != high:
+            raise ValueError(
+                f"Age group '{requested}' does not line up with the stored groups: {', '.join(age_groups)}"
+            )
+        return [label for label, _, _ in selected]
+    
+    def query(
+        self,
+        table_name: str,
+        spec: Dict[str, Any],
+        status: str = 'ps_ss',
+        indicators: Optional[List[str]] = None,
+        by: Optional[List[str]] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        age_group: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Indicators broken down by ``by`` (any of quarter, state, district,
+        sector, sex, age_group) for the cells matching ``filters``
+        
+        ``filters`` maps groupings to a value or a list of values;
+        ``age_group`` may be a stored group or a range spanning whole groups
+        (e.g. ``15+`` for the headline rates). Each row reports the rates in
+        percent with the weighted population, labour force, workers and
+        unemployed, and ``sample_rows``; rates with a zero denominator are
+        ``None``.
+        """
+        start_time = time.time()
+        
+        if status not in STATUSES:
+            raise ValueError(f"status must be one of: {', '.join(STATUSES)}")
+        indicators = indicators or INDICATORS
+        unknown = [name for name in indicators if name not in INDICATORS]
+        if unknown:
+            raise ValueError(f"Unknown indicator(s): {', '.join(unknown)}; use {', '.join(INDICATORS)}")
+        by = by or []
+        unknown = [name for name in by + list(filters or {}) if name not in GROUPINGS]
+        if unknown:
+            raise ValueError(f"Unknown breakdown(s): {', '.join(unknown)}; use {', '.join(GROUPINGS)}")
+        
+        if not schema_registry.has_table(LabourForceIndicator.__tablename__, self.db.bind):
+            raise LookupError("Indicators have not been computed yet; re-run the person survey ingestion")
+        cells = LabourForceIndicator.__table__
+        prefix = STATUSES[status]
+        
+        conditions = [cells.c.table_name == table_name]
+        for name, value in (filters or {}).items():
+            values = value if isinstance(value, list) else [value]
+            conditions.append(cells.c[name].in_(values))
+        if age_group:
+            conditions.append(cells.c.age_group.in_(self.match_age_groups(spec['age_groups'], age_group)))
+        
+        groups = [cells.c[name] for name in by]
+        query = (
+            select(
+                *groups,
+                func.sum(cells.c.sample_rows).label('sample_rows'),
+                func.sum(cells.c.population).label('population'),
+                func.sum(cells.c[f'{prefix}_labour_force']).label('labour_force'),
+                func.sum(cells.c[f'{prefix}_workers']).label('workers'),
+                func.sum(cells.c[f'{prefix}_unemployed']).label('unemployed')
+            )
+            .where(*conditions)
+            .group_by(*groups)
+            .order_by(*groups)
+        )
+        
+        def percent(numerator: float, denominator: float) -> Optional[float]:
+            return 100 * numerator / denominator if denominator else None
+        
+        data = []
+        for row in self.db.execute(query).all():
+            values = dict(row._mapping)
+            if values['sample_rows'] is None:
+                continue  # No matching cells
+            rates = {
+                'lfpr': percent(values['labour_force'], values['population']),
+                'wpr': percent(values['workers'], values['population']),
+                'ur': percent(values['unemployed'], values['labour_force'])
+            }
+            data.append({
+                **{name: values[name] for name in by},
+                **{name: rates[name] for name in indicators},
+                'population': values['population'],
+                'labour_force': values['labour_force'],
+                'workers': values['workers'],
+                'unemployed': values['unemployed'],
+                'sample_rows': values['sample_rows']
+            })
+        
+        query_time = (time.time() - start_time) * 1000
+        
+        return {
+            'dataset': table_name,
+            'status': status,
+            'indicators': indicators,
+            'by': by,
+            'filters_applied': filters or {},
+            'age_group': age_group,
+            'data': data,
+            'query_time_ms': round(query_time, 2)
+        }
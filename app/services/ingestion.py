@@ -7,6 +7,8 @@ from typing import Dict, Any, List
 from sqlalchemy.orm import Session
 from app.models import Dataset, DataRecord, CensusData
 from app.database import SessionLocal
+from app.services.dataset_version import dataset_versions
+from app.services.query_builder import QueryBuilderService
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -68,6 +70,11 @@ class DataIngestionService:
             
             logger.info(f"Ingested batch {i // batch_size + 1}: {len(batch)} records")
         
+        dataset = self.db.query(Dataset).filter(Dataset.id == dataset_id).first()
+        if dataset:
+            QueryBuilderService(self.db).create_json_indexes(dataset)
+            dataset_versions.bump(self.db, dataset.table_name)
+        
         logger.info(f"Successfully ingested {total_rows} records")
     
     def ingest_census_data(self, file_path: str, batch_size: int = 1000):
@@ -95,6 +102,8 @@ class DataIngestionService:
             
             logger.info(f"Ingested census batch {i // batch_size + 1}: {len(batch)} records")
         
+        dataset_versions.bump(self.db, CensusData.__tablename__)
+        
         logger.info(f"Successfully ingested {total_rows} census records")
     
     def ingest_from_config(self, config_path: str, data_path: str):
@@ -0,0 +1,240 @@
+"""
+Friendly query parameters resolved to dataset columns and codes
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from pathlib import Path
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.config import PROJECT_ROOT
+from app.services.schema_registry import schema_registry
+from app.services.dataset_version import dataset_versions
+import threading
+import logging
+import re
+import yaml
+
+logger = logging.getLogger(__name__)
+
+# Reference table behind the `state` and `district` lookups
+DISTRICT_CODES_TABLE = 'plfs_district_codes'
+
+# Parameters of /query, passed through unchanged for datasets without a `parameters` block
+DEFAULT_PARAMETERS = ['state', 'district', 'gender', 'age_group', 'year']
+
+LOOKUPS = ('state', 'district')
+
+
+def normalize_name(name: str) -> str:
+    """Upper-case a place name, spell out '&' and collapse whitespace"""
+    return ' '.join(name.upper().replace('&', ' AND ').split())
+
+
+class PlaceLookup:
+    """State and district name maps of one version of the district codes table"""
+    
+    def __init__(self, rows: List[Tuple[Any, Any, Any, Any]]):
+        self.states: Dict[str, int] = {}
+        self.districts: Dict[Tuple[int, str], int] = {}
+        # District name -> every (state code, district code) carrying it
+        self.district_names: Dict[str, List[Tuple[int, int]]] = {}
+        
+        for state_code, state_name, district_code, district_name in rows:
+            if state_code is None or district_code is None:
+                continue
+            state_code, district_code = int(state_code), int(district_code)
+            if state_name:
+                self.states[normalize_name(state_name)] = state_code
+            if district_name:
+                name = normalize_name(district_name)
+                self.districts[(state_code, name)] = district_code
+                self.district_names.setdefault(name, []).append((state_code, district_code))
+
+
+class ParameterResolver:
+    """
+    Maps /query parameters (state, district, gender, age_group, year) to filters
+    
+    Each dataset YAML may declare a ``parameters`` block naming the column
+    behind every friendly parameter and how its values translate:
+    
+    - ``codes``: labels to codes, e.g. ``FEMALE``/``F`` to 2
+    - ``lookup: state|district``: names not listed in ``codes`` resolved
+      through the PLFS district codes table; a district name also sets the
+      state parameter, and needs it when the name occurs in several states
+    - ``range: true``: ``a-b``, ``a+`` or a single number
+    
+    The blocks are compiled once at startup into a table per dataset.
+    Place names are held in hash maps built from the district codes table
+    on first use and rebuilt when its data version changes, so any state or
+    district name resolves in constant time. Numeric values are always
+    taken as codes. Unresolvable values raise ``ValueError``.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        # table -> {parameter: spec}
+        self._parameters: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._places: Optional[Tuple[int, PlaceLookup]] = None
+    
+    def compile(self, config_dir: Optional[Path] = None) -> int:
+        """Compile the ``parameters`` blocks of the dataset YAMLs; returns the datasets compiled"""
+        config_dir = config_dir or PROJECT_ROOT / 'config' / 'datasets'
+        
+        compiled = {}
+        for path in sorted(config_dir.glob('*.yaml')):
+            with open(path, 'r') as f:
+                config = yaml.safe_load(f) or {}
+            
+            # Survey YAMLs hold one `dataset`, reference_tables.yaml a list
+            entries = [config['dataset']] if config.get('dataset') else config.get('reference_tables') or []
+            for dataset_info in entries:
+                if dataset_info.get('parameters'):
+                    compiled[dataset_info['table_name']] = self.compile_parameters(path.name, dataset_info['parameters'])
+        
+        with self._lock:
+            self._parameters = compiled
+        
+        logger.info(f"Compiled query parameters for {len(compiled)} dataset(s)")
+        return len(compiled)
+    
+    @staticmethod
+    def compile_parameters(source: str, specs: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Validate one ``parameters`` block and normalize its code labels"""
+        parameters = {}
+        for name, spec in specs.items():
+            if spec.get('lookup') is not None and spec['lookup'] not in LOOKUPS:
+                raise ValueError(f"{source}: unknown lookup '{spec['lookup']}' for parameter '{name}'")
+            parameters[name] = {
+                'column': spec['column'],
+                'lookup': spec.get('lookup'),
+                'codes': {normalize_name(str(label)): code for label, code in (spec.get('codes') or {}).items()},
+                'range': bool(spec.get('range'))
+            }
+        return parameters
+    
+    def parameters(self, table_name: str) -> Dict[str, Dict[str, Any]]:
+        """Compiled parameter table of a dataset (pass-through when it declares none)"""
+        compiled = self._parameters.get(table_name)
+        if compiled is not None:
+            return compiled
+        return {
+            name: {'column': name, 'lookup': None, 'codes': {}, 'range': False}
+            for name in DEFAULT_PARAMETERS
+        }
+    
+    def places(self, db: Session) -> PlaceLookup:
+        """State and district name maps for the current district codes version"""
+        version = dataset_versions.get(db, DISTRICT_CODES_TABLE)
+        cached = self._places
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        
+        rows = []
+        if schema_registry.has_table(DISTRICT_CODES_TABLE, db.bind):
+            table = schema_registry.get_table(DISTRICT_CODES_TABLE, db.bind)
+            rows = db.execute(select(
+                table.c.STATE_CODE, table.c.STATE_NAME, table.c.DISTRICT_CODE, table.c.DISTRICT_NAME
+            )).all()
+        
+        places = PlaceLookup(rows)
+        with self._lock:
+            self._places = (version, places)
+        return places
+    
+    @staticmethod
+    def parse_range(value: str) -> Any:
+        """``15-29`` -> {$gte, $lte}, ``60+`` -> {$gte}, ``40`` -> 40"""
+        text = value.strip()
+        match = re.fullmatch(r'(\d+)\s*-\s*(\d+)', text)
+        if match:
+            return {'$gte': int(match.group(1)), '$lte': int(match.group(2))}
+        match = re.fullmatch(r'(\d+)\s*\+', text)
+        if match:
+            return {'$gte': int(match.group(1))}
+        if text.isdigit():
+            return int(text)
+        raise ValueError(f"Invalid range '{value}'; use e.g. 15-29, 60+ or 40")
+    
+    def resolve(self, db: Session, table_name: str, values: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Translate the given parameters into a filter dict for ``table_name``
+        
+        ``values`` maps parameter names to the raw request values; parameters
+        left out or ``None`` are skipped, and so are parameters the dataset
+        does not declare (e.g. ``gender`` on the household survey), as
+        /query has always done.
+        """
+        parameters = self.parameters(table_name)
+        given = {
+            name: value for name, value in values.items()
+            if value is not None and value != '' and name in parameters
+        }
+        
+        state_param = next((name for name, spec in parameters.items() if spec['lookup'] == 'state'), None)
+        
+        filters: Dict[str, Any] = {}
+        state_code = None
+        for name, value in given.items():
+            spec = parameters[name]
+            text = str(value).strip()
+            
+            if spec['range']:
+                filters[spec['column']] = self.parse_range(text)
+            elif text.isdigit() and (spec['codes'] or spec['lookup']):
+                filters[spec['column']] = int(text)
+            elif normalize_name(text) in spec['codes']:
+                filters[spec['column']] = spec['codes'][normalize_name(text)]
+            elif spec['lookup'] == 'state':
+                code = self.places(db).states.get(normalize_name(text))
+                if code is None:
+                    raise ValueError(f"Unknown state '{text}'")
+                filters[spec['column']] = code
+            elif spec['lookup'] == 'district':
+                continue  # Resolved below, once the state is known
+            elif spec['codes']:
+                raise ValueError(f"Invalid {name} '{text}'; use one of: {', '.join(spec['codes'])}")
+            else:
+                filters[spec['column']] = value
+            
+            if name == state_param:
+                state_code = filters[spec['column']]
+        
+        for name, value in given.items():
+            spec = parameters[name]
+            text = str(value).strip()
+            if spec['lookup'] != 'district' or spec['column'] in filters:
+                continue
+            
+            places = self.places(db)
+            district_name = normalize_name(text)
+            if state_code is not None:
+                code = places.districts.get((state_code, district_name))
+                if code is None:
+                    raise ValueError(f"Unknown district '{text}' in state {state_code}")
+                filters[spec['column']] = code
+                continue
+            
+            matches = places.district_names.get(district_name, [])
+            if not matches:
+                raise ValueError(f"Unknown district '{text}'")
+            if len(matches) > 1:
+                states = ', '.join(str(state) for state, _ in matches)
+                raise ValueError(f"District '{text}' exists in several states ({states}); add the state parameter")
+            
+            # District codes are only unique within a state
+            state_code, filters[spec['column']] = matches[0]
+            if state_param is not None:
+                filters[parameters[state_param]['column']] = state_code
+        
+        return filters
+    
+    def invalidate(self, table_name: Optional[str] = None) -> None:
+        """Drop the place maps when the district codes table changes"""
+        if table_name is None or table_name == DISTRICT_CODES_TABLE:
+            with self._lock:
+                self._places = None
+
+
+# Shared resolver instance; compiled at application startup
+parameter_resolver = ParameterResolver()
+schema_registry.add_invalidation_listener(parameter_resolver.invalidate)
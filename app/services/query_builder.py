@@ -1,16 +1,67 @@
 """
 Query builder service for dynamic database queries
 """
-from typing import Dict, Any, List, Optional
-from sqlalchemy import and_, or_, desc, asc
+from typing import Dict, Any, Iterator, List, Optional
+from sqlalchemy import Float, String, and_, or_, desc, asc, case, cast, func, literal_column, select, text, union_all
 from sqlalchemy.orm import Session
 from app.models import CensusData, DataRecord, Dataset
+from app.services.schema_registry import schema_registry
+from app.services.count_cache import count_cache
+from app.services.columnar_engine import columnar_engine
+from app.services.bitmap_index import bitmap_indexes
+import numpy as np
+import base64
+import re
+import json
 import time
 
 
+def normalize_filters(filters: Optional[Dict[str, Any]]) -> str:
+    """Canonical string form of a filter dict, used as a cache key"""
+    def normalize(value):
+        if isinstance(value, dict):
+            return {k: normalize(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple, set)):
+            return sorted((normalize(v) for v in value), key=repr)
+        return value
+    
+    return json.dumps(normalize(filters or {}), sort_keys=True, default=str)
+
+
+def encode_cursor(key_values: List[Any]) -> str:
+    """Encode the sort key of the last returned row as an opaque cursor"""
+    payload = json.dumps({'k': key_values}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """Decode an opaque cursor back into sort key values"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        key_values = payload['k']
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    
+    if not isinstance(key_values, list) or not key_values:
+        raise ValueError("Invalid cursor")
+    
+    return key_values
+
+
 class QueryBuilderService:
     """Service for building and executing dynamic queries"""
     
+    # Sampled count estimation: number and size of row key windows
+    SAMPLE_WINDOWS = 20
+    SAMPLE_WINDOW_SIZE = 500
+    
+    # Census columns returned when no fields are requested
+    CENSUS_FIELDS = [
+        'id', 'state', 'district', 'gender', 'age_group',
+        'population', 'literacy_rate', 'employment_rate', 'year'
+    ]
+    
     def __init__(self, db: Session):
         self.db = db
     
@@ -25,8 +76,8 @@ class QueryBuilderService:
     ):
         """Build query for census data with filters"""
         
-        # Start with base query
-        query = self.db.query(CensusData)
+        # Start with base query, selecting only the requested columns
+        query = self.db.query(*self.resolve_projection(CensusData.__table__, fields or self.CENSUS_FIELDS))
         
         # Apply filters
         if filters:
@@ -90,25 +141,7 @@ class QueryBuilderService:
         results = query.all()
         
         # Convert to dictionaries
-        data = []
-        for record in results:
-            record_dict = {
-                'id': record.id,
-                'state': record.state,
-                'district': record.district,
-                'gender': record.gender,
-                'age_group': record.age_group,
-                'population': record.population,
-                'literacy_rate': record.literacy_rate,
-                'employment_rate': record.employment_rate,
-                'year': record.year
-            }
-            
-            # Filter fields if specified
-            if fields:
-                record_dict = {k: v for k, v in record_dict.items() if k in fields}
-            
-            data.append(record_dict)
+        data = [dict(row._mapping) for row in results]
         
         query_time = (time.time() - start_time) * 1000  # Convert to milliseconds
         
@@ -137,26 +170,26 @@ class QueryBuilderService:
         if not dataset:
             raise ValueError(f"Dataset '{dataset_name}' not found")
         
-        # Build query
-        query = self.db.query(DataRecord).filter(DataRecord.dataset_id == dataset.id)
+        # Build query, filtering on the JSON keys in the database
+        query = self.db.query(DataRecord).filter(
+            DataRecord.dataset_id == dataset.id,
+            *self.build_json_conditions(filters)
+        )
         
-        # Note: Filtering JSON data in PostgreSQL requires different approach
-        # This is a simplified version
         total_count = query.count()
         
         # Apply pagination
-        query = query.limit(limit).offset(offset)
-        results = query.all()
+        query = query.order_by(DataRecord.id).limit(limit).offset(offset)
         
-        # Extract data
-        data = [record.data for record in results]
-        
-        # Apply field filtering if specified
         if fields:
+            # Extract only the requested keys from the JSON in the database
+            projected = query.with_entities(*[DataRecord.data[field].label(field) for field in fields])
             data = [
-                {k: v for k, v in record.items() if k in fields}
-                for record in data
+                {k: v for k, v in row._mapping.items() if v is not None}
+                for row in projected.all()
             ]
+        else:
+            data = [record.data for record in query.all()]
         
         query_time = (time.time() - start_time) * 1000
         
@@ -168,84 +201,416 @@ class QueryBuilderService:
             'query_time_ms': round(query_time, 2)
         }
     
+    def resolve_projection(self, table, fields: Optional[List[str]] = None) -> List[Any]:
+        """
+        Get the columns to SELECT for a ``fields`` list, in table order
+        
+        Raises ``ValueError`` naming any field that is not a column of the
+        table, so a typo is reported instead of silently dropped. Internal
+        columns (see ``SchemaRegistry.add_internal_column``) are never
+        selected and count as unknown.
+        """
+        if not fields:
+            return schema_registry.public_columns(table)
+        
+        unknown = [
+            field for field in fields
+            if field not in table.c or schema_registry.is_internal_column(field)
+        ]
+        if unknown:
+            raise ValueError(f"Unknown field(s) for '{table.name}': {', '.join(unknown)}")
+        
+        wanted = set(fields)
+        return [column for column in table.c if column.name in wanted]
+    
+    def get_row_key(self, table):
+        """
+        Get the column that orders rows for keyset pagination
+        
+        Ingested tables have an ``id`` primary key. Tables loaded with
+        ``DataFrame.to_sql`` have none, so fall back to SQLite's ``rowid``.
+        """
+        if 'id' in table.c:
+            return table.c.id
+        if self.db.bind.dialect.name == 'sqlite':
+            return literal_column(f'{table.name}.rowid')
+        return None
+    
+    @staticmethod
+    def build_filter_conditions(column, value: Any) -> List[Any]:
+        """Compile one field's value from the JSON filter DSL into conditions on a column"""
+        conditions = []
+        
+        # Handle different filter types
+        if isinstance(value, dict):
+            # Operator-based filters
+            if '$gte' in value:
+                conditions.append(column >= value['$gte'])
+            if '$lte' in value:
+                conditions.append(column <= value['$lte'])
+            if '$gt' in value:
+                conditions.append(column > value['$gt'])
+            if '$lt' in value:
+                conditions.append(column < value['$lt'])
+            if '$in' in value:
+                conditions.append(column.in_(value['$in']))
+            if '$ne' in value:
+                conditions.append(column != value['$ne'])
+            if '$contains' in value:
+                # Case-insensitive substring match
+                conditions.append(func.lower(column).contains(str(value['$contains']).lower(), autoescape=True))
+        elif isinstance(value, list):
+            # IN clause
+            conditions.append(column.in_(value))
+        else:
+            # Exact match
+            conditions.append(column == value)
+        
+        return conditions
+    
+    def build_table_conditions(self, table, filters: Optional[Dict[str, Any]] = None) -> List[Any]:
+        """Compile the JSON filter DSL into SQL conditions on a table"""
+        conditions = []
+        
+        if not filters:
+            return conditions
+        
+        for field, value in filters.items():
+            if field not in table.c:
+                continue
+            
+            conditions.extend(self.build_filter_conditions(table.c[field], value))
+        
+        return conditions
+    
+    def json_field(self, key: str, numeric: bool = False):
+        """
+        SQL expression for a top-level key of ``DataRecord.data``
+        
+        Renders as ``json_extract(data, '$."key"')`` on SQLite and
+        ``data ->> 'key'`` on PostgreSQL with the key inlined, so it matches
+        the expression indexes built by ``create_json_indexes``.
+        """
+        quoted = key.replace("'", "''")
+        
+        if self.db.bind.dialect.name == 'postgresql':
+            expression = DataRecord.data.op('->>', return_type=String)(literal_column(f"'{quoted}'"))
+            return cast(expression, Float) if numeric else expression
+        
+        # json_extract returns native JSON numbers, so no cast is needed
+        path = quoted.replace('"', '\\"')
+        return func.json_extract(DataRecord.data, literal_column(f"'$.\"{path}\"'"))
+    
+    def build_json_conditions(self, filters: Optional[Dict[str, Any]] = None) -> List[Any]:
+        """
+        Compile the JSON filter DSL into conditions on data_records JSON keys
+        
+        Numeric filter values compare as numbers and everything else as text,
+        like comparing the stored JSON values in Python.
+        """
+        conditions = []
+        
+        for key, value in (filters or {}).items():
+            sample = value
+            if isinstance(sample, dict):
+                sample = next(iter(sample.values()), None)
+            if isinstance(sample, list):
+                sample = sample[0] if sample else None
+            
+            numeric = isinstance(sample, (int, float)) and not isinstance(sample, bool)
+            conditions.extend(self.build_filter_conditions(self.json_field(key, numeric), value))
+        
+        return conditions
+    
+    def create_json_indexes(self, dataset: Dataset) -> List[str]:
+        """
+        Create expression indexes on the hot JSON keys of a data_records dataset
+        
+        Keys are listed in ``json_indexes`` of the dataset config. Each index
+        is partial on the dataset's rows, so it only covers that dataset.
+        """
+        keys = (dataset.config or {}).get('json_indexes', [])
+        created = []
+        
+        for key in keys:
+            slug = re.sub(r'\W+', '_', key).strip('_').lower()
+            index_name = f"idx_data_records_{dataset.id}_{slug}"
+            quoted = key.replace("'", "''")
+            
+            if self.db.bind.dialect.name == 'postgresql':
+                expression = f"(data ->> '{quoted}')"
+            else:
+                path = quoted.replace('"', '\\"')
+                expression = f"json_extract(data, '$.\"{path}\"')"
+            
+            self.db.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {index_name} ON data_records ({expression}) "
+                f"WHERE dataset_id = {int(dataset.id)}"
+            ))
+            created.append(index_name)
+        
+        self.db.commit()
+        return created
+    
+    def get_key_range(self, table, row_key):
+        """Lowest and highest row key, as two index seeks"""
+        # SQLite only uses the min/max optimization for a lone aggregate
+        low = self.db.query(func.min(row_key)).select_from(table).scalar()
+        high = self.db.query(func.max(row_key)).select_from(table).scalar()
+        return low, high
+    
+    def estimate_table_rows(self, table, row_key) -> int:
+        """Cheap row count estimate from catalog statistics or the key range"""
+        dialect = self.db.bind.dialect.name
+        
+        if dialect == 'postgresql':
+            reltuples = self.db.execute(
+                text("SELECT reltuples FROM pg_class WHERE relname = :name"),
+                {'name': table.name}
+            ).scalar()
+            if reltuples is not None and reltuples >= 0:
+                return int(reltuples)
+        
+        if row_key is not None:
+            low, high = self.get_key_range(table, row_key)
+            if low is None:
+                return 0
+            return int(high) - int(low) + 1
+        
+        return self.db.query(func.count()).select_from(table).scalar()
+    
+    def estimate_filtered_rows(self, table, row_key, conditions: List[Any]) -> int:
+        """
+        Estimate a filtered count from evenly spaced windows of the row key
+        
+        Rows are clustered by FSU in insertion order, so instead of sampling
+        the head of the table, ``SAMPLE_WINDOWS`` key ranges spread across
+        the whole table are counted and the match ratio is scaled up.
+        """
+        total_rows = self.estimate_table_rows(table, row_key)
+        
+        if not conditions or total_rows == 0:
+            return total_rows
+        
+        window_rows = self.SAMPLE_WINDOWS * self.SAMPLE_WINDOW_SIZE
+        if row_key is None or total_rows <= window_rows:
+            return self.db.query(func.count()).select_from(table).filter(*conditions).scalar()
+        
+        low, high = self.get_key_range(table, row_key)
+        step = (int(high) - int(low) + 1) // self.SAMPLE_WINDOWS
+        
+        # One range seek per window; each reports rows sampled and rows matched
+        matched_expr = func.sum(case((and_(*conditions), 1), else_=0))
+        windows = union_all(*[
+            select(func.count().label('sampled'), matched_expr.label('matched'))
+            .select_from(table)
+            .where(row_key.between(low + i * step, low + i * step + self.SAMPLE_WINDOW_SIZE - 1))
+            for i in range(self.SAMPLE_WINDOWS)
+        ]).subquery()
+        
+        sampled, matched = self.db.query(
+            func.sum(windows.c.sampled), func.sum(windows.c.matched)
+        ).one()
+        if not sampled:
+            return 0
+        
+        return int(round(total_rows * (matched or 0) / sampled))
+    
+    def count_table_rows(
+        self,
+        table,
+        row_key,
+        conditions: List[Any],
+        filters: Optional[Dict[str, Any]],
+        include_total: str = "exact",
+        bitset: Optional[int] = None
+    ) -> Optional[int]:
+        """
+        Get the total for a filtered table query in the requested mode
+        
+        When the filters were answered by bitmap indexes, ``bitset`` holds the
+        matching rows and the total is an exact popcount in either mode.
+        """
+        if include_total == "none":
+            return None
+        if include_total not in ("exact", "estimated"):
+            raise ValueError("include_total must be one of: exact, estimated, none")
+        
+        filter_key = normalize_filters(filters)
+        cached = count_cache.get(table.name, include_total, filter_key)
+        if cached is not None:
+            return cached
+        
+        if bitset is not None:
+            return bitmap_indexes.count(bitset)
+        
+        if include_total == "exact":
+            total = self.db.query(func.count()).select_from(table).filter(*conditions).scalar()
+        else:
+            total = self.estimate_filtered_rows(table, row_key, conditions)
+        
+        count_cache.set(table.name, include_total, filter_key, total)
+        return total
+    
+    def build_page_query(
+        self,
+        table,
+        columns: List[Any],
+        row_key,
+        conditions: List[Any],
+        bitset: Optional[int],
+        limit: int,
+        offset: int,
+        cursor: Optional[str]
+    ):
+        """Build the SELECT for one page of a table query over the projected columns"""
+        # Carry the row key along for cursor generation
+        if row_key is not None:
+            query = select(*columns, row_key.label('_row_key')).select_from(table)
+        else:
+            query = select(*columns).select_from(table)
+        
+        if bitset is not None:
+            # Slice the page out of the bitmap and fetch just those rows by key
+            keys = bitmap_indexes.row_keys(bitset)
+            if cursor is not None:
+                start = int(np.searchsorted(keys, decode_cursor(cursor)[0], side='right'))
+                page_keys = keys[start:start + limit]
+            else:
+                page_keys = keys[offset:offset + limit]
+            return query.where(row_key.in_(page_keys.tolist())).order_by(row_key)
+        
+        query = query.where(*conditions)
+        
+        # Apply pagination - keyset when a cursor is given, offset otherwise
+        if row_key is not None:
+            if cursor is not None:
+                last_key = decode_cursor(cursor)[0]
+                query = query.where(row_key > last_key)
+            query = query.order_by(row_key)
+        
+        if cursor is not None:
+            return query.limit(limit)
+        return query.limit(limit).offset(offset)
+    
+    def stream_table_query(
+        self,
+        table_name: str,
+        filters: Optional[Dict[str, Any]] = None,
+        fields: Optional[List[str]] = None,
+        limit: int = 100,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        batch_size: int = 1000
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Stream a table query as batches of row dicts
+        
+        Same filters and paging as ``execute_table_query``, but rows are read
+        through a server-side cursor ``batch_size`` at a time, so memory stays
+        bounded by one batch. No total is computed.
+        """
+        table = schema_registry.get_table(table_name, self.db.bind)
+        row_key = self.get_row_key(table)
+        
+        if cursor is not None and row_key is None:
+            raise ValueError(f"Table '{table_name}' does not support cursor pagination")
+        
+        columns = self.resolve_projection(table, fields)
+        conditions = self.build_table_conditions(table, filters)
+        bitset = bitmap_indexes.match(self.db, table_name, filters) if row_key is not None else None
+        
+        query = self.build_page_query(table, columns, row_key, conditions, bitset, limit, offset, cursor)
+        result = self.db.execute(query.execution_options(stream_results=True, yield_per=batch_size))
+        
+        for partition in result.partitions():
+            batch = []
+            for row in partition:
+                row_dict = dict(row._mapping)
+                row_dict.pop('_row_key', None)
+                batch.append(row_dict)
+            yield batch
+    
     def execute_table_query(
         self,
         table_name: str,
         filters: Optional[Dict[str, Any]] = None,
         fields: Optional[List[str]] = None,
         limit: int = 100,
-        offset: int = 0
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        include_total: str = "exact"
     ) -> Dict[str, Any]:
-        """Execute query on any table with dynamic filters"""
+        """
+        Execute query on any table with dynamic filters
         
-        from sqlalchemy import text, MetaData, Table
+        Pages with LIMIT/OFFSET by default. When ``cursor`` is given (a
+        ``next_cursor`` value from a previous page), pages with a keyset
+        predicate on the row key instead, so deep pages cost the same as the
+        first one.
+        
+        ``include_total`` controls the total count: ``exact`` (cached per
+        filter), ``estimated`` (statistics or a sampled count) or ``none``.
+        
+        Datasets configured with ``query_engine: columnar`` are answered by
+        the in-memory columnar engine instead.
+        """
+        
+        if columnar_engine.is_enabled(self.db, table_name):
+            return columnar_engine.execute_table_query(
+                self.db, table_name, filters, fields, limit, offset, cursor, include_total
+            )
         
         start_time = time.time()
         
-        # Reflect the table
-        metadata = MetaData()
-        table = Table(table_name, metadata, autoload_with=self.db.bind)
+        # Resolve the table through the shared schema registry
+        table = schema_registry.get_table(table_name, self.db.bind)
+        row_key = self.get_row_key(table)
         
-        # Build base query
-        query = self.db.query(table)
+        if cursor is not None and row_key is None:
+            raise ValueError(f"Table '{table_name}' does not support cursor pagination")
+        
+        # Select only the requested columns
+        columns = self.resolve_projection(table, fields)
         
         # Apply filters
-        if filters:
-            for field, value in filters.items():
-                if field in table.c:
-                    column = table.c[field]
-                    
-                    # Handle different filter types
-                    if isinstance(value, dict):
-                        # Operator-based filters
-                        if '$gte' in value:
-                            query = query.filter(column >= value['$gte'])
-                        if '$lte' in value:
-                            query = query.filter(column <= value['$lte'])
-                        if '$gt' in value:
-                            query = query.filter(column > value['$gt'])
-                        if '$lt' in value:
-                            query = query.filter(column < value['$lt'])
-                        if '$in' in value:
-                            query = query.filter(column.in_(value['$in']))
-                        if '$ne' in value:
-                            query = query.filter(column != value['$ne'])
-                    elif isinstance(value, list):
-                        # IN clause
-                        query = query.filter(column.in_(value))
-                    else:
-                        # Exact match
-                        query = query.filter(column == value)
+        conditions = self.build_table_conditions(table, filters)
+        
+        # Equality/$in filters on bitmap-indexed columns resolve to row keys directly
+        bitset = bitmap_indexes.match(self.db, table_name, filters) if row_key is not None else None
         
         # Get total count
-        total_count = query.count()
+        total_count = self.count_table_rows(table, row_key, conditions, filters, include_total, bitset)
         
-        # Apply pagination
-        query = query.limit(limit).offset(offset)
+        query = self.build_page_query(table, columns, row_key, conditions, bitset, limit, offset, cursor)
         
         # Execute query
-        results = query.all()
+        results = self.db.execute(query).all()
         
         # Convert to dictionaries
         data = []
+        last_row_key = None
         for row in results:
             row_dict = dict(row._mapping)
-            
-            # Filter fields if specified
-            if fields:
-                row_dict = {k: v for k, v in row_dict.items() if k in fields}
-            
+            last_row_key = row_dict.pop('_row_key', None)
             data.append(row_dict)
         
+        # A full page means there may be more rows after it
+        next_cursor = None
+        if row_key is not None and len(data) == limit:
+            next_cursor = encode_cursor([last_row_key])
+        
         query_time = (time.time() - start_time) * 1000
         
         return {
             'dataset': table_name,
             'total_records': total_count,
+            'total_mode': include_total,
             'returned_records': len(data),
             'data': data,
             'query_time_ms': round(query_time, 2),
             'filters_applied': filters or {},
             'limit': limit,
-            'offset': offset
+            'offset': offset if cursor is None else None,
+            'next_cursor': next_cursor
         }
@@ -0,0 +1,187 @@
+"""
+Statement deadlines and cooperative cancellation for database queries
+"""
+from typing import Dict, Any, Callable, Optional
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+import asyncio
+import threading
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL SQLSTATE for a statement cancelled by statement_timeout or a cancel request
+PG_QUERY_CANCELED = '57014'
+
+
+class QueryTimeoutError(Exception):
+    """The query ran past its deadline and was aborted by the database"""
+
+
+class QueryCancelledError(Exception):
+    """The query was aborted because its client went away"""
+
+
+class QueryMetrics:
+    """Counters of guarded queries by outcome"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {'completed': 0, 'timed_out': 0, 'cancelled': 0, 'failed': 0}
+        self._by_table: Dict[str, Dict[str, int]] = {}
+    
+    def record(self, table_name: str, outcome: str) -> None:
+        with self._lock:
+            self._metrics[outcome] += 1
+            table = self._by_table.setdefault(table_name, {key: 0 for key in self._metrics})
+            table[outcome] += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Outcome counters, overall and per table"""
+        with self._lock:
+            return {
+                **self._metrics,
+                'by_table': {name: dict(counts) for name, counts in self._by_table.items()}
+            }
+
+
+class QueryGuard:
+    """
+    Enforces a deadline on the queries run inside it and aborts them on cancel
+    
+    SQLite: a progress handler, called every ``SQLITE_PROGRESS_OPS`` virtual
+    machine instructions, aborts the running statement once the deadline
+    passes or ``cancel_event`` is set. PostgreSQL: ``statement_timeout`` is
+    set for the transaction, and a watcher thread sends a cancel request
+    when ``cancel_event`` is set. Either way the database stops the work;
+    the aborted statement surfaces as ``QueryTimeoutError`` or
+    ``QueryCancelledError`` and the session is rolled back.
+    """
+    
+    SQLITE_PROGRESS_OPS = 10000
+    
+    def __init__(
+        self,
+        db: Session,
+        table_name: str,
+        timeout_seconds: Optional[float],
+        cancel_event: Optional[threading.Event] = None
+    ):
+        self.db = db
+        self.table_name = table_name
+        self.timeout_seconds = timeout_seconds
+        self.cancel_event = cancel_event or threading.Event()
+        self.deadline = None
+        self.timed_out = False
+        self._dbapi_connection = None
+        self._finished = threading.Event()
+    
+    def _sqlite_progress(self) -> int:
+        """Non-zero aborts the running SQLite statement"""
+        if self.cancel_event.is_set():
+            return 1
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            self.timed_out = True
+            return 1
+        return 0
+    
+    def _pg_watch_cancel(self) -> None:
+        """Send a cancel request for the running statement when cancelled"""
+        while not self._finished.is_set():
+            if self.cancel_event.wait(0.25):
+                if not self._finished.is_set():
+                    self._dbapi_connection.cancel()
+                return
+    
+    def __enter__(self):
+        if self.timeout_seconds is not None:
+            self.deadline = time.monotonic() + self.timeout_seconds
+        
+        self._dbapi_connection = self.db.connection().connection.driver_connection
+        dialect = self.db.bind.dialect.name
+        
+        if dialect == 'sqlite':
+            self._dbapi_connection.set_progress_handler(self._sqlite_progress, self.SQLITE_PROGRESS_OPS)
+        elif dialect == 'postgresql':
+            if self.timeout_seconds is not None:
+                self.db.execute(text(f"SET LOCAL statement_timeout = {int(self.timeout_seconds * 1000)}"))
+            threading.Thread(target=self._pg_watch_cancel, daemon=True).start()
+        
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self._finished.set()
+        dialect = self.db.bind.dialect.name
+        
+        if dialect == 'sqlite':
+            self._dbapi_connection.set_progress_handler(None, self.SQLITE_PROGRESS_OPS)
+        elif dialect == 'postgresql' and exc is None and self.timeout_seconds is not None:
+            self.db.execute(text("SET LOCAL statement_timeout TO DEFAULT"))
+        
+        if exc is None:
+            query_metrics.record(self.table_name, 'completed')
+            return False
+        
+        if isinstance(exc, GeneratorExit):
+            # A streaming response stopped being consumed (client went away)
+            query_metrics.record(self.table_name, 'cancelled')
+            return False
+        
+        if isinstance(exc, DBAPIError) and self._was_aborted(exc):
+            self.db.rollback()
+            
+            if self.cancel_event.is_set():
+                query_metrics.record(self.table_name, 'cancelled')
+                logger.info(f"Query on '{self.table_name}' cancelled: client disconnected")
+                raise QueryCancelledError("Query cancelled") from exc
+            
+            query_metrics.record(self.table_name, 'timed_out')
+            logger.warning(f"Query on '{self.table_name}' exceeded its {self.timeout_seconds}s deadline")
+            raise QueryTimeoutError(
+                f"Query exceeded the time limit of {self.timeout_seconds:g} seconds"
+            ) from exc
+        
+        query_metrics.record(self.table_name, 'failed')
+        return False
+    
+    def _was_aborted(self, exc: DBAPIError) -> bool:
+        """Whether a database error is the guard's own abort"""
+        if self.db.bind.dialect.name == 'postgresql':
+            return getattr(exc.orig, 'pgcode', None) == PG_QUERY_CANCELED
+        return 'interrupted' in str(exc.orig) and (self.timed_out or self.cancel_event.is_set())
+
+
+def watch_disconnect(receive: Callable, cancel_event: threading.Event) -> Callable[[], None]:
+    """
+    Set ``cancel_event`` when the HTTP client disconnects
+    
+    For synchronous endpoints running in the threadpool: waits on the
+    request's ASGI ``receive`` channel on the event loop until it reports
+    ``http.disconnect`` (only for requests whose body is not read, e.g.
+    GET). Polling ``Request.is_disconnected`` is not used because it never
+    sees the disconnect through ``BaseHTTPMiddleware``. Returns a function
+    that stops the watcher.
+    """
+    import anyio.from_thread
+    
+    async def watch():
+        while True:
+            message = await receive()
+            if message.get('type') == 'http.disconnect':
+                cancel_event.set()
+                return
+    
+    try:
+        loop = anyio.from_thread.run_sync(asyncio.get_running_loop)
+    except RuntimeError:
+        # Not running in an event loop worker thread; nothing to watch
+        return lambda: None
+    
+    future = asyncio.run_coroutine_threadsafe(watch(), loop)
+    return future.cancel
+
+
+# Shared counters of guarded query outcomes
+query_metrics = QueryMetrics()
@@ -0,0 +1,297 @@
+"""
+Typed tables materialized from the JSON reference datasets
+
+Promotes the PLFS reference spreadsheets (district codes, item codes, data
+layout) stored as data_records JSON into real tables with proper column
+names, types and indexes, driven by config/datasets/reference_tables.yaml
+"""
+import re
+import fnmatch
+from pathlib import Path
+import yaml
+from typing import Dict, Any, List, Optional
+import logging
+from sqlalchemy import Table, Column, Integer, Float, String, MetaData, Index
+from datetime import datetime
+from app.config import PROJECT_ROOT
+from app.database import SessionLocal, engine
+from app.models.dataset import Dataset, DataRecord
+from app.services.schema_registry import schema_registry
+from app.services.dataset_version import dataset_versions
+from app.services.full_text_search import FullTextSearchService
+from app.services.facets import facet_index
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = PROJECT_ROOT / 'config' / 'datasets' / 'reference_tables.yaml'
+
+COLUMN_TYPES = {
+    'integer': Integer,
+    'float': Float,
+    'string': String
+}
+
+
+def convert_value(value: Any, column_type: str) -> Any:
+    """Convert a spreadsheet cell to the column type; None if blank or invalid"""
+    if value is None:
+        return None
+    if isinstance(value, float) and value != value:  # NaN
+        return None
+    
+    text = str(value).strip()
+    if text == '' or text.lower() == 'nan':
+        return None
+    
+    if column_type == 'string':
+        return text
+    
+    try:
+        number = float(text)
+    except ValueError:
+        return None
+    
+    if column_type == 'integer':
+        return int(number) if number.is_integer() else None
+    return number
+
+
+class ReferenceTableMaterializer:
+    """Builds typed tables from JSON reference datasets"""
+    
+    def __init__(self, config_file: Optional[str] = None):
+        self.config_file = Path(config_file) if config_file else DEFAULT_CONFIG
+        self.db = SessionLocal()
+        
+        if not self.config_file.exists():
+            raise FileNotFoundError(f"Config file not found: {self.config_file}")
+    
+    def load_config(self) -> List[Dict[str, Any]]:
+        """Load reference table mappings from YAML"""
+        with open(self.config_file, 'r') as f:
+            config = yaml.safe_load(f)
+        return config['reference_tables']
+    
+    @staticmethod
+    def find_key(record: Dict[str, Any], patterns: Any) -> Optional[str]:
+        """Find the first record key matching the source glob(s)"""
+        if isinstance(patterns, str):
+            patterns = [patterns]
+        
+        for pattern in patterns:
+            for key in record:
+                if fnmatch.fnmatchcase(key, pattern):
+                    return key
+        return None
+    
+    def resolve_sources(self, mapping: Dict[str, Any], record: Dict[str, Any]) -> Dict[str, Any]:
+        """Get the source key pattern of each column, applying matching variants"""
+        sources = {col['name']: col['source'] for col in mapping['schema']}
+        
+        for variant in mapping.get('variants', []):
+            matches = all(
+                fnmatch.fnmatchcase(str(record.get(key, '')), pattern)
+                for key, pattern in variant.get('when', {}).items()
+            )
+            if matches:
+                sources.update(variant.get('source', {}))
+        
+        return sources
+    
+    def convert_records(self, mapping: Dict[str, Any], records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Map JSON records to typed rows, dropping title and header rows"""
+        schema = mapping['schema']
+        carried: Dict[str, Any] = {}
+        rows = []
+        
+        for record in records:
+            sources = self.resolve_sources(mapping, record)
+            row = {}
+            keep = True
+            
+            for col in schema:
+                key = self.find_key(record, sources[col['name']])
+                value = record.get(key) if key is not None else None
+                
+                if value is not None and col.get('extract'):
+                    match = re.search(col['extract'], str(value))
+                    value = match.group(1) if match else None
+                
+                value = convert_value(value, col.get('type', 'string'))
+                
+                if col.get('carry_forward'):
+                    if value is None:
+                        value = carried.get(col['name'])
+                    else:
+                        carried[col['name']] = value
+                
+                if col.get('required') and value is None:
+                    keep = False
+                if value is not None and str(value) in col.get('exclude', []):
+                    keep = False
+                
+                row[col['name']] = value
+            
+            if keep:
+                rows.append(row)
+        
+        return rows
+    
+    def create_table(self, mapping: Dict[str, Any]) -> Table:
+        """Drop and recreate the typed table with its indexes"""
+        table_name = mapping['table_name']
+        metadata = MetaData()
+        
+        columns = [Column('id', Integer, primary_key=True, autoincrement=True)]
+        for col in mapping['schema']:
+            columns.append(Column(col['name'], COLUMN_TYPES[col.get('type', 'string')]))
+        
+        table = Table(table_name, metadata, *columns)
+        for idx in mapping.get('indexes', []):
+            Index(idx['name'], *[table.c[name] for name in idx['columns']])
+        
+        table.drop(bind=engine, checkfirst=True)
+        table.create(bind=engine)
+        
+        # The table was dropped and recreated - cached schema is stale
+        schema_registry.invalidate(table_name)
+        
+        logger.info(f"Created table '{table_name}' with {len(mapping['schema'])} columns")
+        return table
+    
+    def register_dataset(self, mapping: Dict[str, Any], source: Dataset) -> Dataset:
+        """Register the typed table as a dataset"""
+        existing = self.db.query(Dataset).filter(
+            Dataset.table_name == mapping['table_name']
+        ).first()
+        
+        full_config = {
+            'schema': [
+                {k: v for k, v in col.items() if k not in ('source', 'extract', 'exclude', 'carry_forward')}
+                for col in mapping['schema']
+            ],
+            'source': 'MoSPI',
+            'file_format': 'json',
+            'source_dataset_id': source.id,
+            'indexes': mapping.get('indexes', []),
+            'full_text': mapping.get('full_text', []),
+            'facets': mapping.get('facets', []),
+            'autocomplete': mapping.get('autocomplete', {}),
+            'query_engine': 'sql'
+        }
+        
+        if existing:
+            logger.info(f"Dataset '{mapping['name']}' already exists, updating...")
+            existing.name = mapping['name']
+            existing.description = mapping['description']
+            existing.config = full_config
+            existing.updated_at = datetime.utcnow()
+            self.db.commit()
+            return existing
+        
+        dataset = Dataset(
+            name=mapping['name'],
+            description=mapping['description'],
+            table_name=mapping['table_name'],
+            config=full_config
+        )
+        
+        self.db.add(dataset)
+        self.db.commit()
+        self.db.refresh(dataset)
+        
+        logger.info(f"Registered dataset '{mapping['name']}' (ID: {dataset.id})")
+        return dataset
+    
+    def find_source(self, mapping: Dict[str, Any]) -> Optional[Dataset]:
+        """
+        Get the JSON dataset a reference table is built from, if it was loaded
+        
+        The typed dataset registered for the table matches the same name
+        pattern ('PLFS District Codes' LIKE '%District_codes%'), so it is
+        excluded; the oldest match wins.
+        """
+        return self.db.query(Dataset).filter(
+            Dataset.name.like(mapping['source_dataset']),
+            Dataset.table_name != mapping['table_name']
+        ).order_by(Dataset.id).first()
+    
+    def materialize(self, mapping: Dict[str, Any]) -> Dict[str, Any]:
+        """Materialize one reference dataset into its typed table"""
+        table_name = mapping['table_name']
+        
+        source = self.find_source(mapping)
+        if source is None:
+            raise LookupError(f"No source dataset matching '{mapping['source_dataset']}'")
+        
+        records = [
+            record.data for record in self.db.query(DataRecord).filter(
+                DataRecord.dataset_id == source.id
+            ).order_by(DataRecord.id)
+        ]
+        rows = self.convert_records(mapping, records)
+        logger.info(f"  {len(records):,} source records -> {len(rows):,} rows")
+        
+        # Check the source before the existing table is dropped
+        if not rows:
+            raise ValueError(
+                f"Source dataset '{source.name}' has no rows matching the schema "
+                f"({len(records):,} records); '{table_name}' left unchanged"
+            )
+        
+        table = self.create_table(mapping)
+        with engine.begin() as conn:
+            conn.execute(table.insert(), rows)
+        
+        if mapping.get('full_text'):
+            FullTextSearchService(self.db).build_index(table_name, mapping['full_text'])
+        
+        if mapping.get('facets'):
+            next_version = dataset_versions.get(self.db, table_name) + 1
+            facet_index.build(self.db, table_name, mapping['facets'], next_version)
+        
+        dataset = self.register_dataset(mapping, source)
+        
+        # New data version - caches keyed on the old one stop matching
+        dataset_versions.bump(self.db, table_name)
+        
+        return {
+            'success': True,
+            'dataset_id': dataset.id,
+            'table_name': table_name,
+            'source_dataset': source.name,
+            'total_rows': len(rows)
+        }
+    
+    def run(self, missing_only: bool = False) -> List[Dict[str, Any]]:
+        """
+        Materialize every configured reference table
+        
+        With ``missing_only``, tables that already exist are left alone and
+        sources that were never loaded are skipped silently, so it is cheap
+        to run at application startup.
+        """
+        results = []
+        
+        try:
+            for mapping in self.load_config():
+                if missing_only and (
+                    schema_registry.has_table(mapping['table_name'], self.db.bind)
+                    or self.find_source(mapping) is None
+                ):
+                    continue
+                logger.info(f"\nMaterializing {mapping['name']} -> {mapping['table_name']}...")
+                try:
+                    results.append(self.materialize(mapping))
+                except LookupError as e:
+                    logger.warning(f"⚠ Skipping {mapping['name']}: {e}")
+                    results.append({'success': False, 'table_name': mapping['table_name'], 'error': str(e), 'skipped': True})
+                except Exception as e:
+                    self.db.rollback()
+                    logger.error(f"✗ {mapping['name']} failed: {e}")
+                    results.append({'success': False, 'table_name': mapping['table_name'], 'error': str(e)})
+        finally:
+            self.db.close()
+        
+        return results
+
@@ -0,0 +1,183 @@
+"""
+Versioned query result cache with an in-process LRU tier and an optional Redis tier
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from app.config import get_settings
+from app.services.schema_registry import schema_registry
+from app.services.serialization import dumps, loads
+import hashlib
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class ResultCache:
+    """
+    Cache of serialized query results
+    
+    Keys combine the table, its data version and a hash of the normalized
+    request, so re-ingesting a dataset (which bumps the version) makes old
+    entries unreachable without any explicit purge. The in-process tier is an
+    LRU bounded by total payload bytes; the Redis tier is shared between
+    workers and expires entries after ``RESULT_CACHE_REDIS_TTL_SECONDS``.
+    """
+    
+    def __init__(
+        self,
+        max_bytes: int = None,
+        max_entry_bytes: int = None,
+        redis_enabled: bool = None
+    ):
+        self.max_bytes = settings.RESULT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.max_entry_bytes = (
+            settings.RESULT_CACHE_MAX_ENTRY_BYTES if max_entry_bytes is None else max_entry_bytes
+        )
+        self.redis_enabled = settings.RESULT_CACHE_REDIS_ENABLED if redis_enabled is None else redis_enabled
+        
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size_bytes = 0
+        self._redis = None
+        
+        self._metrics = {
+            'memory_hits': 0,
+            'redis_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0,
+            'skipped_too_large': 0,
+            'redis_errors': 0
+        }
+    
+    @staticmethod
+    def make_key(table_name: str, version: int, **request: Any) -> str:
+        """Build a cache key from the table, its data version and the request"""
+        payload = json.dumps(request, sort_keys=True, default=str)
+        digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+        return f"mospi:result:{table_name}:v{version}:{digest}"
+    
+    def _get_redis(self):
+        """Lazily connect to Redis; disable the tier if it is unavailable"""
+        if not self.redis_enabled:
+            return None
+        if self._redis is None:
+            try:
+                import redis
+                self._redis = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=0.5)
+                self._redis.ping()
+            except Exception as e:
+                logger.warning(f"Redis result cache tier disabled: {e}")
+                self.redis_enabled = False
+                self._redis = None
+        return self._redis
+    
+    def _count(self, metric: str) -> None:
+        with self._lock:
+            self._metrics[metric] += 1
+    
+    def _store_memory(self, key: str, payload: bytes) -> None:
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size_bytes -= len(previous)
+            
+            self._entries[key] = payload
+            self._size_bytes += len(payload)
+            
+            # Evict least recently used entries until back under budget
+            while self._size_bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size_bytes -= len(evicted)
+                self._metrics['evictions'] += 1
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up a result, trying the in-process tier before Redis"""
+        if not settings.RESULT_CACHE_ENABLED:
+            return None
+        
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                self._metrics['memory_hits'] += 1
+        
+        if payload is None:
+            client = self._get_redis()
+            if client is not None:
+                try:
+                    payload = client.get(key)
+                except Exception as e:
+                    logger.warning(f"Redis result cache read failed: {e}")
+                    self._count('redis_errors')
+                    payload = None
+                
+                if payload is not None:
+                    self._count('redis_hits')
+                    self._store_memory(key, payload)
+        
+        if payload is None:
+            self._count('misses')
+            return None
+        
+        return loads(payload)
+    
+    def set(self, key: str, result: Dict[str, Any]) -> None:
+        """Store a result in both tiers unless it exceeds the entry size limit"""
+        if not settings.RESULT_CACHE_ENABLED:
+            return
+        
+        payload = dumps(result)
+        if len(payload) > self.max_entry_bytes:
+            self._count('skipped_too_large')
+            return
+        
+        self._store_memory(key, payload)
+        self._count('stores')
+        
+        client = self._get_redis()
+        if client is not None:
+            try:
+                client.set(key, payload, ex=settings.RESULT_CACHE_REDIS_TTL_SECONDS)
+            except Exception as e:
+                logger.warning(f"Redis result cache write failed: {e}")
+                self._count('redis_errors')
+    
+    def invalidate(self, table_name: Optional[str] = None) -> None:
+        """Drop in-process entries for one table, or all of them"""
+        with self._lock:
+            if table_name is None:
+                self._entries.clear()
+                self._size_bytes = 0
+                return
+            
+            prefix = f"mospi:result:{table_name}:"
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                self._size_bytes -= len(self._entries.pop(key))
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size of the in-process tier"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            entries = len(self._entries)
+            size_bytes = self._size_bytes
+        
+        lookups = metrics['memory_hits'] + metrics['redis_hits'] + metrics['misses']
+        hits = metrics['memory_hits'] + metrics['redis_hits']
+        
+        return {
+            **metrics,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'entries': entries,
+            'size_bytes': size_bytes,
+            'max_bytes': self.max_bytes,
+            'redis_enabled': self.redis_enabled
+        }
+
+
+# Shared cache instance; superseded entries are freed when a table is invalidated
+result_cache = ResultCache()
+schema_registry.add_invalidation_listener(result_cache.invalidate)
@@ -0,0 +1,207 @@
+"""
+Reproducible uniform and stratified row sampling for survey tables
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import select, func, text
+from sqlalchemy.orm import Session
+from app.services.schema_registry import schema_registry
+from app.services.query_builder import QueryBuilderService
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# Column holding each row's precomputed random key, uniform in [0, SAMPLE_KEY_RANGE)
+SAMPLE_KEY = 'sample_key'
+schema_registry.add_internal_column(SAMPLE_KEY)
+SAMPLE_KEY_RANGE = 2 ** 31
+
+
+def sample_start(seed: int) -> int:
+    """Position in the sample key space where a seed's sample starts"""
+    return random.Random(seed).randrange(SAMPLE_KEY_RANGE)
+
+
+def allocate(sample_size: int, populations: List[int]) -> List[int]:
+    """
+    Split a sample size across strata proportionally to their populations
+    
+    Largest-remainder rounding, so the allocations add up to the sample
+    size (or to the whole population when it is smaller).
+    """
+    total = sum(populations)
+    if total <= sample_size:
+        return list(populations)
+    
+    quotas = [sample_size * population / total for population in populations]
+    allocation = [int(quota) for quota in quotas]
+    
+    by_remainder = sorted(range(len(quotas)), key=lambda i: quotas[i] - allocation[i], reverse=True)
+    for i in by_remainder[:sample_size - sum(allocation)]:
+        allocation[i] += 1
+    
+    return allocation
+
+
+class SamplingService:
+    """
+    Draws random samples through a precomputed random key per row
+    
+    Ingestion stores a uniform random integer in ``sample_key`` and indexes
+    it (alone and behind each stratum column). Ordering rows by that key is
+    a random permutation fixed at ingestion, so a sample of n rows is the
+    next n keys after a seed-dependent start, read off the index and
+    wrapping around at the end: no sort, no full scan, and the same seed
+    always returns the same rows for the same data version.
+    
+    Stratified samples allocate the size across the distinct values of the
+    stratum columns proportionally to their matching row counts, then draw
+    each stratum the same way.
+    """
+    
+    def __init__(self, db: Session):
+        self.db = db
+        self.query_builder = QueryBuilderService(db)
+    
+    @property
+    def dialect(self) -> str:
+        return self.db.bind.dialect.name
+    
+    def assign_sample_keys(self, table_name: str, strata: Optional[List[str]] = None) -> int:
+        """
+        Add and fill the sample key column of a table and index it
+        
+        Also used to backfill tables ingested before sampling existed.
+        Each column in ``strata`` gets a ``(column, sample_key)`` index so
+        per-stratum draws are range scans too. Returns the rows keyed.
+        """
+        table = schema_registry.get_table(table_name, self.db.bind)
+        
+        if SAMPLE_KEY not in table.c:
+            self.db.execute(text(f'ALTER TABLE {table_name} ADD COLUMN "{SAMPLE_KEY}" INTEGER'))
+        
+        if self.dialect == 'postgresql':
+            random_key = f"floor(random() * {SAMPLE_KEY_RANGE})::integer"
+        else:
+            random_key = f"random() & {SAMPLE_KEY_RANGE - 1}"
+        keyed = self.db.execute(text(f'UPDATE {table_name} SET "{SAMPLE_KEY}" = {random_key}')).rowcount
+        
+        self.db.execute(text(
+            f'CREATE INDEX IF NOT EXISTS idx_{table_name}_{SAMPLE_KEY} ON {table_name} ("{SAMPLE_KEY}")'
+        ))
+        for column in strata or []:
+            if column not in table.c:
+                logger.warning(f"  Stratum column '{column}' not in '{table_name}', skipping")
+                continue
+            self.db.execute(text(
+                f'CREATE INDEX IF NOT EXISTS idx_{table_name}_{column.lower()}_{SAMPLE_KEY} '
+                f'ON {table_name} ("{column}", "{SAMPLE_KEY}")'
+            ))
+        
+        self.db.commit()
+        schema_registry.invalidate(table_name)
+        
+        logger.info(f"  Assigned sample keys to {keyed:,} rows of {table_name}")
+        return keyed
+    
+    def draw(self, table, columns: List[Any], conditions: List[Any], start: int, size: int) -> List[Dict[str, Any]]:
+        """The ``size`` matching rows whose sample keys follow ``start``, wrapping around"""
+        key = table.c[SAMPLE_KEY]
+        
+        def read(key_condition, count: int) -> List[Dict[str, Any]]:
+            query = select(*columns).where(*conditions, key_condition).order_by(key).limit(count)
+            return [dict(row._mapping) for row in self.db.execute(query).all()]
+        
+        rows = read(key >= start, size)
+        if len(rows) < size:
+            rows.extend(read(key < start, size - len(rows)))
+        return rows
+    
+    def count_strata(self, table, strata: List[str], conditions: List[Any]) -> List[Tuple[tuple, int]]:
+        """Matching row count of every stratum, in stratum order"""
+        stratum_columns = [table.c[name] for name in strata]
+        query = (
+            select(*stratum_columns, func.count())
+            .where(*conditions)
+            .group_by(*stratum_columns)
+            .order_by(*stratum_columns)
+        )
+        return [(tuple(row[:-1]), row[-1]) for row in self.db.execute(query).all()]
+    
+    def sample_table(
+        self,
+        table_name: str,
+        size: int,
+        filters: Optional[Dict[str, Any]] = None,
+        fields: Optional[List[str]] = None,
+        seed: Optional[int] = None,
+        strata: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Draw a uniform (or, with ``strata``, stratified) sample of matching rows
+        
+        Returns the table query response shape; ``total_records`` is the
+        number of rows sampled from. ``sample`` records the method, the
+        seed (a fresh one when none was given, so the draw can be
+        repeated) and for stratified samples the per-stratum allocation.
+        """
+        start_time = time.time()
+        
+        table = schema_registry.get_table(table_name, self.db.bind)
+        if SAMPLE_KEY not in table.c:
+            raise ValueError(f"Table '{table_name}' has no sample keys; re-run its ingestion to enable sampling")
+        
+        unknown = [
+            name for name in strata or []
+            if name not in table.c or schema_registry.is_internal_column(name)
+        ]
+        if unknown:
+            raise ValueError(f"Unknown stratum column(s) for '{table_name}': {', '.join(unknown)}")
+        
+        if seed is None:
+            seed = random.randrange(SAMPLE_KEY_RANGE)
+        start = sample_start(seed)
+        
+        columns = self.query_builder.resolve_projection(table, fields)
+        conditions = self.query_builder.build_table_conditions(table, filters)
+        
+        sample_info: Dict[str, Any] = {'method': 'stratified' if strata else 'uniform', 'seed': seed}
+        
+        if strata:
+            counts = self.count_strata(table, strata, conditions)
+            allocation = allocate(size, [population for _, population in counts])
+            total_count = sum(population for _, population in counts)
+            
+            data = []
+            sample_info['strata'] = strata
+            sample_info['allocation'] = []
+            for (values, population), stratum_size in zip(counts, allocation):
+                if stratum_size:
+                    stratum_conditions = conditions + [table.c[name] == value for name, value in zip(strata, values)]
+                    data.extend(self.draw(table, columns, stratum_conditions, start, stratum_size))
+                sample_info['allocation'].append({
+                    'stratum': dict(zip(strata, values)),
+                    'population': population,
+                    'sampled': stratum_size
+                })
+        else:
+            row_key = self.query_builder.get_row_key(table)
+            total_count = self.query_builder.count_table_rows(table, row_key, conditions, filters)
+            data = self.draw(table, columns, conditions, start, size)
+        
+        query_time = (time.time() - start_time) * 1000
+        
+        return {
+            'dataset': table_name,
+            'total_records': total_count,
+            'total_mode': 'exact',
+            'returned_records': len(data),
+            'data': data,
+            'query_time_ms': round(query_time, 2),
+            'filters_applied': filters or {},
+            'limit': size,
+            'offset': None,
+            'next_cursor': None,
+            'sample': sample_info
+        }
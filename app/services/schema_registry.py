@@ -0,0 +1,118 @@
+"""
+Process-wide schema registry for dataset tables
+"""
+from typing import Dict, Any, Callable, List, Optional, Set, Tuple
+from sqlalchemy import MetaData, Table, inspect
+from sqlalchemy.engine import Engine
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaRegistry:
+    """
+    Reflects each dataset table once and keeps the ``Table`` objects in memory
+    
+    Query paths resolve tables through the registry instead of reflecting on
+    every request. Entries are dropped explicitly with ``invalidate`` whenever
+    ingestion or the dataset admin endpoints change a table. Other per-table
+    caches subscribe with ``add_invalidation_listener`` so they are dropped
+    at the same time.
+    
+    Services that add bookkeeping columns to dataset tables (sample keys,
+    household keys) declare them with ``add_internal_column``; those columns
+    are left out of ``public_columns`` and so never reach query results or
+    schema listings.
+    """
+    
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._metadata: Dict[str, MetaData] = {}
+        self._tables: Dict[Tuple[str, str], Table] = {}
+        self._table_names: Dict[str, Set[str]] = {}
+        self._listeners: List[Callable[[Optional[str]], None]] = []
+        self._internal_columns: Set[str] = set()
+    
+    def add_invalidation_listener(self, listener: Callable[[Optional[str]], None]) -> None:
+        """Register a callback run with the table name (or None) on invalidation"""
+        with self._lock:
+            self._listeners.append(listener)
+    
+    def add_internal_column(self, column_name: str) -> None:
+        """Declare a column that services add to tables but never expose"""
+        with self._lock:
+            self._internal_columns.add(column_name)
+    
+    def is_internal_column(self, column_name: str) -> bool:
+        """Check whether a column is internal bookkeeping"""
+        return column_name in self._internal_columns
+    
+    def public_columns(self, table: Table) -> List[Any]:
+        """Columns of a table without the internal ones, in table order"""
+        return [column for column in table.c if column.name not in self._internal_columns]
+    
+    @staticmethod
+    def _bind_key(bind: Engine) -> str:
+        """Identify a bind by its URL so one registry serves every engine"""
+        return str(bind.url)
+    
+    def table_names(self, bind: Engine) -> Set[str]:
+        """Get the (cached) set of table names in the database"""
+        key = self._bind_key(bind)
+        with self._lock:
+            names = self._table_names.get(key)
+            if names is None:
+                names = set(inspect(bind).get_table_names())
+                self._table_names[key] = names
+            return names
+    
+    def has_table(self, table_name: str, bind: Engine) -> bool:
+        """Check whether a table exists without hitting the catalog"""
+        return table_name in self.table_names(bind)
+    
+    def get_table(self, table_name: str, bind: Engine) -> Table:
+        """Get the reflected table, reflecting it on first use"""
+        key = (self._bind_key(bind), table_name)
+        with self._lock:
+            table = self._tables.get(key)
+            if table is None:
+                metadata = self._metadata.setdefault(key[0], MetaData())
+                table = Table(table_name, metadata, autoload_with=bind)
+                self._tables[key] = table
+                logger.info(f"Reflected table '{table_name}' ({len(table.c)} columns)")
+            return table
+    
+    def column_types(self, table_name: str, bind: Engine) -> Dict[str, Any]:
+        """Get a mapping of column name to SQLAlchemy type"""
+        table = self.get_table(table_name, bind)
+        return {column.name: column.type for column in table.c}
+    
+    def invalidate(self, table_name: Optional[str] = None) -> None:
+        """Drop cached schema for one table, or everything if no name is given"""
+        with self._lock:
+            self._table_names.clear()
+            
+            if table_name is None:
+                self._tables.clear()
+                self._metadata.clear()
+            else:
+                for key in [k for k in self._tables if k[1] == table_name]:
+                    table = self._tables.pop(key)
+                    metadata = self._metadata.get(key[0])
+                    if metadata is not None and table.name in metadata.tables:
+                        metadata.remove(table)
+            
+            listeners = list(self._listeners)
+        
+        for listener in listeners:
+            try:
+                listener(table_name)
+            except Exception as e:
+                logger.warning(f"Invalidation listener failed for '{table_name}': {e}")
+        
+        logger.info(f"Invalidated schema registry entry for '{table_name or 'all tables'}'")
+
+
+# Shared registry instance for the whole process
+schema_registry = SchemaRegistry()
@@ -0,0 +1,41 @@
+"""
+Fast JSON serialization for query responses
+"""
+from typing import Any
+from fastapi.responses import Response
+import json
+
+try:
+    import orjson
+except ImportError:  # Optional dependency; fall back to the standard library
+    orjson = None
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize to compact JSON bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=str, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data: bytes) -> Any:
+    """Parse JSON bytes"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class EncodedJSONResponse(Response):
+    """
+    JSON response whose body was already encoded with ``dumps``
+    
+    Handlers encode the result once, meter its exact byte length and return
+    it in this response, so FastAPI neither validates the payload against
+    ``response_model`` nor serializes it a second time. The endpoint's
+    ``response_model`` is still used for the OpenAPI schema.
+    """
+    
+    media_type = "application/json"
+    
+    def __init__(self, body: bytes, status_code: int = 200, **kwargs):
+        super().__init__(content=body, status_code=status_code, **kwargs)
@@ -0,0 +1,117 @@
+"""
+Benchmark offset vs cursor (keyset) pagination on a person_survey-sized table
+
+Builds a throwaway SQLite database with the same row count as the real
+person_survey table (~415K rows) and times page 1 and page 4,000 of
+QueryBuilderService.execute_table_query with both paging modes.
+
+Usage:
+    python benchmark_pagination.py [--rows 415000] [--page-size 100] [--page 4000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.services.query_builder import QueryBuilderService, encode_cursor
+
+COLUMNS = [
+    'State_UT_Code', 'District_Code', 'Sector', 'Sex', 'Age', 'Marital_Status',
+    'General_Education_Level', 'Principal_Status_Code', 'CWS_Status_Code',
+    'CWS_Earnings_Salaried', 'Subsample_Multiplier'
+]
+
+
+def build_database(path: str, rows: int) -> None:
+    """Create a person_survey-like table with an id primary key"""
+    conn = sqlite3.connect(path)
+    column_sql = ', '.join(f'"{col}" INTEGER' for col in COLUMNS)
+    conn.execute(f"CREATE TABLE person_survey (id INTEGER PRIMARY KEY AUTOINCREMENT, {column_sql})")
+    
+    rng = random.Random(42)
+    placeholders = ', '.join('?' for _ in COLUMNS)
+    batch = []
+    for _ in range(rows):
+        batch.append(tuple(rng.randint(1, 99) for _ in COLUMNS))
+        if len(batch) == 10000:
+            conn.executemany(f"INSERT INTO person_survey ({', '.join(COLUMNS)}) VALUES ({placeholders})", batch)
+            batch = []
+    if batch:
+        conn.executemany(f"INSERT INTO person_survey ({', '.join(COLUMNS)}) VALUES ({placeholders})", batch)
+    
+    conn.commit()
+    conn.close()
+
+
+def time_call(fn, repeat: int = 5) -> float:
+    """Best-of-N wall time in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark offset vs cursor pagination')
+    parser.add_argument('--rows', type=int, default=415000, help='Rows in the synthetic table')
+    parser.add_argument('--page-size', type=int, default=100, help='Rows per page')
+    parser.add_argument('--page', type=int, default=4000, help='Deep page number to compare with page 1')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        print(f"Building synthetic person_survey with {args.rows:,} rows...")
+        build_database(db_path, args.rows)
+        
+        engine = create_engine(f"sqlite:///{db_path}")
+        # Dataset metadata tables the query path consults (engine selection, versions)
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        service = QueryBuilderService(db)
+        
+        deep_offset = (args.page - 1) * args.page_size
+        # The cursor for page N is the id of the last row of page N-1
+        deep_cursor = encode_cursor([deep_offset])
+        
+        def offset_page(offset):
+            return lambda: service.execute_table_query('person_survey', limit=args.page_size, offset=offset)
+        
+        def cursor_page(cursor):
+            return lambda: service.execute_table_query('person_survey', limit=args.page_size, cursor=cursor)
+        
+        # Sanity check: both modes return the same deep page
+        assert offset_page(deep_offset)()['data'] == cursor_page(deep_cursor)()['data']
+        
+        results = [
+            ('offset', 1, time_call(offset_page(0))),
+            ('offset', args.page, time_call(offset_page(deep_offset))),
+            ('cursor', 1, time_call(cursor_page(encode_cursor([0])))),
+            ('cursor', args.page, time_call(cursor_page(deep_cursor))),
+        ]
+        
+        print("\n" + "=" * 50)
+        print(f"{'mode':<10}{'page':>10}{'best ms':>15}")
+        print("-" * 50)
+        for mode, page, ms in results:
+            print(f"{mode:<10}{page:>10,}{ms:>15.2f}")
+        print("=" * 50)
+        
+        db.close()
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
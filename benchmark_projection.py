@@ -0,0 +1,117 @@
+"""
+Benchmark narrow vs wide projections on a person_survey-width table
+
+Builds a throwaway SQLite database with a table as wide as the real
+person_survey table (~140 columns) and times a 10,000-row page of
+QueryBuilderService.execute_table_query:
+
+- wide: all columns
+- narrow (python): all columns fetched, then trimmed to `fields` in Python
+  (what the query path did before projection pushdown)
+- narrow (pushdown): `fields` compiled into the SELECT list
+
+Usage:
+    python benchmark_projection.py [--rows 100000] [--columns 140] [--limit 10000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.services.query_builder import QueryBuilderService
+
+NARROW_FIELDS = ['State_UT_Code', 'Sex', 'Age']
+
+
+def build_database(path: str, rows: int, columns: int) -> None:
+    """Create a wide person_survey-like table with an id primary key"""
+    names = NARROW_FIELDS + [f'Col_{i:03d}' for i in range(columns - len(NARROW_FIELDS))]
+    
+    conn = sqlite3.connect(path)
+    column_sql = ', '.join(f'"{col}" INTEGER' for col in names)
+    conn.execute(f"CREATE TABLE person_survey (id INTEGER PRIMARY KEY AUTOINCREMENT, {column_sql})")
+    
+    rng = random.Random(42)
+    insert_sql = f"INSERT INTO person_survey ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)})"
+    batch = []
+    for _ in range(rows):
+        batch.append(tuple(rng.randint(0, 9999) for _ in names))
+        if len(batch) == 5000:
+            conn.executemany(insert_sql, batch)
+            batch = []
+    if batch:
+        conn.executemany(insert_sql, batch)
+    
+    conn.commit()
+    conn.close()
+
+
+def time_call(fn, repeat: int = 5) -> float:
+    """Best-of-N wall time in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark narrow vs wide projections')
+    parser.add_argument('--rows', type=int, default=100000, help='Rows in the synthetic table')
+    parser.add_argument('--columns', type=int, default=140, help='Columns in the synthetic table')
+    parser.add_argument('--limit', type=int, default=10000, help='Rows per page')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        print(f"Building synthetic person_survey with {args.rows:,} rows x {args.columns} columns...")
+        build_database(db_path, args.rows, args.columns)
+        
+        engine = create_engine(f"sqlite:///{db_path}")
+        # Dataset metadata tables the query path consults (engine selection, versions)
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        service = QueryBuilderService(db)
+        
+        def query(fields=None):
+            return service.execute_table_query('person_survey', fields=fields, limit=args.limit, include_total='none')
+        
+        def python_trim():
+            result = query()
+            result['data'] = [{k: v for k, v in row.items() if k in NARROW_FIELDS} for row in result['data']]
+            return result
+        
+        # Sanity check: both narrow variants return the same rows
+        assert python_trim()['data'] == query(NARROW_FIELDS)['data']
+        
+        results = [
+            (f'wide ({args.columns + 1} cols)', time_call(query)),
+            (f'narrow python ({len(NARROW_FIELDS)} cols)', time_call(python_trim)),
+            (f'narrow pushdown ({len(NARROW_FIELDS)} cols)', time_call(lambda: query(NARROW_FIELDS))),
+        ]
+        
+        print("\n" + "=" * 50)
+        print(f"{'projection':<32}{'best ms':>15}")
+        print("-" * 50)
+        for name, ms in results:
+            print(f"{name:<32}{ms:>15.2f}")
+        print("=" * 50)
+        
+        db.close()
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
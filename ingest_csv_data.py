@@ -15,6 +15,14 @@ from datetime import datetime
 from app.database import SessionLocal, engine
 from app.models.dataset import Dataset, DataRecord
 from app.config import get_settings
+from app.services.schema_registry import schema_registry
+from app.services.dataset_version import dataset_versions
+from app.services.bitmap_index import bitmap_indexes
+from app.services.aggregation import AggregationService
+from app.services.sampling import SamplingService
+from app.services.facets import facet_index
+from app.services.household_join import HouseholdJoinService
+from app.services.indicators import IndicatorService
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -78,6 +86,9 @@ class CSVDataIngestion:
             conn.execute(text(create_table_sql))
             conn.commit()
         
+        # The table was dropped and recreated - cached schema is stale
+        schema_registry.invalidate(table_name)
+        
         logger.info(f"Created table '{table_name}' with {len(sample_df.columns)} columns")
     
     def register_dataset(self, config: Dict[str, Any]) -> Dataset:
@@ -95,7 +106,14 @@ class CSVDataIngestion:
             'size_mb': round(self.csv_file.stat().st_size / (1024 * 1024), 2),
             'relationships': config.get('relationships', []),
             'indexes': config.get('indexes', []),
-            'access': config.get('access', {})
+            'bitmap_indexes': config.get('bitmap_indexes', []),
+            'facets': config.get('facets', []),
+            'household_key': config.get('household_key', []),
+            'rollup': self.resolve_rollup(config),
+            'sampling': config.get('sampling', {}),
+            'indicators': config.get('indicators'),
+            'access': config.get('access', {}),
+            'query_engine': config.get('query_engine', 'sql')
         }
         
         if existing:
@@ -215,6 +233,92 @@ class CSVDataIngestion:
             
             conn.commit()
     
+    def create_household_key(self, table_name: str, config: Dict[str, Any]) -> None:
+        """Build the indexed composite key that joins persons to households"""
+        if not config.get('household_key'):
+            return
+        
+        try:
+            HouseholdJoinService(self.db).build_household_key(table_name, config['household_key'])
+        except ValueError as e:
+            logger.warning(f"  Could not build household key: {e}")
+    
+    def assign_sample_keys(self, table_name: str, config: Dict[str, Any]) -> None:
+        """Store a random sample key per row for the query sampling mode"""
+        strata = config.get('sampling', {}).get('strata', [])
+        SamplingService(self.db).assign_sample_keys(table_name, strata)
+    
+    def create_bitmap_indexes(self, table_name: str, config: Dict[str, Any], version: int) -> None:
+        """Create bitmap indexes for low-cardinality filter columns"""
+        if 'bitmap_indexes' not in config:
+            return
+        
+        built = bitmap_indexes.build(self.db, table_name, config['bitmap_indexes'], version)
+        logger.info(f"  Stored {built} bitmaps")
+    
+    def create_facets(self, table_name: str, config: Dict[str, Any], version: int) -> None:
+        """Count the distinct values of the facet and bitmap-indexed columns"""
+        columns = config.get('facets', []) + config.get('bitmap_indexes', [])
+        if not columns:
+            return
+        
+        stored = facet_index.build(self.db, table_name, columns, version)
+        logger.info(f"  Stored {stored} facet values")
+    
+    def resolve_rollup(self, config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Get the rollup config, keeping only dimensions declared filterable"""
+        if 'rollup' not in config:
+            return None
+        
+        filterable = {col['name'] for col in config.get('schema', []) if col.get('filterable')}
+        rollup = config['rollup']
+        
+        dimensions = []
+        for name in rollup.get('dimensions', []):
+            if name in filterable:
+                dimensions.append(name)
+            else:
+                logger.warning(f"  Rollup dimension '{name}' is not filterable, skipping")
+        
+        if not dimensions:
+            return None
+        
+        return {
+            'dimensions': dimensions,
+            'measures': rollup.get('measures', []),
+            'weight': rollup.get('weight')
+        }
+    
+    def create_rollup(self, table_name: str, config: Dict[str, Any]) -> None:
+        """Create the rollup cube table for pre-aggregated analytics"""
+        rollup = self.resolve_rollup(config)
+        if rollup is None:
+            return
+        
+        try:
+            cells = AggregationService(self.db).build_rollup(
+                table_name, rollup['dimensions'], rollup['measures'], rollup['weight']
+            )
+            logger.info(f"  Created {table_name}_rollup with {cells:,} cells over {', '.join(rollup['dimensions'])}")
+        except Exception as e:
+            self.db.rollback()
+            logger.warning(f"  Could not create rollup cube: {e}")
+    
+    def create_indicators(self, table_name: str, config: Dict[str, Any]) -> None:
+        """Sum the labour-force indicators of new or changed quarters"""
+        if 'indicators' not in config:
+            return
+        
+        try:
+            refreshed = IndicatorService(self.db).refresh(table_name, config['indicators'])
+            logger.info(
+                f"  Quarters summed: {len(refreshed['computed'])}, unchanged: {len(refreshed['unchanged'])}, "
+                f"removed: {len(refreshed['removed'])}"
+            )
+        except Exception as e:
+            self.db.rollback()
+            logger.warning(f"  Could not compute indicators: {e}")
+    
     def run(self) -> Dict[str, Any]:
         """Execute the complete ingestion pipeline"""
         try:
@@ -229,29 +333,54 @@ class CSVDataIngestion:
             logger.info("="*60)
             
             # Step 1: Read sample to understand structure
-            logger.info("\n[1/5] Reading CSV sample...")
+            logger.info("\n[1/10] Reading CSV sample...")
             sample_df = pd.read_csv(self.csv_file, nrows=1000)
             logger.info(f"  Columns: {len(sample_df.columns)}")
             logger.info(f"  Sample rows: {len(sample_df)}")
             
             # Step 2: Create table
-            logger.info("\n[2/5] Creating database table...")
+            logger.info("\n[2/10] Creating database table...")
             self.create_table_from_csv(table_name, sample_df)
             
             # Step 3: Register dataset
-            logger.info("\n[3/5] Registering dataset...")
+            logger.info("\n[3/10] Registering dataset...")
             dataset = self.register_dataset(config)
             
             # Step 4: Ingest data
-            logger.info("\n[4/5] Ingesting data...")
+            logger.info("\n[4/10] Ingesting data...")
             result = self.ingest_csv_data(table_name)
             
             if not result['success']:
                 return result
             
             # Step 5: Create indexes
-            logger.info("\n[5/5] Creating indexes...")
+            logger.info("\n[5/10] Creating indexes...")
             self.create_indexes(table_name, config)
+            self.create_household_key(table_name, config)
+            
+            # Step 6: Random sample keys for sampled queries
+            logger.info("\n[6/10] Assigning sample keys...")
+            self.assign_sample_keys(table_name, config)
+            
+            # Step 7: Build bitmap indexes for the upcoming data version
+            logger.info("\n[7/10] Building bitmap indexes...")
+            next_version = dataset_versions.get(self.db, table_name) + 1
+            self.create_bitmap_indexes(table_name, config, next_version)
+            
+            # Step 8: Precompute facets for the same data version
+            logger.info("\n[8/10] Counting facet values...")
+            self.create_facets(table_name, config, next_version)
+            
+            # Step 9: Materialize the rollup cube
+            logger.info("\n[9/10] Building rollup cube...")
+            self.create_rollup(table_name, config)
+            
+            # Step 10: Labour-force indicator sums, incremental by quarter
+            logger.info("\n[10/10] Computing labour-force indicators...")
+            self.create_indicators(table_name, config)
+            
+            # New data version - caches keyed on the old one stop matching
+            dataset_versions.bump(self.db, table_name)
             
             logger.info("\n" + "="*60)
             logger.info("✓ INGESTION COMPLETE")
@@ -9,6 +9,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 
 from ingest_csv_data import CSVDataIngestion
+from app.services.reference_tables import ReferenceTableMaterializer
 
 logging.basicConfig(
     level=logging.INFO,
@@ -71,6 +72,18 @@ def ingest_all_csv_files():
                 'result': {'success': False, 'error': str(e)}
             })
     
+    # Promote the JSON reference datasets (district codes, item codes,
+    # data layout) into typed tables
+    logger.info("\n" + "="*70)
+    logger.info("PROCESSING: Reference tables")
+    logger.info("="*70 + "\n")
+    
+    for result in ReferenceTableMaterializer().run():
+        results.append({
+            'name': f"Reference table ({result['table_name']})",
+            'result': result
+        })
+    
     # Print summary
     logger.info("\n" + "="*70)
     logger.info("INGESTION SUMMARY")
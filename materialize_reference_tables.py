@@ -0,0 +1,42 @@
+"""
+Materialize JSON reference datasets into typed tables
+Promotes the PLFS reference spreadsheets (district codes, item codes, data
+layout) stored as data_records JSON into real tables with proper column
+names, types and indexes, driven by config/datasets/reference_tables.yaml
+"""
+import sys
+from pathlib import Path
+import logging
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.reference_tables import ReferenceTableMaterializer, DEFAULT_CONFIG
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Main entry point for reference table materialization"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Materialize JSON reference datasets into typed tables')
+    parser.add_argument('--config', default=DEFAULT_CONFIG, help='Path to reference table YAML config')
+    
+    args = parser.parse_args()
+    
+    results = ReferenceTableMaterializer(args.config).run()
+    
+    for result in results:
+        if result['success']:
+            print(f"✓ {result['table_name']}: {result['total_rows']:,} rows from '{result['source_dataset']}'")
+        else:
+            print(f"✗ {result['table_name']}: {result['error']}")
+    
+    failed = [r for r in results if not r['success'] and not r.get('skipped')]
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,12 @@
 """
 Unit tests initialization
 """
+import os
+import tempfile
+
+# Point the app at a throwaway SQLite database before anything imports its engine
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='mospi_dpi_tests_'), 'test.db')}"
+
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
@@ -10,7 +16,7 @@ from app.config import get_settings
 settings = get_settings()
 
 # Test database URL
-TEST_DATABASE_URL = "sqlite:///./test.db"
+TEST_DATABASE_URL = os.environ["DATABASE_URL"]
 
 # Create test engine
 engine = create_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False})
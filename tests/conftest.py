@@ -0,0 +1,141 @@
+"""
+Shared fixtures: a small PLFS-shaped database built by the real ingestion pipeline
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from app.database import Base, SessionLocal, engine
+from app.models.user import User, UserRole
+from app.auth import create_access_token, get_password_hash
+from app.config import PROJECT_ROOT
+from app.services.parameter_resolver import parameter_resolver
+from app.services.result_cache import result_cache
+from app.services.count_cache import count_cache
+from app.services.access_control import AccessControlService
+from app.services.query_guard import QueryGuard
+
+PERSON_ROWS = 1500
+HOUSEHOLD_ROWS = 400
+
+
+def write_survey_csvs(directory):
+    """Write household and person CSVs shaped like the PLFS files, with blank cells"""
+    rng = np.random.default_rng(7)
+    
+    households = pd.DataFrame({
+        'Panel': 'P4',
+        'Quarter': rng.choice(['Q1', 'Q2', 'Q3'], HOUSEHOLD_ROWS),
+        'Visit': 'V1',
+        'Sector': rng.integers(1, 3, HOUSEHOLD_ROWS),
+        'State_Ut_Code': rng.choice([10, 27, 36], HOUSEHOLD_ROWS),
+        'District_Code': rng.integers(1, 6, HOUSEHOLD_ROWS),
+        'FSU': rng.integers(10000, 10050, HOUSEHOLD_ROWS),
+        'Sample_Sg_Sb_No': rng.integers(1, 3, HOUSEHOLD_ROWS),
+        'Second_Stage_Stratum_No': rng.integers(1, 4, HOUSEHOLD_ROWS),
+        'Sample_Household_Number': np.arange(HOUSEHOLD_ROWS),
+        'Month_of_Survey': rng.integers(1, 13, HOUSEHOLD_ROWS),
+        'Household_Size': rng.integers(1, 10, HOUSEHOLD_ROWS),
+        'Social_Group': rng.integers(1, 10, HOUSEHOLD_ROWS),
+        'Monthly_Consumer_Expenditure': rng.integers(1000, 50000, HOUSEHOLD_ROWS).astype(float),
+        'Subsample_Multiplier': rng.integers(100, 5000, HOUSEHOLD_ROWS).astype(float)
+    })
+    households.loc[::17, 'Monthly_Consumer_Expenditure'] = np.nan
+    
+    members = households.iloc[rng.integers(0, HOUSEHOLD_ROWS, PERSON_ROWS)].reset_index(drop=True)
+    persons = members[[
+        'Panel', 'Quarter', 'Visit', 'Sector', 'State_Ut_Code', 'District_Code', 'FSU',
+        'Sample_Sg_Sb_No', 'Second_Stage_Stratum_No', 'Sample_Household_Number', 'Subsample_Multiplier'
+    ]].rename(columns={'State_Ut_Code': 'State_UT_Code'})
+    persons['Sex'] = rng.integers(1, 3, PERSON_ROWS)
+    persons['Age'] = rng.integers(0, 90, PERSON_ROWS)
+    persons['General_Education_Level'] = rng.integers(1, 13, PERSON_ROWS)
+    persons['Principal_Status_Code'] = rng.choice([11, 12, 21, 31, 41, 51, 81, 91, 92, 93], PERSON_ROWS)
+    # Mostly blank, as in the real file: stored as '' next to numbers
+    persons['Subsidiary_Status_Code'] = rng.choice([11, 21, 51, np.nan, np.nan, np.nan], PERSON_ROWS)
+    persons['CWS_Status_Code'] = rng.choice([11, 31, 61, 72, 81, 82, 91], PERSON_ROWS)
+    persons['CWS_Earnings_Salaried'] = rng.integers(0, 30000, PERSON_ROWS).astype(float)
+    persons.loc[::5, 'CWS_Earnings_Salaried'] = np.nan
+    persons['CWS_Earnings_SelfEmployed'] = rng.integers(0, 20000, PERSON_ROWS).astype(float)
+    persons.loc[::3, 'CWS_Earnings_SelfEmployed'] = np.nan
+    
+    household_csv = directory / 'chhv1.csv'
+    person_csv = directory / 'cperv1.csv'
+    households.to_csv(household_csv, index=False)
+    persons.to_csv(person_csv, index=False)
+    return household_csv, person_csv
+
+
+@pytest.fixture(scope="session")
+def survey_db(tmp_path_factory):
+    """Ingest the fixture surveys once through ingest_csv_data; yields the person CSV frame"""
+    from ingest_csv_data import CSVDataIngestion
+    
+    Base.metadata.create_all(bind=engine)
+    household_csv, person_csv = write_survey_csvs(tmp_path_factory.mktemp("surveys"))
+    
+    config_dir = PROJECT_ROOT / 'config' / 'datasets'
+    for csv_file, config_file in ((household_csv, 'household_survey.yaml'), (person_csv, 'person_survey.yaml')):
+        result = CSVDataIngestion(str(csv_file), str(config_dir / config_file)).run()
+        assert result['success'], result
+    
+    parameter_resolver.compile()
+    return pd.read_csv(person_csv)
+
+
+@pytest.fixture
+def db(survey_db):
+    """Session on the fixture database; caches start empty for every test"""
+    result_cache.invalidate()
+    count_cache.invalidate()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def ensure_user(username: str, role: UserRole) -> str:
+    """Create a user if needed and return a bearer token for it"""
+    session = SessionLocal()
+    try:
+        if session.query(User).filter(User.username == username).first() is None:
+            session.add(User(
+                username=username,
+                email=f"{username}@example.org",
+                hashed_password=get_password_hash("secret"),
+                role=role,
+                is_active=True,
+                credits=1000000.0
+            ))
+            session.commit()
+    finally:
+        session.close()
+    return create_access_token({"sub": username})
+
+
+@pytest.fixture
+def client(survey_db):
+    """API client; the app's startup hook is not run, the fixture database is ready"""
+    from fastapi.testclient import TestClient
+    from app.main import app
+    
+    result_cache.invalidate()
+    count_cache.invalidate()
+    return TestClient(app)
+
+
+@pytest.fixture
+def admin_headers(survey_db):
+    return {"Authorization": f"Bearer {ensure_user('test_admin', UserRole.ADMIN)}"}
+
+
+@pytest.fixture
+def public_headers(survey_db):
+    return {"Authorization": f"Bearer {ensure_user('test_public', UserRole.PUBLIC)}"}
+
+
+@pytest.fixture
+def instant_deadline(monkeypatch):
+    """Every guarded query runs past its deadline at the first progress check"""
+    monkeypatch.setattr(AccessControlService, 'query_timeout', lambda self, user: 0.0)
+    monkeypatch.setattr(QueryGuard, 'SQLITE_PROGRESS_OPS', 1)
@@ -0,0 +1,95 @@
+"""
+Aggregate and crosstab endpoints
+"""
+from collections import Counter
+import pytest
+from app.models.user import UserRole
+from app.services.access_control import AccessControlService
+from app.services.cost_estimator import QueryCostEstimator
+
+
+def test_crosstab_over_blank_and_numeric_codes(client, admin_headers, survey_db):
+    # Subsidiary_Status_Code is mostly blank: '' and numbers in one column
+    response = client.get(
+        "/api/v1/aggregate/person_survey/crosstab",
+        params={"rows": "Sector", "columns": "Subsidiary_Status_Code"},
+        headers=admin_headers
+    )
+    assert response.status_code == 200, response.text
+    result = response.json()
+    
+    assert result['row_keys'] == [[1], [2]]
+    assert result['column_keys'] == [[11.0], [21.0], [51.0], ['']]
+    
+    expected = Counter(zip(survey_db['Sector'], survey_db['Subsidiary_Status_Code'].fillna('')))
+    for i, (sector,) in enumerate(result['row_keys']):
+        for j, (code,) in enumerate(result['column_keys']):
+            assert result['values'][i][j] == expected[(sector, code)]
+    assert result['margins']['grand_total'] == len(survey_db)
+
+
+def test_crosstab_sorts_mixed_row_keys(client, admin_headers):
+    response = client.get(
+        "/api/v1/aggregate/person_survey/crosstab",
+        params={"rows": "Subsidiary_Status_Code", "columns": "Sector"},
+        headers=admin_headers
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()['row_keys'] == [[11.0], [21.0], [51.0], ['']]
+
+
+def test_rollup_requests_are_estimated_from_the_cube(db):
+    estimator = QueryCostEstimator(db)
+    rollup = estimator.estimate_aggregate_query(
+        'person_survey', {'Sector': 1}, ['State_UT_Code'], [('count', None)], 'Subsample_Multiplier'
+    )
+    scan = estimator.estimate_aggregate_query('person_survey', {'Sector': 1}, ['Sex'], [('count', None)])
+    
+    assert rollup['access_path'] == 'rollup'
+    assert scan['access_path'] in ('index', 'scan')
+    assert rollup['estimated_cost'] < scan['estimated_cost']
+
+
+@pytest.fixture
+def no_cost_allowance(monkeypatch):
+    limits = {**AccessControlService.QUERY_COST_LIMITS, UserRole.PUBLIC: -1}
+    monkeypatch.setattr(AccessControlService, 'QUERY_COST_LIMITS', limits)
+
+
+@pytest.mark.parametrize('path, params', [
+    ("/api/v1/aggregate/person_survey", {"group_by": "Sex"}),
+    ("/api/v1/aggregate/person_survey/crosstab", {"rows": "Sex", "columns": "Sector"})
+])
+def test_aggregates_are_admitted_by_cost(client, public_headers, admin_headers, no_cost_allowance, path, params):
+    response = client.get(path, params=params, headers=public_headers)
+    assert response.status_code == 403, response.text
+    assert response.json()['detail']['cost_limit'] == -1
+    
+    # Roles without a limit still run it
+    assert client.get(path, params=params, headers=admin_headers).status_code == 200
+
+
+@pytest.mark.parametrize('path, params', [
+    ("/api/v1/aggregate/person_survey", {"group_by": "sample_key"}),
+    ("/api/v1/aggregate/household_survey", {"group_by": "household_key"}),
+    ("/api/v1/aggregate/person_survey", {"measures": "sum:sample_key"}),
+    ("/api/v1/aggregate/person_survey", {"weight": "sample_key"}),
+    ("/api/v1/aggregate/person_survey/crosstab", {"rows": "household_key", "columns": "Sector"}),
+    ("/api/v1/aggregate/person_survey/crosstab", {"rows": "Sex", "columns": "sample_key"})
+])
+def test_internal_columns_cannot_be_aggregated(client, admin_headers, path, params):
+    response = client.get(path, params=params, headers=admin_headers)
+    
+    assert response.status_code == 400, response.text
+    assert '_key' in response.json()['detail']
+
+
+@pytest.mark.parametrize('path, params', [
+    ("/api/v1/aggregate/person_survey", {"group_by": "Sex,Age"}),
+    ("/api/v1/aggregate/person_survey/crosstab", {"rows": "Sex", "columns": "General_Education_Level"}),
+    ("/api/v1/distribution/person_survey/Age", {"weight": "Subsample_Multiplier"})
+])
+def test_aggregates_enforce_deadline(client, admin_headers, instant_deadline, path, params):
+    response = client.get(path, params=params, headers=admin_headers)
+    
+    assert response.status_code == 504, response.text
@@ -0,0 +1,46 @@
+"""
+/datasets/{id}/facets on the fixture database
+"""
+import pytest
+from app.models.dataset import Dataset
+from app.models.user import UsageLog
+
+TABLE = 'person_survey'
+
+
+def facets_path(db):
+    dataset = db.query(Dataset).filter(Dataset.table_name == TABLE).first()
+    return f"/api/v1/datasets/{dataset.id}/facets"
+
+
+@pytest.mark.parametrize('filters', [None, '{"Sector": 1}', '{"Age": {"$gte": 15}}'])
+def test_blank_numeric_cells_are_not_facet_values(client, admin_headers, db, survey_db, filters):
+    params = {'columns': 'Subsidiary_Status_Code'}
+    if filters:
+        params['filters'] = filters
+    response = client.get(facets_path(db), params=params, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    
+    values = response.json()['facets']['Subsidiary_Status_Code']['values']
+    assert values
+    assert all(entry['value'] not in ('', None) for entry in values)
+    if filters is None:
+        assert sum(entry['count'] for entry in values) == survey_db['Subsidiary_Status_Code'].notna().sum()
+
+
+@pytest.mark.parametrize('column', ['sample_key', 'household_key', 'id'])
+def test_internal_and_key_columns_have_no_facets(client, admin_headers, db, column):
+    response = client.get(facets_path(db), params={'columns': f"Sex,{column}"}, headers=admin_headers)
+    
+    assert response.status_code == 400
+    assert column in response.json()['detail']
+
+
+def test_facets_are_metered(client, public_headers, db):
+    logged = db.query(UsageLog).filter(UsageLog.endpoint.like('%/facets')).count()
+    
+    response = client.get(facets_path(db), params={'columns': 'Sex'}, headers=public_headers)
+    assert response.status_code == 200, response.text
+    
+    db.expire_all()
+    assert db.query(UsageLog).filter(UsageLog.endpoint.like('%/facets')).count() == logged + 1
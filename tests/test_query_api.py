@@ -0,0 +1,151 @@
+"""
+/query endpoints on the fixture database
+"""
+import io
+import pytest
+from app.models.dataset import Dataset
+from app.models.user import UserRole
+from app.services.access_control import AccessControlService
+from app.services.query_builder import QueryBuilderService
+
+INTERNAL_COLUMNS = ['sample_key', 'household_key']
+
+
+def test_default_projection_hides_internal_columns(db):
+    result = QueryBuilderService(db).execute_table_query('person_survey', limit=5)
+    
+    assert result['data']
+    for name in INTERNAL_COLUMNS:
+        assert all(name not in row for row in result['data'])
+
+
+@pytest.mark.parametrize('name', INTERNAL_COLUMNS)
+def test_internal_columns_cannot_be_selected(client, admin_headers, name):
+    response = client.get(
+        "/api/v1/query/person_survey", params={"fields": f"Age,{name}"}, headers=admin_headers
+    )
+    assert response.status_code == 400
+    assert name in response.json()['detail']
+
+
+@pytest.mark.parametrize('name', INTERNAL_COLUMNS)
+def test_internal_columns_are_not_strata(client, admin_headers, name):
+    response = client.get(
+        "/api/v1/query/person_survey",
+        params={"sample": "stratified", "strata": f"Sex,{name}", "limit": 20},
+        headers=admin_headers
+    )
+    assert response.status_code == 400, response.text
+    assert name in response.json()['detail']
+
+
+@pytest.mark.parametrize('output_format', ['json', 'parquet'])
+def test_query_outputs_hide_internal_columns(client, admin_headers, output_format):
+    response = client.get(
+        "/api/v1/query/household_survey",
+        params={"limit": 20, "format": output_format},
+        headers=admin_headers
+    )
+    assert response.status_code == 200, response.text
+    
+    if output_format == 'json':
+        columns = set(response.json()['data'][0])
+    else:
+        pq = pytest.importorskip("pyarrow.parquet")
+        columns = set(pq.read_table(io.BytesIO(response.content)).column_names)
+    assert 'Household_Size' in columns
+    assert not columns & set(INTERNAL_COLUMNS)
+
+
+def test_schema_hides_internal_columns(client, admin_headers, db):
+    dataset = db.query(Dataset).filter(Dataset.table_name == 'person_survey').first()
+    response = client.get(f"/api/v1/datasets/{dataset.id}/schema", headers=admin_headers)
+    assert response.status_code == 200, response.text
+    schema = response.json()
+    
+    names = {column['name'] for column in schema['columns']}
+    assert 'Age' in names
+    assert not names & set(INTERNAL_COLUMNS)
+    indexed = {name for index in schema['indexes'] for name in index['column_names']}
+    assert not indexed & set(INTERNAL_COLUMNS)
+
+
+def test_join_still_matches_on_household_key(client, admin_headers):
+    response = client.get(
+        "/api/v1/query/join/person-household",
+        params={"person_fields": "Age,Sex", "limit": 50},
+        headers=admin_headers
+    )
+    assert response.status_code == 200, response.text
+    rows = response.json()['data']
+    
+    assert len(rows) == 50
+    assert set(rows[0]) == {'Age', 'Sex', 'Household_Size', 'Social_Group', 'Monthly_Consumer_Expenditure'}
+
+
+def dataset_id(db, table_name):
+    return db.query(Dataset).filter(Dataset.table_name == table_name).first().id
+
+
+@pytest.mark.parametrize('state, code', [('TELANGANA', 36), ('Telangana', 36), ('bihar', 10)])
+def test_state_names_resolve_without_reference_tables(client, admin_headers, db, state, code):
+    # The fixture database never ran materialize_reference_tables.py
+    response = client.get(
+        "/api/v1/query",
+        params={"dataset": dataset_id(db, 'person_survey'), "state": state, "limit": 1000},
+        headers=admin_headers
+    )
+    assert response.status_code == 200, response.text
+    
+    rows = response.json()['data']
+    assert rows
+    assert {row['State_UT_Code'] for row in rows} == {code}
+
+
+def test_undeclared_parameters_are_ignored(client, admin_headers, db):
+    # The household survey has no gender or age columns
+    response = client.get(
+        "/api/v1/query",
+        params={"dataset": dataset_id(db, 'household_survey'), "state": "Maharashtra", "gender": "F", "age_group": "15-29"},
+        headers=admin_headers
+    )
+    assert response.status_code == 200, response.text
+    
+    rows = response.json()['data']
+    assert rows
+    assert {row['State_Ut_Code'] for row in rows} == {27}
+
+
+@pytest.mark.parametrize('method, path, params', [
+    ('GET', "/api/v1/query", lambda db: {"dataset": dataset_id(db, 'person_survey')}),
+    ('GET', "/api/v1/query/person_survey", lambda db: {}),
+    ('GET', "/api/v1/query/dataset/{id}/records", lambda db: {}),
+    ('POST', "/api/v1/query", lambda db: {"dataset": "census"})
+])
+def test_query_paths_enforce_deadline(client, admin_headers, db, instant_deadline, method, path, params):
+    path = path.replace('{id}', str(dataset_id(db, 'household_survey')))
+    if method == 'GET':
+        response = client.get(path, params=params(db), headers=admin_headers)
+    else:
+        response = client.post(path, json=params(db), headers=admin_headers)
+    
+    assert response.status_code == 504, response.text
+
+
+@pytest.mark.parametrize('method, path, params', [
+    ('GET', "/api/v1/query", lambda db: {"dataset": dataset_id(db, 'person_survey')}),
+    ('POST', "/api/v1/query", lambda db: {"dataset": "census"}),
+    ('GET', "/api/v1/query/dataset/{id}/records", lambda db: {"limit": 10000})
+])
+def test_dataset_queries_are_admitted_by_cost(client, public_headers, db, monkeypatch, method, path, params):
+    limits = {**AccessControlService.QUERY_COST_LIMITS, UserRole.PUBLIC: -1}
+    monkeypatch.setattr(AccessControlService, 'QUERY_COST_LIMITS', limits)
+    
+    path = path.replace('{id}', str(dataset_id(db, 'person_survey')))
+    if method == 'GET':
+        response = client.get(path, params=params(db), headers=public_headers)
+    else:
+        response = client.post(path, json=params(db), headers=public_headers)
+    
+    assert response.status_code == 403, response.text
+    assert 'estimate' in response.json()['detail']
@@ -0,0 +1,134 @@
+"""
+Reference tables are materialized from their JSON sources when missing
+"""
+import pytest
+from sqlalchemy import text
+from app.models.dataset import Dataset, DataRecord, FacetCount
+from app.services.reference_tables import ReferenceTableMaterializer
+from app.services.cost_estimator import QueryCostEstimator
+from app.services.full_text_search import fts_table_name
+from app.services.schema_registry import schema_registry
+
+TABLE = 'plfs_district_codes'
+
+# Rows of the district codes sheet as load_plfs_data stores them: a title row, a header row, districts
+SHEET = [
+    {'District codes of PLFS': 'District codes of PLFS', 'Unnamed: 1': None, 'Unnamed: 2': None, 'Unnamed: 3': None},
+    {'District codes of PLFS': 'State Code', 'Unnamed: 1': 'State Name', 'Unnamed: 2': 'District Code', 'Unnamed: 3': 'District Name'},
+    {'District codes of PLFS': 10, 'Unnamed: 1': 'Bihar', 'Unnamed: 2': 1, 'Unnamed: 3': 'Pashchim Champaran'},
+    {'District codes of PLFS': 10, 'Unnamed: 1': 'Bihar', 'Unnamed: 2': 2, 'Unnamed: 3': 'Purba Champaran'},
+    {'District codes of PLFS': 36, 'Unnamed: 1': 'Telangana', 'Unnamed: 2': 1, 'Unnamed: 3': 'Adilabad'}
+]
+
+
+@pytest.fixture
+def district_codes_source(db):
+    """A loaded but never materialized district codes sheet; dropped again afterwards"""
+    source = Dataset(name='PLFS_District_codes_test', description='District codes sheet', table_name='district_codes_json')
+    db.add(source)
+    db.commit()
+    db.add_all([DataRecord(dataset_id=source.id, data=record) for record in SHEET])
+    db.commit()
+    yield source
+    
+    db.query(DataRecord).filter(DataRecord.dataset_id == source.id).delete()
+    db.query(Dataset).filter(Dataset.id == source.id).delete()
+    db.query(Dataset).filter(Dataset.table_name == TABLE).delete()
+    db.query(FacetCount).filter(FacetCount.table_name == TABLE).delete()
+    db.commit()
+    with db.bind.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {fts_table_name(TABLE)}"))
+        conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+    schema_registry.invalidate()
+
+
+def test_missing_table_is_materialized_once(db, district_codes_source):
+    assert not schema_registry.has_table(TABLE, db.bind)
+    
+    results = ReferenceTableMaterializer().run(missing_only=True)
+    
+    # Item codes and layout were never loaded, so only the district codes are built
+    assert [(result['table_name'], result['success'], result['total_rows']) for result in results] == [(TABLE, True, 3)]
+    assert schema_registry.has_table(TABLE, db.bind)
+    assert ReferenceTableMaterializer().run(missing_only=True) == []
+
+
+def test_plfs_endpoint_reads_materialized_table(client, public_headers, district_codes_source):
+    response = client.get("/api/v1/plfs/district-codes", headers=public_headers)
+    assert response.status_code == 404
+    
+    ReferenceTableMaterializer().run(missing_only=True)
+    
+    response = client.get("/api/v1/plfs/district-codes", params={'state': 'bihar'}, headers=public_headers)
+    assert response.status_code == 200
+    assert [row['DISTRICT_NAME'] for row in response.json()['data']] == ['Pashchim Champaran', 'Purba Champaran']
+
+
+def test_rerun_never_reads_the_typed_dataset(db, district_codes_source):
+    ReferenceTableMaterializer().run(missing_only=True)
+    
+    # Reload the sheet so the typed 'PLFS District Codes' dataset is the older LIKE match
+    db.query(DataRecord).filter(DataRecord.dataset_id == district_codes_source.id).delete()
+    db.query(Dataset).filter(Dataset.id == district_codes_source.id).delete()
+    db.commit()
+    reloaded = Dataset(name='PLFS_District_codes_test', description='District codes sheet', table_name='district_codes_json')
+    db.add(reloaded)
+    db.commit()
+    db.add_all([DataRecord(dataset_id=reloaded.id, data=record) for record in SHEET])
+    db.commit()
+    district_codes_source.id = reloaded.id
+    
+    results = ReferenceTableMaterializer().run()
+    assert (results[0]['success'], results[0]['source_dataset'], results[0]['total_rows']) == (True, reloaded.name, 3)
+    
+    # A source with nothing usable fails without dropping the table
+    db.query(DataRecord).filter(DataRecord.dataset_id == reloaded.id).delete()
+    db.commit()
+    assert ReferenceTableMaterializer().run()[0]['success'] is False
+    assert db.execute(text(f"SELECT COUNT(*) FROM {TABLE}")).scalar() == 3
+
+
+@pytest.fixture
+def item_codes_source(db):
+    """A JSON workbook of two sheets with an index on its `sheet` key"""
+    source = Dataset(
+        name='PLFS_Item_Code_test',
+        description='Item codes workbook',
+        table_name='item_codes_json',
+        config={'json_indexes': ['sheet']}
+    )
+    db.add(source)
+    db.commit()
+    db.add_all([
+        DataRecord(dataset_id=source.id, data={'sheet': sheet, 'row': row})
+        for sheet in ('Block 4', 'Block 5.1') for row in range(3)
+    ])
+    db.commit()
+    yield source
+    
+    db.query(DataRecord).filter(DataRecord.dataset_id == source.id).delete()
+    db.query(Dataset).filter(Dataset.id == source.id).delete()
+    db.commit()
+
+
+def test_plfs_records_filter_by_sheet(client, public_headers, item_codes_source):
+    response = client.get(
+        f"/api/v1/plfs/dataset/{item_codes_source.id}/records", params={'sheet': 'Block 5.1'}, headers=public_headers
+    )
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert result['total_records'] == 3
+    assert {record['sheet'] for record in result['data']} == {'Block 5.1'}
+
+
+def test_json_filters_are_estimated_as_pushed_down(db, item_codes_source):
+    estimator = QueryCostEstimator(db)
+    
+    indexed = estimator.estimate_records_query(item_codes_source, {'sheet': 'Block 4'}, limit=2)
+    assert (indexed['access_path'], indexed['indexed_filter_columns']) == ('index', ['sheet'])
+    assert indexed['estimated_matching_rows'] == 3
+    assert indexed['estimated_rows_returned'] == 2
+    
+    scanned = estimator.estimate_records_query(item_codes_source, {'row': {'$gte': 2}})
+    assert (scanned['access_path'], scanned['unindexed_filter_columns']) == ('scan', ['row'])
+    assert scanned['estimated_matching_rows'] == 2